@@ -18,5 +18,5 @@ def ingest_topic(topic: str, files: list[UploadFile] = File(...)):
         with open(pdf_path, "wb") as f:
             f.write(file.file.read())
         chunks, embeddings = ingestor.process_pdf(pdf_path)
-        vector_store.add_documents(topic, chunks, embeddings)
+        vector_store.add_documents(topic, chunks, embeddings, source_file=file.filename)
     return {"status": "success", "message": f"Ingested {len(files)} PDFs for topic '{topic}'"} 
\ No newline at end of file
@@ -7,6 +7,8 @@ CHROMA_DB_DIR = os.path.join(DATA_DIR, 'chroma_db')
 # Path to local LLM (GGUF file) and llama.cpp binary
 LLM_MODEL_PATH = os.environ.get('LLM_MODEL_PATH', os.path.join(DATA_DIR, 'models', 'llama-3-8b.Q4_K_M.gguf'))
 LLAMA_CPP_PATH = os.environ.get('LLAMA_CPP_PATH', '/usr/local/bin/llama.cpp')
+# llama.cpp servers that keep the model loaded, e.g. the backend's pool (LLAMA_SERVER_ENABLED) on ports 8081-8082
+LLAMA_SERVER_URLS = [url.strip() for url in os.environ.get('LLAMA_SERVER_URLS', 'http://127.0.0.1:8081,http://127.0.0.1:8082').split(',') if url.strip()]
 
 EMBEDDING_MODEL_NAME = os.environ.get('EMBEDDING_MODEL_NAME', 'BAAI/bge-m3')
 
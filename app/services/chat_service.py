@@ -1,6 +1,8 @@
+import itertools
 import subprocess
 import numpy as np
-from app.config import LLM_MODEL_PATH, LLAMA_CPP_PATH, SIMILARITY_THRESHOLD
+import requests
+from app.config import LLM_MODEL_PATH, LLAMA_CPP_PATH, LLAMA_SERVER_URLS, SIMILARITY_THRESHOLD
 from app.services.vector_store import VectorStore
 from sentence_transformers import SentenceTransformer
 
@@ -8,6 +10,9 @@ class ChatService:
     def __init__(self):
         self.vector_store = VectorStore()
         self.embedder = SentenceTransformer('BAAI/bge-m3')
+        # Keep-alive connections to the llama.cpp servers, which are tried in turn
+        self.llm_session = requests.Session()
+        self.llm_servers = itertools.cycle(LLAMA_SERVER_URLS)
 
     def retrieve_context(self, topic, question, top_k=5):
         q_emb = self.embedder.encode([question])[0]
@@ -19,7 +24,19 @@ class ChatService:
         return results['documents'][0], max_sim
 
     def call_llm(self, prompt):
-        # Call llama.cpp via subprocess
+        # Ask a running llama.cpp server, which has the model loaded already
+        payload = {"prompt": prompt, "temperature": 0.2, "n_predict": 512}
+        for _ in LLAMA_SERVER_URLS:
+            url = next(self.llm_servers)
+            try:
+                response = self.llm_session.post(f"{url}/completion", json=payload, timeout=120)
+            except requests.exceptions.ConnectionError:
+                continue
+            if response.status_code == 503:  # still loading the model
+                continue
+            response.raise_for_status()
+            return response.json()["content"].strip()
+        # No server is up: a one-off llama.cpp process loads the model for this question only
         cmd = [LLAMA_CPP_PATH, "-m", LLM_MODEL_PATH, "-p", prompt, "--temp", "0.2", "-n", "512"]
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
         return result.stdout.strip()
@@ -1,4 +1,5 @@
 import os
+import hashlib
 import chromadb
 from chromadb.config import Settings
 from app.config import CHROMA_DB_DIR, CHROMA_COLLECTION_PREFIX
@@ -11,10 +12,56 @@ class VectorStore:
         name = CHROMA_COLLECTION_PREFIX + topic.lower().replace(' ', '_')
         return self.client.get_or_create_collection(name)
 
-    def add_documents(self, topic, chunks, embeddings):
+    def chunk_ids(self, source_file, chunks):
+        """Content-derived IDs; repeated text in one file gets an occurrence suffix."""
+        seen = {}
+        ids = []
+        for chunk in chunks:
+            digest = hashlib.sha256(f"{source_file}\0{chunk}".encode("utf-8")).hexdigest()
+            occurrence = seen.get(digest, 0)
+            seen[digest] = occurrence + 1
+            ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+        return ids
+
+    def drop_positional_chunks(self, collection):
+        """
+        Delete chunks stored under the old positional {topic}_{i} IDs, which carry no source_file
+        and so can never be matched or replaced by a re-ingest. Runs once per collection; their
+        documents have to be ingested again.
+        """
+        if (collection.metadata or {}).get("chunk_ids") == "content":
+            return
+        rows = collection.get(include=["metadatas"])
+        legacy = [chunk_id for chunk_id, metadata in zip(rows["ids"], rows["metadatas"])
+                  if not (metadata or {}).get("source_file")]
+        if legacy:
+            collection.delete(ids=legacy)
+        collection.modify(metadata={**(collection.metadata or {}), "chunk_ids": "content"})
+
+    def add_documents(self, topic, chunks, embeddings, source_file):
+        """
+        Upsert a document's chunks. The chunk IDs stored under source_file act as the
+        document's manifest: only new chunks are written and stale ones are deleted.
+        """
+        if not source_file:
+            raise ValueError("source_file is required to keep each document's chunks apart")
         collection = self.get_collection(topic)
-        ids = [f"{topic}_{i}" for i in range(len(chunks))]
-        collection.add(documents=chunks, embeddings=embeddings.tolist(), ids=ids)
+        self.drop_positional_chunks(collection)
+        ids = self.chunk_ids(source_file, chunks)
+        existing = set(collection.get(where={"source_file": source_file}, include=[])["ids"])
+
+        new_rows = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+        if new_rows:
+            collection.upsert(
+                documents=[chunks[i] for i in new_rows],
+                embeddings=[embeddings[i].tolist() for i in new_rows],
+                ids=[ids[i] for i in new_rows],
+                metadatas=[{"source_file": source_file} for _ in new_rows]
+            )
+        stale = list(existing.difference(ids))
+        if stale:
+            collection.delete(ids=stale)
+        return {"added": len(new_rows), "removed": len(stale), "unchanged": len(ids) - len(new_rows)}
 
     def similarity_search(self, topic, query_embedding, top_k=5):
         collection = self.get_collection(topic)
@@ -1,16 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from app.db.database import get_db, Document, Topic
+from app.db.database import get_db, SessionLocal, Document, Topic
 from app.auth.dependencies import get_current_admin_user
 from app.auth.models import User
-from app.services.pdf_ingestor import PDFIngestor
-from app.services.job_queue import job_queue
+from app.services.pdf_extraction import extract_range
+from app.services.pdf_ingestor import PDFIngestor, embed_texts
+from app.services.job_queue import job_queue, JobContext, JobLane, JobPriority
 from app.config import settings
+from app.utils.file_lock import file_lock
 from app.utils.logger import logger
 from typing import List, Optional, Dict, Any
+from functools import partial
+from starlette.concurrency import run_in_threadpool
+from pathlib import Path
 import os
 import uuid
+import hashlib
 import json
 from datetime import datetime
 import shutil
@@ -32,6 +38,7 @@ class TrainingJobResponse(BaseModel):
     files_processed: int
     total_files: int
     estimated_completion: Optional[str] = None
+    file_jobs: List[str] = []
 
 class KnowledgeBaseStats(BaseModel):
     topic_name: str
@@ -91,7 +98,7 @@ async def get_admin_dashboard_stats(
         try:
             from app.services.llm_service import LLMService
             llm = LLMService()
-            test_response = llm.call_llm("Test", max_tokens=5, temp=0.1)
+            test_response = await llm.acall_llm("Test", max_tokens=5, temp=0.1)
             system_health["llm"] = "healthy" if not test_response.startswith("[LLM ERROR]") else "error"
         except Exception:
             system_health["llm"] = "error"
@@ -109,9 +116,97 @@ async def get_admin_dashboard_stats(
         logger.error(f"Error getting admin stats: {e}")
         raise HTTPException(status_code=500, detail="Error retrieving dashboard statistics")
 
+def process_training_file(path: str, topic: str, original_name: str, size: int,
+                          job_context: Optional[JobContext] = None) -> Dict[str, Any]:
+    """
+    Queue job: ingest one uploaded training PDF from its unique upload path, then move it into
+    the topic directory under its own name. Revisions of a document are ingested one at a time,
+    and one older than the file already in place is skipped. Can be cancelled between batches.
+    On the CPU lane the pages are extracted and the chunks embedded on its process pool, and the
+    chunks are stored from this process.
+    """
+    upload_path = Path(path)
+    source_file = os.path.basename(original_name)
+    final_path = upload_path.parent / source_file
+    logger.info(f"Processing training file {original_name} for topic {topic}")
+    
+    def report_pages(pages_done: int, page_count: int):
+        job_context.report(pages_done, page_count, unit="pages")
+        job_context.check_cancelled()
+    
+    with file_lock(upload_path.parent / f".{source_file}.lock"):
+        if final_path.exists() and final_path.stat().st_mtime_ns > upload_path.stat().st_mtime_ns:
+            upload_path.unlink()
+            logger.info(f"Skipping {original_name}: a newer revision was already ingested")
+            return {"skipped": "superseded by a newer upload"}
+        try:
+            result = PDFIngestor().ingest_pdf(
+                str(upload_path), topic, source_file,
+                progress=report_pages if job_context else None,
+                embed_fn=partial(job_context.run_cpu, embed_texts) if job_context else None,
+                extract_fn=partial(job_context.run_cpu, extract_range) if job_context else None
+            )
+        except BaseException:
+            upload_path.unlink(missing_ok=True)
+            raise
+        # Readers of the previous revision keep their open file; new readers see this one
+        os.replace(upload_path, final_path)
+    
+    db = SessionLocal()
+    try:
+        db.add(Document(
+            file_name=original_name,
+            topic=topic,
+            page_count=result.get("pages", 0),
+            file_size_mb=size / (1024 * 1024),
+            date_uploaded=datetime.utcnow()
+        ))
+        db.commit()
+    finally:
+        db.close()
+    return result
+
+def retrain_topic_files(topic: str, job_context: Optional[JobContext] = None) -> Dict[str, Any]:
+    """
+    Queue job: re-ingest every PDF of a topic and drop the documents whose files are gone. Only
+    changed chunks are embedded and written. Progress counts pages across all files, and the job
+    can be cancelled between batches.
+    """
+    from app.services.vector_store import vector_store
+    
+    topic_dir = settings.PDF_DIR / topic
+    pdf_files = sorted(topic_dir.glob("*.pdf"))
+    current_files = {pdf_file.name for pdf_file in pdf_files}
+    for source_file in vector_store.manifest.documents(topic):
+        if source_file not in current_files:
+            vector_store.delete_document(topic, source_file)
+    
+    ingestor = PDFIngestor()
+    page_counts = [ingestor.page_count(str(pdf_file)) for pdf_file in pdf_files]
+    total_pages = sum(page_counts)
+    pages_before = 0
+    for pdf_file, page_count in zip(pdf_files, page_counts):
+        logger.info(f"Retraining: {pdf_file.name}")
+        
+        def report_pages(pages_done: int, _: int):
+            job_context.report(pages_before + pages_done, total_pages, unit="pages", message=pdf_file.name)
+            job_context.check_cancelled()
+        
+        # Uploads of the same document wait for this file, and it for them
+        with file_lock(topic_dir / f".{pdf_file.name}.lock"):
+            ingestor.ingest_pdf(
+                str(pdf_file), topic,
+                progress=report_pages if job_context else None,
+                embed_fn=partial(job_context.run_cpu, embed_texts) if job_context else None,
+                extract_fn=partial(job_context.run_cpu, extract_range) if job_context else None
+            )
+        pages_before += page_count
+    
+    logger.info(f"Retrained {len(pdf_files)} files for topic {topic}")
+    return {"files": len(pdf_files), "pages": total_pages}
+
 @router.post("/admin/upload/training-files", response_model=TrainingJobResponse)
 async def upload_training_files(
-    background_tasks: BackgroundTasks,
     topic: str = Form(...),
     description: str = Form(""),
     files: List[UploadFile] = File(...),
@@ -140,55 +235,35 @@ async def upload_training_files(
         # Create job ID
         job_id = str(uuid.uuid4())
         
-        # Save files temporarily
-        temp_files = []
+        # Save files and queue one bulk-priority job per file
         topic_dir = settings.PDF_DIR / topic
         topic_dir.mkdir(exist_ok=True)
+        file_jobs = []
         
-        for file in valid_files:
-            temp_filename = f"{uuid.uuid4()}_{file.filename}"
-            temp_path = topic_dir / temp_filename
+        for i, file in enumerate(valid_files):
+            # Each upload gets its own path; the job moves it over the previous revision once it runs
+            temp_path = topic_dir / f".{job_id}-{i}-{os.path.basename(file.filename)}.part"
             
+            content_hash = hashlib.sha256()
             with open(temp_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+                for block in iter(lambda: file.file.read(1024 * 1024), b""):
+                    content_hash.update(block)
+                    buffer.write(block)
             
-            temp_files.append({
-                "path": str(temp_path),
-                "original_name": file.filename,
-                "size": file.size
-            })
-        
-        # Submit background job for processing
-        def process_training_files():
-            try:
-                ingestor = PDFIngestor()
-                total_files = len(temp_files)
-                
-                for i, file_info in enumerate(temp_files):
-                    logger.info(f"Processing file {i+1}/{total_files}: {file_info['original_name']}")
-                    
-                    # Process the PDF
-                    result = ingestor.ingest_pdf(file_info["path"], topic)
-                    
-                    # Create document record
-                    doc = Document(
-                        file_name=file_info["original_name"],
-                        topic=topic,
-                        page_count=result.get("pages", 0),
-                        file_size_mb=file_info["size"] / (1024 * 1024),
-                        date_uploaded=datetime.utcnow()
-                    )
-                    db.add(doc)
-                
-                db.commit()
-                logger.info(f"Training job {job_id} completed successfully")
-                
-            except Exception as e:
-                logger.error(f"Training job {job_id} failed: {e}")
-                raise
-        
-        # Submit the job
-        background_tasks.add_task(process_training_files)
+            # An identical file for this topic that is still queued or running is not embedded twice
+            file_job = await run_in_threadpool(
+                job_queue.submit_job,
+                job_id=f"{job_id}-{i}",
+                func=process_training_file,
+                args=(str(temp_path), topic, file.filename, file.size),
+                lane=JobLane.CPU,
+                priority=JobPriority.BULK,
+                submitter=f"admin:{current_admin.id}",
+                idempotency_key=f"ingest:{topic}:{content_hash.hexdigest()}"
+            )
+            if file_job != f"{job_id}-{i}":
+                temp_path.unlink()
+            file_jobs.append(file_job)
         
         logger.info(f"Admin {current_admin.email} started training job {job_id} with {len(valid_files)} files")
         
@@ -198,7 +273,8 @@ async def upload_training_files(
             message=f"Processing {len(valid_files)} files for topic '{topic}'",
             files_processed=0,
             total_files=len(valid_files),
-            estimated_completion="5-10 minutes"
+            estimated_completion="5-10 minutes",
+            file_jobs=file_jobs
         )
         
     except Exception as e:
@@ -212,13 +288,11 @@ async def get_knowledge_base_overview(
 ):
     """Get overview of the knowledge base by topic."""
     try:
-        from app.services.vector_store import VectorStore
+        from app.services.vector_store import vector_store
         
         topics = db.query(Topic).filter(Topic.is_active == True).all()
         knowledge_base_stats = []
         
-        vector_store = VectorStore()
-        
         for topic in topics:
             # Get document stats for this topic
             topic_docs = db.query(Document).filter(Document.topic == topic.name).all()
@@ -277,8 +351,7 @@ async def delete_knowledge_base_topic(
         
         # Delete vector embeddings
         try:
-            from app.services.vector_store import VectorStore
-            vector_store = VectorStore()
+            from app.services.vector_store import vector_store
             vector_store.delete_collection(topic_name)
         except Exception as e:
             logger.warning(f"Error deleting vector collection for {topic_name}: {e}")
@@ -299,7 +372,6 @@ async def delete_knowledge_base_topic(
 @router.post("/admin/knowledge-base/retrain/{topic_name}")
 async def retrain_topic(
     topic_name: str,
-    background_tasks: BackgroundTasks,
     current_admin: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -319,30 +391,17 @@ async def retrain_topic(
         if not pdf_files:
             raise HTTPException(status_code=404, detail="No PDF files found for this topic")
         
-        job_id = str(uuid.uuid4())
-        
-        def retrain_embeddings():
-            try:
-                from app.services.vector_store import VectorStore
-                from app.services.pdf_ingestor import PDFIngestor
-                
-                # Delete existing embeddings
-                vector_store = VectorStore()
-                vector_store.delete_collection(topic_name)
-                
-                # Re-ingest all files
-                ingestor = PDFIngestor()
-                for pdf_file in pdf_files:
-                    logger.info(f"Retraining: {pdf_file.name}")
-                    ingestor.ingest_pdf(str(pdf_file), topic_name)
-                
-                logger.info(f"Retrain job {job_id} completed for topic {topic_name}")
-                
-            except Exception as e:
-                logger.error(f"Retrain job {job_id} failed: {e}")
-                raise
-        
-        background_tasks.add_task(retrain_embeddings)
+        # Retraining a topic that is already being retrained attaches to that job
+        job_id = await run_in_threadpool(
+            job_queue.submit_job,
+            job_id=str(uuid.uuid4()),
+            func=retrain_topic_files,
+            args=(topic_name,),
+            lane=JobLane.CPU,
+            priority=JobPriority.BULK,
+            submitter=f"admin:{current_admin.id}",
+            idempotency_key=f"retrain:{topic_name}"
+        )
         
         logger.info(f"Admin {current_admin.email} started retrain job for topic: {topic_name}")
         
@@ -1,13 +1,16 @@
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from app.services.embedding_service import EmbeddingService
-from app.services.vector_store import VectorStore
+from app.services.embedding_service import get_embedding_service
+from app.services.vector_store import vector_store
 from app.services.llm_service import LLMService
+from app.services.provider_router import llm_router
+from app.services.semantic_cache import semantic_answer_cache
+from app.services.singleflight import chat_singleflight
 from app.config import settings
 from app.utils.logger import logger
 from starlette.concurrency import run_in_threadpool
-from typing import List, Optional
+from typing import List, Optional, Union
 import time
 import json
 
@@ -19,7 +22,7 @@ async def test_llm():
     """Test endpoint to verify LLM service works"""
     try:
         llm = LLMService(provider="groq")
-        response = llm.call_llm("What is 2+2? Answer briefly.")
+        response = await llm.acall_llm("What is 2+2? Answer briefly.")
         return {
             "status": "success", 
             "provider": llm.provider,
@@ -58,7 +61,7 @@ async def llm_chat_completions(request: Request):
         if msg["role"] == "user":
             prompt += msg["content"] + "\n"
     llm = LLMService(provider="groq")
-    answer = llm.call_llm(prompt)
+    answer = await llm.acall_llm(prompt)
     return JSONResponse(content={
         "choices": [{"message": {"content": answer}}],
         "usage": {"total_tokens": len(prompt.split())}
@@ -77,6 +80,99 @@ class ChatResponse(BaseModel):
     confidence: Optional[float] = None
     session_id: Optional[int] = None
 
+async def retrieve_context(query_embedding, topic: str):
+    """Relevant document chunks for a question embedding, with the sources and context snippets shown to the user"""
+    logger.info(f"Searching for relevant context for topic: {topic}")
+    
+    # Search for relevant document chunks
+    context_documents = await run_in_threadpool(
+        vector_store.search_similar,
+        query_embedding,
+        topic_filter=topic,
+        top_k=3
+    )
+    
+    logger.info(f"Found {len(context_documents)} relevant document chunks")
+    
+    # Extract sources from context documents
+    sources = []
+    used_context = []
+    if context_documents:
+        for doc in context_documents:
+            if doc.get('source'):
+                sources.append(doc['source'])
+            if doc.get('content'):
+                used_context.append(doc['content'][:200] + "..." if len(doc['content']) > 200 else doc['content'])
+    return context_documents, sources, used_context
+
+def cached_answer(topic: str, query_embedding) -> Optional[dict]:
+    """A semantic cache hit for a paraphrase of a recent question in the topic"""
+    cached = semantic_answer_cache.lookup(topic, query_embedding)
+    if cached:
+        logger.info(f"Semantic cache hit (similarity {cached['score']:.3f}) for: {cached['matched_question'][:50]}...")
+    return cached
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def chat_key(req: ChatRequest) -> tuple:
+    """Requests with the same normalised topic and question get the same answer"""
+    def normalise(text: str) -> str:
+        return " ".join(text.lower().split()).rstrip("?!. ")
+    return (normalise(req.topic), normalise(req.question), tuple(llm_router.order))
+
+async def answer_chat(req: ChatRequest) -> Union[ChatResponse, dict]:
+    """Answer one chat request; an LLM failure is returned as an error payload"""
+    llm = llm_router.primary()
+    
+    # Try to retrieve relevant context from knowledge base
+    try:
+        query_embedding = await get_embedding_service().agenerate_embedding(req.question)
+        
+        # Paraphrases of recent questions are answered without retrieval or an LLM call
+        cached = cached_answer(req.topic, query_embedding)
+        if cached:
+            return ChatResponse(
+                answer=cached["answer"],
+                sources=cached["sources"],
+                used_context=cached["used_context"],
+                llm=llm.model,
+                confidence=round(cached["score"], 4),
+                session_id=None
+            )
+        
+        context_documents, sources, used_context = await retrieve_context(query_embedding, req.topic)
+        
+        # Call LLM with context on the first healthy provider, failing over on errors
+        answer, llm = await llm_router.acall("acall_llm_with_context", req.question, context_documents, topic=req.topic)
+        semantic_answer_cache.add(req.topic, query_embedding, req.question, answer, sources, used_context)
+        
+    except Exception as search_error:
+        logger.warning(f"Vector search failed, falling back to direct LLM: {search_error}")
+        # Fallback to direct LLM call without context
+        answer, llm = await llm_router.acall("acall_llm_with_context", req.question, context_documents=None)
+        sources = []
+        used_context = []
+    
+    logger.info(f"LLM response received from {llm.provider}: {answer[:100]}...")
+    
+    # Check if LLM response contains error
+    if answer.startswith("[LLM ERROR]") or answer.startswith("[ERROR]"):
+        logger.error(f"LLM service error: {answer}")
+        return {
+            "status": "error",
+            "message": f"LLM service error: {answer}"
+        }
+    
+    return ChatResponse(
+        answer=answer,
+        sources=sources,
+        used_context=used_context,
+        llm=llm.model,
+        confidence=1.0,
+        session_id=None  # No session tracking without authentication
+    )
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
     start_time = time.time()
@@ -92,69 +188,15 @@ async def chat(req: ChatRequest):
             logger.warning("Empty topic received")
             raise HTTPException(status_code=400, detail="Topic cannot be empty")
 
-        # Initialize services
-        llm = LLMService(provider="groq")
-        logger.info(f"Initialized LLM service with provider: {llm.provider}, model: {llm.model}")
-        
-        # Try to retrieve relevant context from knowledge base
-        try:
-            logger.info(f"Searching for relevant context for topic: {req.topic}")
-            vector_store = VectorStore()
-            embedding_service = EmbeddingService()
-            
-            # Generate embedding for the question
-            query_embedding = embedding_service.generate_embedding(req.question)
-            
-            # Search for relevant document chunks
-            context_documents = vector_store.search_similar(
-                query_embedding, 
-                topic_filter=req.topic,
-                top_k=3
-            )
-            
-            logger.info(f"Found {len(context_documents)} relevant document chunks")
-            
-            # Call LLM with context
-            answer = llm.call_llm_with_context(req.question, context_documents)
-            
-            # Extract sources from context documents
-            sources = []
-            used_context = []
-            if context_documents:
-                for doc in context_documents:
-                    if doc.get('source'):
-                        sources.append(doc['source'])
-                    if doc.get('content'):
-                        used_context.append(doc['content'][:200] + "..." if len(doc['content']) > 200 else doc['content'])
-                        
-        except Exception as search_error:
-            logger.warning(f"Vector search failed, falling back to direct LLM: {search_error}")
-            # Fallback to direct LLM call without context
-            answer = llm.call_llm_with_context(req.question, context_documents=None)
-            sources = []
-            used_context = []
-        
-        logger.info(f"LLM response received: {answer[:100]}...")
-        
-        # Check if LLM response contains error
-        if answer.startswith("[LLM ERROR]") or answer.startswith("[ERROR]"):
-            logger.error(f"LLM service error: {answer}")
-            return JSONResponse(content={
-                "status": "error",
-                "message": f"LLM service error: {answer}"
-            })
+        # Identical questions arriving together share one embedding, retrieval and LLM call
+        result = await chat_singleflight.do(chat_key(req), lambda: answer_chat(req))
+        if isinstance(result, dict):
+            return JSONResponse(content=result)
 
         process_time = time.time() - start_time
         logger.info(f"Chat response generated successfully in {process_time:.3f}s")
         
-        return ChatResponse(
-            answer=answer,
-            sources=sources,
-            used_context=used_context,
-            llm=llm.model,
-            confidence=1.0,
-            session_id=None  # No session tracking without authentication
-        )
+        return result
         
     except HTTPException:
         raise
@@ -164,4 +206,75 @@ async def chat(req: ChatRequest):
         return JSONResponse(content={
             "status": "error",
             "message": f"Chat error: {str(e)}"  # Show actual error for debugging
-        }) 
\ No newline at end of file
+        }) 
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Server-sent events variant of /chat. Emits a "delta" event per piece of the answer as the
+    provider generates it, then a single "done" event with the full ChatResponse (or an "error" event).
+    """
+    logger.info(f"Streaming chat request - Topic: {req.topic}, Question: {req.question[:50]}...")
+    if not req.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    if not req.topic.strip():
+        raise HTTPException(status_code=400, detail="Topic cannot be empty")
+
+    llm = llm_router.primary()
+    query_embedding = None
+    cached = None
+    context_documents, sources, used_context = None, [], []
+    try:
+        query_embedding = await get_embedding_service().agenerate_embedding(req.question)
+        cached = cached_answer(req.topic, query_embedding)
+        if not cached:
+            context_documents, sources, used_context = await retrieve_context(query_embedding, req.topic)
+    except Exception as search_error:
+        logger.warning(f"Vector search failed, falling back to direct LLM: {search_error}")
+        context_documents, sources, used_context = None, [], []
+
+    async def events():
+        if cached:
+            yield sse_event("delta", {"delta": cached["answer"]})
+            yield sse_event("done", ChatResponse(
+                answer=cached["answer"],
+                sources=cached["sources"],
+                used_context=cached["used_context"],
+                llm=llm.model,
+                confidence=round(cached["score"], 4),
+                session_id=None
+            ).model_dump())
+            return
+        
+        start_time = time.time()
+        answer = ""
+        model = llm.model
+        async for delta, service in llm_router.astream("astream_llm_with_context", req.question, context_documents, topic=req.topic):
+            model = service.model
+            if delta.startswith("[LLM ERROR]") or delta.startswith("[ERROR]"):
+                logger.error(f"LLM service error: {delta}")
+                yield sse_event("error", {"status": "error", "message": f"LLM service error: {delta}"})
+                return
+            if not answer:
+                logger.info(f"First token after {time.time() - start_time:.3f}s")
+            answer += delta
+            yield sse_event("delta", {"delta": delta})
+        
+        logger.info(f"Streaming chat response completed in {time.time() - start_time:.3f}s")
+        if context_documents is not None:
+            semantic_answer_cache.add(req.topic, query_embedding, req.question, answer.strip(), sources, used_context)
+        yield sse_event("done", ChatResponse(
+            answer=answer.strip(),
+            sources=sources,
+            used_context=used_context,
+            llm=model,
+            confidence=1.0,
+            session_id=None
+        ).model_dump())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -4,7 +4,18 @@ from typing import Dict, Any
 import psutil
 import os
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
+from app.services.embedding_service import embedding_registry
+from app.services.job_queue import job_queue
+from app.services.http_client import llm_http
+from app.services.llm_cache import llm_response_cache
+from app.services.semantic_cache import semantic_answer_cache
+from app.services.singleflight import chat_singleflight
+from app.services.provider_router import provider_health
+from app.services.rate_governor import llm_governor
+from app.services.context_assembler import context_assembler
+from app.services.llama_server_pool import llama_server_pool
 
 router = APIRouter(tags=["health"])
 
@@ -77,3 +88,35 @@ async def health_check():
         database=db_status,
         storage=storage_info
     )
+
+@router.get("/health/embeddings")
+async def embedding_diagnostics():
+    """
+    Load time and memory footprint of the shared embedding models.
+    """
+    return embedding_registry.get_stats()
+
+@router.get("/health/jobs")
+async def job_queue_diagnostics():
+    """
+    Concurrency limits, queue depth and timings of the job queue lanes.
+    """
+    return await run_in_threadpool(job_queue.get_lane_stats)
+
+@router.get("/health/llm")
+async def llm_http_diagnostics():
+    """
+    Connection pool usage and latency of the hosted LLM provider clients, response cache hit rates,
+    coalesced duplicate requests, per-provider circuit breaker state, rate governor queues,
+    RAG context token budgets and the local llama.cpp server slots.
+    """
+    return dict(
+        llm_http.get_stats(),
+        response_cache=llm_response_cache.get_stats(),
+        semantic_cache=semantic_answer_cache.get_stats(),
+        coalescing=chat_singleflight.get_stats(),
+        routing=provider_health.get_stats(),
+        governor=llm_governor.get_stats(),
+        context=context_assembler.get_stats(),
+        local_servers=llama_server_pool.get_stats()
+    )
\ No newline at end of file
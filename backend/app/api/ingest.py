@@ -1,11 +1,12 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, status, Form
 from sqlalchemy.orm import Session
 from app.db.database import SessionLocal, Document, Topic
-from app.services.embedding_service import EmbeddingService
-from app.services.vector_store import VectorStore
-from app.config import settings
 from app.utils.logger import logger
+import asyncio
+import hashlib
 import os
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
 try:
     import fitz  # PyMuPDF
 except ImportError:
@@ -14,7 +15,7 @@ from datetime import datetime
 from app.db.fts import insert_document_content
 from app.services.cache import cache
 from app.api.upload_progress import send_upload_progress
-from app.services.job_queue import job_queue
+from app.services.job_queue import job_queue, JobContext, JobCancelled, JobPriority
 from app.services.analytics import analytics
 from app.services.pdf_ingestor import pdf_ingestor
 from app.services.cache_service import cache_service
@@ -47,12 +48,24 @@ async def ingest_document(
             content = await file.read()
             buffer.write(content)
         
-        # Submit job to queue
-        job_queue.submit_job(
+        # Submit job to queue; the same PDF for the same topic attaches to the in-flight job
+        submitted_id = await run_in_threadpool(
+            job_queue.submit_job,
             job_id=job_id,
             func=process_ingest_job,
-            args=(temp_path, 0, job_id, topic.name)  # Use dummy user_id 0
+            args=(temp_path, 0, job_id, topic.name, file.filename),  # Use dummy user_id 0
+            priority=JobPriority.INTERACTIVE,
+            submitter="ingest",
+            idempotency_key=f"ingest:{topic.name}:{hashlib.sha256(content).hexdigest()}"
         )
+        if submitted_id != job_id:
+            os.remove(temp_path)
+            return {
+                "message": "Document is already being processed",
+                "job_id": submitted_id,
+                "status": "duplicate",
+                "topic": topic.name
+            }
         
         # Log activity (no user tracking)
         analytics.log_user_activity(
@@ -78,8 +91,13 @@ async def ingest_document(
     finally:
         db.close()
 
-async def process_ingest_job(file_path: str, user_id: int, job_id: str, topic_name: str):
-    """Process document ingestion with progress tracking."""
+async def process_ingest_job(file_path: str, user_id: int, job_id: str, topic_name: str, source_file: Optional[str] = None,
+                             job_context: Optional[JobContext] = None):
+    """
+    Process document ingestion with progress tracking.
+    Runs on the application event loop, so the blocking pipeline is offloaded to a thread.
+    Cancelling the job stops the pipeline after the batch being stored.
+    """
     try:
         # Send initial progress
         await send_upload_progress(user_id, job_id, {
@@ -88,34 +106,30 @@ async def process_ingest_job(file_path: str, user_id: int, job_id: str, topic_na
             "message": "Starting document processing..."
         })
         
-        # Extract text from PDF
+        # Stream pages through extract -> chunk -> embed -> store; report progress between 30% and 90%
         await send_upload_progress(user_id, job_id, {
             "status": "processing", 
             "progress": 30, 
             "message": "Extracting text from PDF..."
         })
         
-        text = pdf_ingestor.extract_text(file_path)
-        if not text:
-            raise Exception("Failed to extract text from PDF")
-        
-        # Generate embeddings
-        await send_upload_progress(user_id, job_id, {
-            "status": "processing", 
-            "progress": 60, 
-            "message": "Generating embeddings..."
-        })
+        loop = asyncio.get_running_loop()
         
-        embeddings = EmbeddingService().generate_embeddings(text)
-        
-        # Store in vector database
-        await send_upload_progress(user_id, job_id, {
-            "status": "processing", 
-            "progress": 80, 
-            "message": "Storing in vector database..."
-        })
+        def report_pages(pages_done: int, page_count: int):
+            asyncio.run_coroutine_threadsafe(send_upload_progress(user_id, job_id, {
+                "status": "processing", 
+                "progress": 30 + int(60 * pages_done / max(page_count, 1)), 
+                "message": f"Embedding and storing page {pages_done} of {page_count}..."
+            }), loop)
+            if job_context:
+                job_context.report(pages_done, page_count, unit="pages")
+                job_context.check_cancelled()
         
-        VectorStore(persist_directory=str(settings.CHROMA_DIR)).add_documents([text], embeddings)
+        result = await run_in_threadpool(
+            pdf_ingestor.ingest_pdf, file_path, topic_name, source_file, report_pages
+        )
+        if not result["chunks"]:
+            raise Exception("Failed to extract text from PDF")
         
         # Update cache
         await send_upload_progress(user_id, job_id, {
@@ -137,6 +151,19 @@ async def process_ingest_job(file_path: str, user_id: int, job_id: str, topic_na
         if os.path.exists(file_path):
             os.remove(file_path)
             
+    except JobCancelled:
+        await send_upload_progress(user_id, job_id, {
+            "status": "cancelled", 
+            "progress": 0, 
+            "message": "Document processing cancelled"
+        })
+        logger.info(f"Job {job_id} cancelled")
+        
+        # Clean up temp file
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    
     except Exception as e:
         error_msg = f"Job failed: {str(e)}"
         await send_upload_progress(user_id, job_id, {
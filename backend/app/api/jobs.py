@@ -4,6 +4,7 @@ from app.auth.models import User
 from app.services.job_queue import job_queue, JobStatus
 from app.utils.logger import logger
 from typing import List, Dict, Any
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
@@ -17,14 +18,14 @@ async def list_jobs(
         if status_filter:
             try:
                 job_status = JobStatus(status_filter)
-                jobs = job_queue.list_jobs(job_status)
+                jobs = await run_in_threadpool(job_queue.list_jobs, job_status)
             except ValueError:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Invalid status filter: {status_filter}"
                 )
         else:
-            jobs = job_queue.list_jobs()
+            jobs = await run_in_threadpool(job_queue.list_jobs)
         
         logger.info(f"User {current_user.email} listed {len(jobs)} jobs")
         return jobs
@@ -45,7 +46,7 @@ async def get_job_status(
 ):
     """Get the status of a specific job."""
     try:
-        job_status = job_queue.get_job_status(job_id)
+        job_status = await run_in_threadpool(job_queue.get_job_status, job_id)
         if not job_status:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -69,13 +70,13 @@ async def cancel_job(
     job_id: str,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Cancel a pending job."""
+    """Cancel a pending job or stop a running one at its next checkpoint."""
     try:
-        success = job_queue.cancel_job(job_id)
+        success = await run_in_threadpool(job_queue.cancel_job, job_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Job cannot be cancelled (not found or already running/completed)"
+                detail="Job cannot be cancelled (not found or already finished)"
             )
         
         logger.info(f"User {current_user.email} cancelled job {job_id}")
@@ -96,10 +97,9 @@ async def cleanup_completed_jobs(
 ):
     """Clean up completed and failed jobs (admin only)."""
     try:
-        # This would be implemented in the job queue to remove old jobs
-        # For now, just log the request
-        logger.info(f"Admin user {current_user.email} requested job cleanup")
-        return {"message": "Job cleanup completed"}
+        removed = await run_in_threadpool(job_queue.cleanup, older_than_seconds=0)
+        logger.info(f"Admin user {current_user.email} cleaned up {removed} jobs")
+        return {"message": "Job cleanup completed", "removed": removed}
         
     except Exception as e:
         logger.error(f"Error during job cleanup: {e}")
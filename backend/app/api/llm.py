@@ -1,8 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from app.services.llm_service import LLMService
+from app.services.provider_router import llm_router
 from app.utils.logger import logger
-from starlette.concurrency import run_in_threadpool
 from typing import List, Optional, Dict, Any
 import time
 import json
@@ -30,12 +29,10 @@ async def create_completion(request: CompletionRequest):
     start_time = time.time()
     
     try:
-        llm = LLMService(provider="groq")
-        
-        # Generate completion
+        # Generate completion on the first healthy provider
         logger.info("LLM completion requested")
-        response_text = await run_in_threadpool(
-            llm.call_llm, 
+        response_text, llm = await llm_router.acall(
+            "acall_llm",
             request.prompt, 
             request.max_tokens,
             request.temperature
@@ -80,8 +77,6 @@ async def create_chat_completion(request: dict):
     start_time = time.time()
     
     try:
-        llm = LLMService(provider="groq")
-        
         # Extract messages from request
         messages = request.get("messages", [])
         if not messages:
@@ -99,8 +94,8 @@ async def create_chat_completion(request: dict):
         
         # Generate response
         logger.info("Chat completion requested")
-        response_text = await run_in_threadpool(
-            llm.call_llm, 
+        response_text, llm = await llm_router.acall(
+            "acall_llm",
             user_message,
             request.get("max_tokens", 1024),
             request.get("temperature", 0.7)
@@ -4,10 +4,11 @@ Provides advanced customization options for LLM responses
 """
 
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from enum import Enum
+import asyncio
 import time
 import json
 
@@ -16,13 +17,16 @@ from app.services.enhanced_llm_service import (
     ResponseTone, 
     ResponseFormat, 
     AudienceLevel,
-    create_student_tutor_response,
-    create_professional_summary,
-    create_step_by_step_guide
+    acreate_student_tutor_response,
+    acreate_professional_summary,
+    acreate_step_by_step_guide
 )
-from app.services.embedding_service import EmbeddingService
-from app.services.vector_store import VectorStore
+from app.api.chat import sse_event
+from app.services.embedding_service import get_embedding_service
+from app.services.provider_router import tailored_llm_router
+from app.services.vector_store import vector_store
 from app.utils.logger import logger
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
@@ -64,6 +68,65 @@ class QuickResponseRequest(BaseModel):
     response_type: str = Field(..., description="student_tutor, professional_summary, or step_by_step")
     grade_level: Optional[str] = Field("high_school", description="For student_tutor type only")
 
+def parse_style(req: TailoredChatRequest) -> Tuple[ResponseTone, ResponseFormat, AudienceLevel]:
+    """Tone, format and audience of a request; an unknown value is a 400"""
+    try:
+        return ResponseTone(req.tone.lower()), ResponseFormat(req.format_type.lower()), AudienceLevel(req.audience_level.lower())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid parameter: {str(e)}")
+
+async def retrieve_context(req: TailoredChatRequest) -> Tuple[List[Dict], List[str], List[str]]:
+    """Context documents for the question, with the sources and context snippets shown to the user"""
+    context_documents = []
+    sources = []
+    used_context = []
+    
+    if req.use_context:
+        try:
+            logger.info(f"Searching for relevant context for topic: {req.topic}")
+            embedding_service = get_embedding_service()
+            
+            # Generate embedding for the question
+            query_embedding = await embedding_service.agenerate_embedding(req.question)
+            
+            # Search for relevant document chunks
+            context_documents = await run_in_threadpool(
+                vector_store.search_similar,
+                query_embedding,
+                topic_filter=req.topic,
+                top_k=3
+            )
+            
+            logger.info(f"Found {len(context_documents)} relevant document chunks")
+            
+            # Extract sources and context
+            if context_documents:
+                for doc in context_documents:
+                    if doc.get('source'):
+                        sources.append(doc['source'])
+                    if doc.get('content'):
+                        used_context.append(doc['content'][:200] + "..." if len(doc['content']) > 200 else doc['content'])
+                        
+        except Exception as search_error:
+            logger.warning(f"Vector search failed: {search_error}")
+            context_documents = []
+    return context_documents, sources, used_context
+
+def response_config(req: TailoredChatRequest, provider: str) -> Dict[str, Any]:
+    """Response configuration details echoed back to the client"""
+    return {
+        "tone": req.tone,
+        "format": req.format_type,
+        "audience_level": req.audience_level,
+        "subject_area": req.topic,
+        "custom_instructions": req.custom_instructions,
+        "persona": req.persona,
+        "max_tokens": req.max_tokens,
+        "temperature": req.temperature,
+        "used_context": req.use_context,
+        "provider": provider
+    }
+
 @router.post("/chat/tailored", response_model=TailoredChatResponse)
 async def tailored_chat(req: TailoredChatRequest):
     """
@@ -77,55 +140,12 @@ async def tailored_chat(req: TailoredChatRequest):
         if not req.question.strip():
             raise HTTPException(status_code=400, detail="Question cannot be empty")
         
-        # Validate enum values
-        try:
-            tone = ResponseTone(req.tone.lower())
-            format_type = ResponseFormat(req.format_type.lower())
-            audience_level = AudienceLevel(req.audience_level.lower())
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=f"Invalid parameter: {str(e)}")
-        
-        # Initialize enhanced LLM service
-        llm = EnhancedLLMService(provider="groq")
-        logger.info(f"Initialized enhanced LLM service with provider: {llm.provider}")
-        
-        # Retrieve context documents if requested
-        context_documents = []
-        sources = []
-        used_context = []
-        
-        if req.use_context:
-            try:
-                logger.info(f"Searching for relevant context for topic: {req.topic}")
-                vector_store = VectorStore()
-                embedding_service = EmbeddingService()
-                
-                # Generate embedding for the question
-                query_embedding = embedding_service.generate_embedding(req.question)
-                
-                # Search for relevant document chunks
-                context_documents = vector_store.search_similar(
-                    query_embedding, 
-                    topic_filter=req.topic,
-                    top_k=3
-                )
-                
-                logger.info(f"Found {len(context_documents)} relevant document chunks")
-                
-                # Extract sources and context
-                if context_documents:
-                    for doc in context_documents:
-                        if doc.get('source'):
-                            sources.append(doc['source'])
-                        if doc.get('content'):
-                            used_context.append(doc['content'][:200] + "..." if len(doc['content']) > 200 else doc['content'])
-                            
-            except Exception as search_error:
-                logger.warning(f"Vector search failed: {search_error}")
-                context_documents = []
+        tone, format_type, audience_level = parse_style(req)
+        context_documents, sources, used_context = await retrieve_context(req)
         
         # Generate tailored response
-        answer = llm.call_llm_tailored(
+        answer, llm = await tailored_llm_router.acall(
+            "acall_llm_tailored",
             prompt=req.question,
             tone=tone,
             format_type=format_type,
@@ -148,26 +168,12 @@ async def tailored_chat(req: TailoredChatRequest):
         processing_time = time.time() - start_time
         logger.info(f"Tailored chat response generated successfully in {processing_time:.3f}s")
         
-        # Response configuration details
-        response_config = {
-            "tone": req.tone,
-            "format": req.format_type,
-            "audience_level": req.audience_level,
-            "subject_area": req.topic,
-            "custom_instructions": req.custom_instructions,
-            "persona": req.persona,
-            "max_tokens": req.max_tokens,
-            "temperature": req.temperature,
-            "used_context": req.use_context,
-            "provider": llm.provider
-        }
-        
         return TailoredChatResponse(
             answer=answer,
             sources=sources,
             used_context=used_context,
             llm_model=llm.model,
-            response_config=response_config,
+            response_config=response_config(req, llm.provider),
             confidence=0.95,  # Could be calculated based on context relevance
             session_id=req.session_id,
             processing_time=processing_time
@@ -180,6 +186,62 @@ async def tailored_chat(req: TailoredChatRequest):
         logger.error(error_msg, exc_info=True)
         raise HTTPException(status_code=500, detail=error_msg)
 
+@router.post("/chat/tailored/stream")
+async def tailored_chat_stream(req: TailoredChatRequest):
+    """
+    Server-sent events variant of /chat/tailored. Emits a "delta" event per piece of the answer as the
+    provider generates it, then a single "done" event with the full TailoredChatResponse (or an "error" event).
+    """
+    start_time = time.time()
+    logger.info(f"Streaming tailored chat request - Topic: {req.topic}, Tone: {req.tone}, Format: {req.format_type}")
+    if not req.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    tone, format_type, audience_level = parse_style(req)
+    context_documents, sources, used_context = await retrieve_context(req)
+    
+    async def events():
+        answer = ""
+        llm = tailored_llm_router.primary()
+        async for delta, llm in tailored_llm_router.astream(
+            "astream_llm_tailored",
+            prompt=req.question,
+            tone=tone,
+            format_type=format_type,
+            audience_level=audience_level,
+            subject_area=req.topic,
+            custom_instructions=req.custom_instructions,
+            persona=req.persona,
+            max_tokens=req.max_tokens,
+            temperature=req.temperature,
+            context_documents=context_documents if req.use_context else None
+        ):
+            if delta.startswith("[LLM ERROR]") or delta.startswith("[ERROR]"):
+                logger.error(f"LLM service error: {delta}")
+                yield sse_event("error", {"status": "error", "message": f"LLM service error: {delta}"})
+                return
+            answer += delta
+            yield sse_event("delta", {"delta": delta})
+        
+        processing_time = time.time() - start_time
+        logger.info(f"Streaming tailored chat response completed in {processing_time:.3f}s")
+        yield sse_event("done", TailoredChatResponse(
+            answer=answer.strip(),
+            sources=sources,
+            used_context=used_context,
+            llm_model=llm.model,
+            response_config=response_config(req, llm.provider),
+            confidence=0.95,
+            session_id=req.session_id,
+            processing_time=processing_time
+        ).model_dump())
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/chat/quick")
 async def quick_response(req: QuickResponseRequest):
     """
@@ -190,11 +252,11 @@ async def quick_response(req: QuickResponseRequest):
     
     try:
         if req.response_type == "student_tutor":
-            answer = create_student_tutor_response(req.question, req.subject, req.grade_level)
+            answer = await acreate_student_tutor_response(req.question, req.subject, req.grade_level)
         elif req.response_type == "professional_summary":
-            answer = create_professional_summary(req.question, req.subject)
+            answer = await acreate_professional_summary(req.question, req.subject)
         elif req.response_type == "step_by_step":
-            answer = create_step_by_step_guide(req.question, req.subject)
+            answer = await acreate_step_by_step_guide(req.question, req.subject)
         else:
             raise HTTPException(status_code=400, detail="Invalid response_type. Use: student_tutor, professional_summary, or step_by_step")
         
@@ -243,29 +305,24 @@ async def get_response_examples():
     
     llm = EnhancedLLMService(provider="groq")
     
-    examples = {}
+    def shorten(response):
+        return response[:150] + "..." if len(response) > 150 else response
     
-    # Different tones
-    examples["tones"] = {}
-    for tone in [ResponseTone.ACADEMIC, ResponseTone.FRIENDLY, ResponseTone.CONCISE]:
-        response = llm.call_llm_tailored(
-            prompt=sample_question,
-            tone=tone,
-            subject_area=subject,
-            max_tokens=200
-        )
-        examples["tones"][tone.value] = response[:150] + "..." if len(response) > 150 else response
+    tones = [ResponseTone.ACADEMIC, ResponseTone.FRIENDLY, ResponseTone.CONCISE]
+    formats = [ResponseFormat.BULLET_POINTS, ResponseFormat.STEP_BY_STEP, ResponseFormat.SUMMARY]
     
-    # Different formats
-    examples["formats"] = {}
-    for fmt in [ResponseFormat.BULLET_POINTS, ResponseFormat.STEP_BY_STEP, ResponseFormat.SUMMARY]:
-        response = llm.call_llm_tailored(
-            prompt=sample_question,
-            format_type=fmt,
-            subject_area=subject,
-            max_tokens=200
-        )
-        examples["formats"][fmt.value] = response[:150] + "..." if len(response) > 150 else response
+    # All six completions are in flight at once
+    responses = await asyncio.gather(
+        *(llm.acall_llm_tailored(prompt=sample_question, tone=tone, subject_area=subject, max_tokens=200) for tone in tones),
+        *(llm.acall_llm_tailored(prompt=sample_question, format_type=fmt, subject_area=subject, max_tokens=200) for fmt in formats)
+    )
+    
+    examples = {
+        # Different tones
+        "tones": {tone.value: shorten(response) for tone, response in zip(tones, responses[:len(tones)])},
+        # Different formats
+        "formats": {fmt.value: shorten(response) for fmt, response in zip(formats, responses[len(tones):])}
+    }
     
     return {
         "question": sample_question,
@@ -4,11 +4,12 @@ from app.db.database import get_db
 from app.auth.dependencies import get_current_active_user
 from app.auth.models import User
 from app.models.chat import ChatSession, ChatMessage
-from app.services.embedding_service import EmbeddingService
-from app.services.vector_store import VectorStore
-from app.services.llm_service import LLMService
+from app.services.embedding_service import get_embedding_service
+from app.services.vector_store import vector_store
+from app.services.provider_router import llm_router
 from app.config import settings
 from app.utils.logger import logger
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 import json
 
@@ -59,12 +60,11 @@ async def websocket_chat(
             db.commit()
             db.refresh(user_message)
             
-            # RAG pipeline (streaming simulation)
-            embedder = EmbeddingService()
-            vector_store = VectorStore()
-            llm = LLMService(provider="groq")
-            q_emb = embedder.embed_texts([question])[0]
-            results = vector_store.similarity_search(topic, q_emb, settings.TOP_K_RESULTS)
+            # RAG pipeline
+            embedder = get_embedding_service()
+            llm = llm_router.primary()
+            q_emb = await embedder.agenerate_embedding(question)
+            results = await run_in_threadpool(vector_store.query, topic, q_emb, settings.TOP_K_RESULTS)
             docs = results.get('documents', [[]])[0]
             metadatas = results.get('metadatas', [[]])[0]
             distances = results.get('distances', [[]])[0]
@@ -77,11 +77,20 @@ async def websocket_chat(
                 context = "\n".join(docs)
                 sources = [f"{m.get('source_file','')}:page {m.get('page','')}" for m in metadatas]
                 prompt = f"Context:\n{context}\n\nQuestion: {question}\nAnswer:"
-                # Simulate streaming by sending partial responses
+                # Relay each delta as the provider generates it; partial carries the answer so far
                 answer = ""
-                for chunk in llm.call_llm(prompt).split():
-                    answer += chunk + " "
-                    await websocket.send_text(json.dumps({"partial": answer.strip()}))
+                error = None
+                async for delta, llm in llm_router.astream("astream_llm", prompt):
+                    if delta.startswith("[LLM ERROR]") or delta.startswith("[ERROR]"):
+                        error = delta
+                        break
+                    answer += delta
+                    await websocket.send_text(json.dumps({"delta": delta, "partial": answer}))
+                if error:
+                    # Nothing is persisted for a failed generation
+                    logger.error(f"LLM service error: {error}")
+                    await websocket.send_text(json.dumps({"error": error}))
+                    continue
                 confidence = 1.0 - distances[0] if distances else None
                 used_context = docs
             # Save assistant message
@@ -92,7 +101,7 @@ async def websocket_chat(
                 confidence=confidence,
                 sources=json.dumps(sources) if sources else None,
                 used_context=json.dumps(used_context) if used_context else None,
-                llm_model=llm.llm_name
+                llm_model=llm.model
             )
             db.add(assistant_message)
             db.commit()
@@ -102,7 +111,7 @@ async def websocket_chat(
                 "answer": answer.strip(),
                 "sources": sources,
                 "used_context": used_context,
-                "llm": llm.llm_name,
+                "llm": llm.model,
                 "confidence": confidence
             }))
     except WebSocketDisconnect:
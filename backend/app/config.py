@@ -30,11 +30,122 @@ class Settings:
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "250"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "40"))
+    # Comma-separated list of models loaded once per process and shared by all routers
+    EMBEDDING_MODELS: list = [m.strip() for m in os.getenv("EMBEDDING_MODELS", EMBEDDING_MODEL).split(",") if m.strip()]
+    EMBEDDING_WARMUP: bool = os.getenv("EMBEDDING_WARMUP", "True").lower() == "true"
+    
+    # Cross-request micro-batching of query embeddings
+    EMBEDDING_BATCHING_ENABLED: bool = os.getenv("EMBEDDING_BATCHING_ENABLED", "True").lower() == "true"
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+    
+    # Content-addressed on-disk embedding cache
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", str(DATA_DIR / "embedding_cache.db"))
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
     
     # LLM settings
     LLM_MODEL_PATH: str = os.getenv("LLM_MODEL_PATH", "./models/mistral-7b.Q4_K_M.gguf")
     LLAMA_CPP_PATH: str = os.getenv("LLAMA_CPP_PATH", "/usr/local/bin/llama.cpp")
     LLM_NAME: str = os.getenv("LLM_NAME", "Mistral 7B")
+    # Offline backend: a pool of long-lived llama.cpp servers (provider "local") serving LLM_MODEL_PATH.
+    # Add "local" to LLM_PROVIDER_ORDER to route to it, and consider LLM_READ_TIMEOUTS="local=300" on CPU
+    LLAMA_SERVER_ENABLED: bool = os.getenv("LLAMA_SERVER_ENABLED", "False").lower() == "true"
+    LLAMA_SERVER_PATH: str = os.getenv("LLAMA_SERVER_PATH", "/usr/local/bin/llama-server")
+    LLAMA_SERVER_SLOTS: int = int(os.getenv("LLAMA_SERVER_SLOTS", "2"))
+    LLAMA_SERVER_HOST: str = os.getenv("LLAMA_SERVER_HOST", "127.0.0.1")
+    LLAMA_SERVER_BASE_PORT: int = int(os.getenv("LLAMA_SERVER_BASE_PORT", "8081"))
+    # Context size and concurrent sequences per server process; threads 0 lets llama.cpp decide
+    LLAMA_SERVER_CTX_SIZE: int = int(os.getenv("LLAMA_SERVER_CTX_SIZE", "4096"))
+    LLAMA_SERVER_PARALLEL: int = int(os.getenv("LLAMA_SERVER_PARALLEL", "2"))
+    LLAMA_SERVER_THREADS: int = int(os.getenv("LLAMA_SERVER_THREADS", "0"))
+    LLAMA_SERVER_EXTRA_ARGS: str = os.getenv("LLAMA_SERVER_EXTRA_ARGS", "")
+    LLAMA_SERVER_HEALTH_INTERVAL: float = float(os.getenv("LLAMA_SERVER_HEALTH_INTERVAL", "5"))  # seconds
+    LLAMA_SERVER_HEALTH_TIMEOUT: float = float(os.getenv("LLAMA_SERVER_HEALTH_TIMEOUT", "2"))  # seconds
+    LLAMA_SERVER_MAX_HEALTH_FAILURES: int = int(os.getenv("LLAMA_SERVER_MAX_HEALTH_FAILURES", "3"))
+    LLAMA_SERVER_STARTUP_TIMEOUT: float = float(os.getenv("LLAMA_SERVER_STARTUP_TIMEOUT", "300"))  # seconds
+    LLAMA_SERVER_MAX_BACKOFF: float = float(os.getenv("LLAMA_SERVER_MAX_BACKOFF", "60"))  # seconds
+    # Held by the one uvicorn worker that launches the servers; the other workers share them
+    LLAMA_SERVER_LOCK_FILE: str = os.getenv("LLAMA_SERVER_LOCK_FILE", str(DATA_DIR / "llama-server.lock"))
+    
+    # Pooled keep-alive HTTP clients for the hosted LLM providers
+    LLM_HTTP_POOL_SIZE: int = int(os.getenv("LLM_HTTP_POOL_SIZE", "20"))
+    # Connections per provider for the async client used by the API routes
+    LLM_ASYNC_POOL_SIZE: int = int(os.getenv("LLM_ASYNC_POOL_SIZE", "200"))
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_READ_TIMEOUT: float = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+    # Per-provider read timeouts, e.g. "groq=30,openrouter=60,huggingface=90"
+    LLM_READ_TIMEOUTS: dict = {
+        name.strip(): float(value)
+        for name, _, value in (item.partition("=") for item in os.getenv("LLM_READ_TIMEOUTS", "").split(","))
+        if name.strip() and value
+    }
+    
+    # Provider routing: failover order, circuit breakers on latency/error EWMAs, optional hedged requests
+    LLM_PROVIDER_ORDER: list = [
+        provider.strip() for provider in os.getenv("LLM_PROVIDER_ORDER", "groq,openrouter,huggingface").split(",")
+        if provider.strip()
+    ]
+    LLM_EWMA_ALPHA: float = float(os.getenv("LLM_EWMA_ALPHA", "0.2"))
+    LLM_BREAKER_MIN_SAMPLES: int = int(os.getenv("LLM_BREAKER_MIN_SAMPLES", "5"))
+    LLM_BREAKER_ERROR_RATE: float = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+    LLM_BREAKER_LATENCY: float = float(os.getenv("LLM_BREAKER_LATENCY", "20"))  # seconds
+    LLM_BREAKER_COOLDOWN: float = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # seconds
+    LLM_LATENCY_WINDOW: int = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "False").lower() == "true"
+    # Hedge delay before a provider has enough samples for a p95, and the floor once it has
+    LLM_HEDGE_DELAY: float = float(os.getenv("LLM_HEDGE_DELAY", "3"))
+    LLM_HEDGE_MIN_DELAY: float = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+
+    # Client-side quota governor, e.g. LLM_RPM_LIMITS="groq=30,openrouter=20" and LLM_TPM_LIMITS="groq=6000";
+    # providers without a configured limit are governed by the rate-limit headers they return
+    LLM_RPM_LIMITS: dict = {
+        name.strip(): float(value)
+        for name, _, value in (item.partition("=") for item in os.getenv("LLM_RPM_LIMITS", "").split(","))
+        if name.strip() and value
+    }
+    LLM_TPM_LIMITS: dict = {
+        name.strip(): float(value)
+        for name, _, value in (item.partition("=") for item in os.getenv("LLM_TPM_LIMITS", "").split(","))
+        if name.strip() and value
+    }
+    # Longest a request may queue for quota before it is shed, and how many may queue per provider
+    LLM_GOVERNOR_MAX_WAIT: float = float(os.getenv("LLM_GOVERNOR_MAX_WAIT", "10"))  # seconds
+    LLM_GOVERNOR_MAX_QUEUE: int = int(os.getenv("LLM_GOVERNOR_MAX_QUEUE", "100"))
+    # Pause after a 429 that carries no Retry-After header
+    LLM_GOVERNOR_DEFAULT_BACKOFF: float = float(os.getenv("LLM_GOVERNOR_DEFAULT_BACKOFF", "5"))  # seconds
+
+    # Token-budgeted RAG context: context window per model (default for unlisted models), a cap on
+    # context tokens per prompt, tokens kept free beyond max_tokens, and the smallest chunk worth trimming to
+    LLM_CONTEXT_WINDOW: int = int(os.getenv("LLM_CONTEXT_WINDOW", "8192"))
+    LLM_CONTEXT_WINDOWS: dict = {
+        name.strip(): int(value)
+        for name, _, value in (item.rpartition("=") for item in os.getenv(
+            "LLM_CONTEXT_WINDOWS",
+            "mixtral-8x7b-32768=32768,qwen/qwen-2.5-72b-instruct=32768,HuggingFaceH4/zephyr-7b-beta=4096"
+        ).split(","))
+        if name.strip() and value
+    }
+    LLM_CONTEXT_BUDGET: int = int(os.getenv("LLM_CONTEXT_BUDGET", "1500"))
+    LLM_CONTEXT_SAFETY_MARGIN: int = int(os.getenv("LLM_CONTEXT_SAFETY_MARGIN", "64"))
+    LLM_CONTEXT_MIN_CHUNK_TOKENS: int = int(os.getenv("LLM_CONTEXT_MIN_CHUNK_TOKENS", "48"))
+
+    # Exact-match LLM response cache: Redis when REDIS_ENABLED, otherwise a per-process LRU
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", "3600"))
+    # Per-topic TTLs in seconds, e.g. "History=86400,Technology=600"
+    LLM_CACHE_TOPIC_TTLS: dict = {
+        name.strip(): int(value)
+        for name, _, value in (item.partition("=") for item in os.getenv("LLM_CACHE_TOPIC_TTLS", "").split(","))
+        if name.strip() and value
+    }
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+    # Semantic answer cache: reuse an answer when a new question in the same topic is this similar (cosine).
+    # Off by default: a false hit serves a wrong answer, so pick the threshold for the deployed embedding
+    # model from scripts/evaluate_semantic_cache.py before enabling it
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "False").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
     
     # API settings
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", str(50 * 1024 * 1024)))  # 50MB
@@ -47,6 +158,53 @@ class Settings:
     SIMILARITY_THRESHOLD: float = float(os.getenv("SIMILARITY_THRESHOLD", "0.6"))
     TOP_K_RESULTS: int = int(os.getenv("TOP_K_RESULTS", "5"))
     
+    # Cross-topic fan-out when no topic filter is given
+    VECTOR_SEARCH_PARALLEL: bool = os.getenv("VECTOR_SEARCH_PARALLEL", "True").lower() == "true"
+    VECTOR_SEARCH_MAX_WORKERS: int = int(os.getenv("VECTOR_SEARCH_MAX_WORKERS", "8"))
+    VECTOR_SEARCH_TIMEOUT: float = float(os.getenv("VECTOR_SEARCH_TIMEOUT", "2.0"))  # seconds per collection query, from when it starts
+    
+    # Vector store backend: "chroma" or "numpy" (in-process matrices)
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "chroma").lower()
+    VECTOR_INDEX_DIR: str = os.getenv("VECTOR_INDEX_DIR", str(CHROMA_DIR / "native"))
+    VECTOR_INDEX_DTYPE: str = os.getenv("VECTOR_INDEX_DTYPE", "float32")  # or float16
+    VECTOR_SEGMENT_ROWS: int = int(os.getenv("VECTOR_SEGMENT_ROWS", "16384"))  # rows per file on disk
+    
+    # Approximate nearest neighbour (HNSW) mode for large topics in the NumPy backend
+    ANN_ENABLED: bool = os.getenv("ANN_ENABLED", "True").lower() == "true"
+    ANN_MIN_VECTORS: int = int(os.getenv("ANN_MIN_VECTORS", "200000"))
+    ANN_M: int = int(os.getenv("ANN_M", "16"))
+    ANN_EF_CONSTRUCTION: int = int(os.getenv("ANN_EF_CONSTRUCTION", "200"))
+    ANN_EF_SEARCH: int = int(os.getenv("ANN_EF_SEARCH", "64"))
+    ANN_REBUILD_DELETED_RATIO: float = float(os.getenv("ANN_REBUILD_DELETED_RATIO", "0.2"))  # deleted/live labels before compacting
+    
+    # Quantised storage in the NumPy backend: "none", "int8" or "pq"
+    VECTOR_QUANTIZATION: str = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+    PQ_SUBSPACES: int = int(os.getenv("PQ_SUBSPACES", "256"))
+    PQ_MIN_TRAIN_VECTORS: int = int(os.getenv("PQ_MIN_TRAIN_VECTORS", "4096"))
+    QUANTIZATION_RERANK_FACTOR: int = int(os.getenv("QUANTIZATION_RERANK_FACTOR", "4"))
+    
+    # Streaming PDF ingestion: chunks per embed/store batch and capacity of each stage queue
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+    
+    # Multi-process PDF text extraction; 1 worker extracts in-process. Defaults leave a core for the API
+    PDF_EXTRACT_WORKERS: int = int(os.getenv("PDF_EXTRACT_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) - 1)))))
+    PDF_EXTRACT_PAGES_PER_TASK: int = int(os.getenv("PDF_EXTRACT_PAGES_PER_TASK", "16"))
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+    
+    # Durable job queue (SQLite, shared by every uvicorn worker)
+    JOB_QUEUE_DB_PATH: str = os.getenv("JOB_QUEUE_DB_PATH", str(DB_PATH))
+    JOB_QUEUE_WORKERS: int = int(os.getenv("JOB_QUEUE_WORKERS", "4"))
+    # Processes in the CPU lane's pool; one uvicorn worker per job database runs the lane, so this is per host
+    JOB_CPU_WORKERS: int = int(os.getenv("JOB_CPU_WORKERS", str(max(1, min(2, (os.cpu_count() or 1) - 1)))))
+    JOB_CPU_PRELOAD_EMBEDDINGS: bool = os.getenv("JOB_CPU_PRELOAD_EMBEDDINGS", "True").lower() == "true"
+    JOB_ASYNC_CONCURRENCY: int = int(os.getenv("JOB_ASYNC_CONCURRENCY", "8"))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_HEARTBEAT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETENTION_HOURS: float = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    
     # Server settings
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
@@ -8,6 +8,11 @@ from app.middleware.rate_limit import rate_limit_middleware
 from app.services.job_queue import job_queue
 from app.db.fts import setup_fts
 from app.services.analytics import analytics as analytics_service
+from app.services.embedding_service import embedding_registry
+from app.services.pdf_extraction import pdf_extraction_pool
+from app.services.http_client import llm_http
+from app.services.llama_server_pool import llama_server_pool
+from starlette.concurrency import run_in_threadpool
 import time
 
 app = FastAPI(
@@ -112,16 +117,38 @@ async def startup_event():
     
     # Start the job queue
     job_queue.start()
+    await job_queue.start_async()
     logger.info("Job queue started")
     
     # Setup FTS
     setup_fts()
     logger.info("FTS5 for documents is ready")
+    
+    # Load embedding models once so chat requests never pay the load cost
+    if settings.EMBEDDING_WARMUP:
+        await run_in_threadpool(embedding_registry.warm_up)
+        logger.info("Embedding models warmed up")
+    
+    # Offline backend: llama.cpp servers load the model once and stay up between questions;
+    # one worker launches them and every worker shares them
+    if settings.LLAMA_SERVER_ENABLED:
+        await run_in_threadpool(llama_server_pool.start)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Elimu Hub API...")
     
     # Stop the job queue
+    await job_queue.stop_async()
     job_queue.stop()
-    logger.info("Job queue stopped") 
\ No newline at end of file
+    logger.info("Job queue stopped")
+    
+    # Stop PDF extraction worker processes
+    pdf_extraction_pool.shutdown()
+    
+    # Close pooled LLM provider connections
+    llm_http.close()
+    await llm_http.aclose()
+    
+    # Stop local llama.cpp servers
+    await run_in_threadpool(llama_server_pool.stop) 
\ No newline at end of file
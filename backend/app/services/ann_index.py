@@ -0,0 +1,191 @@
+import json
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.config import settings
+from app.utils.logger import logger
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+INDEX_FILE = "hnsw.bin"
+LABELS_FILE = "hnsw_labels.npy"
+PARAMS_FILE = "ann_params.json"
+
+def ann_available() -> bool:
+    return hnswlib is not None
+
+def load_ann_params(directory: Path) -> Dict[str, int]:
+    """Per-topic HNSW parameters, falling back to the global settings."""
+    params = {
+        "M": settings.ANN_M,
+        "ef_construction": settings.ANN_EF_CONSTRUCTION,
+        "ef_search": settings.ANN_EF_SEARCH
+    }
+    path = Path(directory) / PARAMS_FILE
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            params.update(json.load(f))
+    return params
+
+def save_ann_params(directory: Path, params: Dict[str, int]):
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    with open(Path(directory) / PARAMS_FILE, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+
+class HNSWIndex:
+    """
+    HNSW graph over a topic's normalised embeddings. Graph labels are stable: removing matrix rows
+    only marks their labels deleted, and a row -> label array (saved next to the graph) maps between
+    graph labels and the current matrix rows.
+    """
+
+    def __init__(self, directory: Path, dim: int, M: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        if hnswlib is None:
+            raise RuntimeError("hnswlib is not installed; ANN index mode is unavailable")
+        self.directory = Path(directory)
+        self.dim = dim
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index = None
+        self._current_ef = ef_search
+        self._row_labels = np.empty(0, dtype=np.int64)
+        self._label_rows = np.empty(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self.directory / INDEX_FILE
+
+    @property
+    def labels_path(self) -> Path:
+        return self.directory / LABELS_FILE
+
+    @property
+    def label_rows(self) -> np.ndarray:
+        """Matrix row of each graph label, -1 once deleted; replaced rather than modified on changes"""
+        return self._label_rows
+
+    def _set_rows(self, row_labels: np.ndarray):
+        label_rows = np.full(self._index.get_current_count(), -1, dtype=np.int64)
+        label_rows[row_labels] = np.arange(row_labels.shape[0])
+        self._row_labels = row_labels
+        self._label_rows = label_rows
+
+    def _new_index(self, capacity: int):
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(max_elements=max(capacity, 1), ef_construction=self.ef_construction, M=self.M)
+        index.set_ef(self.ef_search)
+        return index
+
+    def build(self, vectors: np.ndarray):
+        """Build the graph from scratch over every row."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        index = self._new_index(vectors.shape[0])
+        if vectors.shape[0]:
+            index.add_items(vectors, np.arange(vectors.shape[0]))
+        with self._lock:
+            self._index = index
+            self._current_ef = self.ef_search
+            self._set_rows(np.arange(vectors.shape[0], dtype=np.int64))
+
+    def add(self, rows: List[int], vectors: np.ndarray):
+        """Overwrite existing rows or append rows at the end of the matrix, growing the graph when full."""
+        if self._index is None:
+            raise RuntimeError("HNSW index has not been built")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            live = self._row_labels.shape[0]
+            appended = sum(1 for row in rows if row >= live)
+            next_label = self._index.get_current_count()
+            labels = [int(self._row_labels[row]) if row < live else next_label + row - live for row in rows]
+            capacity = self._index.get_max_elements()
+            if next_label + appended > capacity:
+                self._index.resize_index(max(next_label + appended, capacity * 2))
+            self._index.add_items(vectors, np.asarray(labels))
+            if appended:
+                self._set_rows(np.concatenate([self._row_labels, np.arange(next_label, next_label + appended)]))
+
+    def remove_rows(self, rows: List[int]):
+        """Mark the labels of removed matrix rows deleted; later rows shift down as in the matrix."""
+        if self._index is None or not rows:
+            return
+        with self._lock:
+            for label in self._row_labels[rows]:
+                self._index.mark_deleted(int(label))
+            self._set_rows(np.delete(self._row_labels, rows))
+
+    def set_ef(self, ef_search: int):
+        self.ef_search = ef_search
+        if self._index is not None:
+            with self._lock:
+                self._index.set_ef(ef_search)
+                self._current_ef = ef_search
+
+    def count(self) -> int:
+        """Live rows in the graph"""
+        return self._row_labels.shape[0]
+
+    def deleted(self) -> int:
+        """Labels marked deleted that still occupy the graph"""
+        return self._index.get_current_count() - self.count() if self._index is not None else 0
+
+    def search(self, query: np.ndarray, top_k: int, label_rows: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Approximate top-k row numbers for a normalised query. Pass the label_rows taken alongside a
+        snapshot of the matrix to map labels to that snapshot's rows.
+        """
+        label_rows = self._label_rows if label_rows is None else label_rows
+        if self._index is None:
+            return []
+        k = min(top_k, self.count())
+        if k <= 0:
+            return []
+        # ef must be at least k for hnswlib to return k results
+        ef = max(self.ef_search, k)
+        if ef != self._current_ef:
+            with self._lock:
+                self._index.set_ef(ef)
+                self._current_ef = ef
+        labels, _ = self._index.knn_query(np.asarray(query, dtype=np.float32), k=k)
+        # Labels added or deleted after the snapshot was taken have no row in it
+        rows = [int(label_rows[label]) for label in labels[0] if label < label_rows.shape[0]]
+        return [row for row in rows if row >= 0]
+
+    def save(self):
+        if self._index is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._index.save_index(str(self.path))
+            with open(self.labels_path, "wb") as f:
+                np.save(f, self._row_labels)
+
+    def load(self, capacity: int) -> bool:
+        """Load a saved graph and its row labels; returns False when either is missing."""
+        if not self.path.exists() or not self.labels_path.exists():
+            return False
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.load_index(str(self.path), max_elements=max(capacity, 1))
+        index.set_ef(self.ef_search)
+        row_labels = np.load(self.labels_path)
+        if row_labels.shape[0] and row_labels.max() >= index.get_current_count():
+            return False
+        with self._lock:
+            self._index = index
+            self._current_ef = self.ef_search
+            self._set_rows(row_labels)
+        logger.info(f"Loaded HNSW index from {self.path}")
+        return True
+
+    def remove_files(self):
+        for path in (self.path, self.labels_path):
+            if path.exists():
+                path.unlink()
+        self._index = None
+        self._row_labels = np.empty(0, dtype=np.int64)
+        self._label_rows = np.empty(0, dtype=np.int64)
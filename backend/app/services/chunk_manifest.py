@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.utils.file_lock import file_lock
+
+MANIFEST_DIR = "manifests"
+
+def chunk_ids(chunks: List[Dict], seen: Optional[Dict[str, int]] = None) -> List[str]:
+    """
+    Content-derived chunk IDs: sha256 of source file and chunk text.
+    Repeated text within one file gets an occurrence suffix so IDs stay unique.
+    Pass the same seen dict across calls when a document's chunks arrive in batches.
+    """
+    seen = {} if seen is None else seen
+    ids = []
+    for chunk in chunks:
+        digest = hashlib.sha256(f"{chunk['source_file']}\0{chunk['text']}".encode("utf-8")).hexdigest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+    return ids
+
+def chunk_metadata(chunk: Dict) -> Dict:
+    return {"source_file": chunk["source_file"], "page": chunk["page"]}
+
+class DocumentDiff:
+    """What re-ingesting a document changes relative to its manifest entry."""
+
+    def __init__(self, ids: List[str], new: List[int], moved: List[int], stale: List[str], known: bool):
+        self.ids = ids          # IDs of every chunk, in document order
+        self.new = new          # indexes of chunks that must be embedded and written
+        self.moved = moved      # indexes of unchanged chunks whose page number changed
+        self.stale = stale      # IDs to delete
+        self.known = known      # False when the document has no manifest entry yet
+
+    @property
+    def unchanged(self) -> int:
+        return len(self.ids) - len(self.new)
+
+class ChunkManifest:
+    """
+    Per-topic JSON manifest mapping each source document to its chunk IDs and pages. Updates
+    read, modify and replace the file under a lock file, so job threads and other processes
+    (e.g. further uvicorn workers) sharing the directory never lose each other's entries.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory) / MANIFEST_DIR
+
+    def _path(self, topic: str) -> Path:
+        return self.directory / (re.sub(r"[^A-Za-z0-9._-]", "_", topic) + ".json")
+
+    def _lock(self, topic: str):
+        return file_lock(self._path(topic).with_suffix(".lock"))
+
+    def load(self, topic: str) -> Dict[str, Dict[str, int]]:
+        path = self._path(topic)
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, topic: str, manifest: Dict[str, Dict[str, int]]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(topic)
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def version(self, topic: str) -> int:
+        """Changes whenever a document in the topic is added, changed or removed; 0 for an empty topic."""
+        try:
+            return self._path(topic).stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def documents(self, topic: str) -> List[str]:
+        return list(self.load(topic))
+
+    def diff(self, topic: str, source_file: str, chunks: List[Dict]) -> DocumentDiff:
+        ids = chunk_ids(chunks)
+        entry = self.load(topic).get(source_file)
+        previous = entry or {}
+        new, moved = [], []
+        for i, (chunk_id, chunk) in enumerate(zip(ids, chunks)):
+            page = previous.get(chunk_id)
+            if page is None:
+                new.append(i)
+            elif page != chunk["page"]:
+                moved.append(i)
+        current = set(ids)
+        stale = [chunk_id for chunk_id in previous if chunk_id not in current]
+        return DocumentDiff(ids, new, moved, stale, known=entry is not None)
+
+    def record(self, topic: str, chunks_by_source: Dict[str, List[Tuple[str, int]]], replace: bool = True):
+        """Store (chunk ID, page) pairs per source; replace=False merges into existing entries."""
+        with self._lock(topic):
+            manifest = self.load(topic)
+            for source_file, pairs in chunks_by_source.items():
+                entry = {} if replace else manifest.get(source_file, {})
+                entry.update(dict(pairs))
+                manifest[source_file] = entry
+            self._save(topic, manifest)
+
+    def remove_document(self, topic: str, source_file: str) -> List[str]:
+        """Drop a document's entry and return the chunk IDs it held."""
+        with self._lock(topic):
+            manifest = self.load(topic)
+            entry = manifest.pop(source_file, {})
+            self._save(topic, manifest)
+        return list(entry)
+
+    def remove_topic(self, topic: str):
+        with self._lock(topic):
+            path = self._path(topic)
+            if path.exists():
+                path.unlink()
+
+class ManifestSyncMixin:
+    """
+    Document-level upsert for vector stores that keep a ChunkManifest in self.manifest.
+    Stores provide _upsert_chunks, _update_chunk_metadata, _delete_chunks and _delete_source.
+    """
+
+    def add_documents(self, topic: str, chunks: List[Dict], embeddings: List[Any]):
+        ids = chunk_ids(chunks)
+        self._upsert_chunks(topic, ids, chunks, embeddings)
+        by_source: Dict[str, List[Tuple[str, int]]] = {}
+        for chunk_id, chunk in zip(ids, chunks):
+            by_source.setdefault(chunk["source_file"], []).append((chunk_id, chunk["page"]))
+        self.manifest.record(topic, by_source, replace=False)
+
+    def sync_document(self, topic: str, source_file: str, chunks: List[Dict],
+                      embed_fn: Callable[[List[str]], Any]) -> Dict[str, int]:
+        """
+        Make the topic hold exactly this document's chunks: embed and write only new chunks,
+        refresh page numbers of moved ones and delete chunks that are no longer present.
+        """
+        diff = self.manifest.diff(topic, source_file, chunks)
+        if not diff.known:
+            # Documents ingested before the manifest existed carry positional IDs
+            self._delete_source(topic, source_file)
+
+        if diff.new:
+            new_chunks = [chunks[i] for i in diff.new]
+            embeddings = embed_fn([chunk["text"] for chunk in new_chunks])
+            self._upsert_chunks(topic, [diff.ids[i] for i in diff.new], new_chunks, embeddings)
+        if diff.moved:
+            self._update_chunk_metadata(topic, [diff.ids[i] for i in diff.moved], [chunks[i] for i in diff.moved])
+        if diff.stale:
+            self._delete_chunks(topic, diff.stale)
+
+        self.manifest.record(topic, {source_file: [(chunk_id, chunk["page"]) for chunk_id, chunk in zip(diff.ids, chunks)]})
+        return {"added": len(diff.new), "removed": len(diff.stale), "unchanged": diff.unchanged}
+
+    def begin_document(self, topic: str, source_file: str) -> Dict[str, int]:
+        """Start streaming a document in; returns its previous chunk ID -> page entry."""
+        entry = self.manifest.load(topic).get(source_file)
+        if entry is None:
+            # Documents ingested before the manifest existed carry positional IDs
+            self._delete_source(topic, source_file)
+        return entry or {}
+
+    def write_chunks(self, topic: str, ids: List[str], chunks: List[Dict], embeddings: Any):
+        self._upsert_chunks(topic, ids, chunks, embeddings)
+
+    def update_chunk_pages(self, topic: str, ids: List[str], chunks: List[Dict]):
+        self._update_chunk_metadata(topic, ids, chunks)
+
+    def finish_document(self, topic: str, source_file: str, pairs: List[Tuple[str, int]],
+                        previous: Dict[str, int]) -> int:
+        """Delete chunks the streamed document no longer has and record its manifest entry."""
+        current = {chunk_id for chunk_id, _ in pairs}
+        stale = [chunk_id for chunk_id in previous if chunk_id not in current]
+        if stale:
+            self._delete_chunks(topic, stale)
+        self.manifest.record(topic, {source_file: pairs})
+        return len(stale)
+
+    def abort_document(self, topic: str, source_file: str, pairs: List[Tuple[str, int]], previous: Dict[str, int]):
+        """Keep the chunks written before a streamed ingest stopped tracked, without deleting anything."""
+        entry = dict(previous)
+        entry.update(dict(pairs))
+        if not entry:
+            return
+        self.manifest.record(topic, {source_file: list(entry.items())})
+
+    def delete_document(self, topic: str, source_file: str) -> int:
+        """Remove one document's chunks from the topic; returns how many were deleted."""
+        ids = self.manifest.remove_document(topic, source_file)
+        if ids:
+            self._delete_chunks(topic, ids)
+        else:
+            self._delete_source(topic, source_file)
+        return len(ids)
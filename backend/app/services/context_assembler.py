@@ -0,0 +1,193 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.utils.logger import logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+ENCODING = "cl100k_base"
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_PIECES = re.compile(r"\w+|[^\w\s]")
+# Shorter shared ends between two chunks are more likely coincidence than splitter overlap
+_MIN_OVERLAP = 12
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken when it is installed and its encoding is available offline; otherwise
+    estimates them from words and punctuation, erring on the high side so budgets stay safe.
+    """
+
+    def __init__(self, encoding: str = ENCODING):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                logger.warning(f"tiktoken encoding {encoding} unavailable, estimating token counts: {e}")
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        # BPE vocabularies keep common words whole and split long ones every ~6 characters
+        return sum(1 + (len(piece) - 1) // 6 for piece in _PIECES.findall(text))
+
+def _normalise(sentence: str) -> str:
+    return " ".join(sentence.lower().split())
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right, if at least _MIN_OVERLAP"""
+    for size in range(min(len(left), len(right)), _MIN_OVERLAP - 1, -1):
+        if left[-size:] == right[:size]:
+            return size
+    return 0
+
+def _trim_overlap(text: str, neighbours: List[str]) -> str:
+    """
+    text without the spans it shares with included chunks of the same document. The splitter
+    repeats up to CHUNK_OVERLAP characters, usually a sentence fragment, at the start of the next
+    chunk; the neighbour may come before or after text in the document.
+    """
+    for neighbour in neighbours:
+        text = text[_overlap(neighbour, text):]
+        tail = _overlap(text, neighbour)
+        if tail:
+            text = text[:-tail]
+    return text.strip()
+
+class ContextAssembler:
+    """
+    Builds the CONTEXT block of a RAG prompt within a token budget: chunks are taken greedily by
+    relevance score, the overlap a chunk shares with an included neighbour from the same source is
+    cut, sentences already included by a higher-ranked chunk are dropped, and the chunk that crosses
+    the budget is trimmed at a sentence boundary. The budget is the model's
+    context window less the rest of the prompt, the reserved completion tokens and a safety margin,
+    capped at LLM_CONTEXT_BUDGET.
+    """
+
+    def __init__(self, counter: Optional[TokenCounter] = None):
+        self.counter = counter or TokenCounter()
+        self._lock = threading.Lock()
+        self.assembled = 0
+        self.context_tokens = 0
+        self.chunks_used = 0
+        self.chunks_deduped = 0
+        self.overlaps_trimmed = 0
+        self.chunks_trimmed = 0
+        self.chunks_dropped = 0
+
+    def context_window(self, model: Optional[str]) -> int:
+        if model in settings.LLM_CONTEXT_WINDOWS:
+            return settings.LLM_CONTEXT_WINDOWS[model]
+        if model == settings.LLM_NAME:
+            # llama-server splits its context between the sequences it runs in parallel
+            return settings.LLAMA_SERVER_CTX_SIZE // max(1, settings.LLAMA_SERVER_PARALLEL)
+        return settings.LLM_CONTEXT_WINDOW
+
+    def budget(self, model: Optional[str], max_tokens: int, reserved_text: str = "") -> int:
+        """Tokens left for context once the prompt around it and the completion are accounted for"""
+        available = (self.context_window(model) - max_tokens - self.counter.count(reserved_text)
+                     - settings.LLM_CONTEXT_SAFETY_MARGIN)
+        return max(0, min(settings.LLM_CONTEXT_BUDGET, available))
+
+    def assemble(self, documents: Optional[List[Dict[str, Any]]], model: Optional[str] = None,
+                 max_tokens: int = 512, reserved_text: str = "") -> Tuple[str, List[Dict[str, Any]]]:
+        """Context text for the prompt and the documents that contributed to it"""
+        if not documents:
+            return "", []
+        budget = self.budget(model, max_tokens, reserved_text)
+        ranked = sorted(documents, key=lambda doc: doc.get("score", 0.0), reverse=True)
+
+        seen = set()
+        included: Dict[Any, List[str]] = {}
+        parts: List[str] = []
+        used: List[Dict[str, Any]] = []
+        spent = deduped = overlaps = trimmed = 0
+        for position, doc in enumerate(ranked):
+            content = " ".join(doc.get("content", "").split())
+            source = doc.get("source")
+            if source is not None and included.get(source):
+                shortened = _trim_overlap(content, included[source])
+                overlaps += shortened != content
+                content = shortened
+            sentences = [s for s in _SENTENCE_END.split(content) if s]
+            fresh = [s for s in sentences if _normalise(s) not in seen]
+            if not fresh:
+                deduped += 1
+                continue
+            text = " ".join(fresh)
+            # Joined with a blank line, which costs about a token
+            tokens = self.counter.count(text) + 1
+            remaining = budget - spent
+            if tokens > remaining:
+                if remaining < settings.LLM_CONTEXT_MIN_CHUNK_TOKENS:
+                    break
+                fresh = self._truncate(fresh, remaining - 1)
+                text = " ".join(fresh)
+                tokens = self.counter.count(text) + 1
+                trimmed += 1
+            seen.update(_normalise(s) for s in fresh)
+            if source is not None:
+                included.setdefault(source, []).append(text)
+            parts.append(text)
+            used.append(doc)
+            spent += tokens
+            if spent >= budget:
+                break
+
+        with self._lock:
+            self.assembled += 1
+            self.context_tokens += spent
+            self.chunks_used += len(used)
+            self.chunks_deduped += deduped
+            self.overlaps_trimmed += overlaps
+            self.chunks_trimmed += trimmed
+            self.chunks_dropped += len(ranked) - len(used) - deduped
+        return "\n\n".join(parts), used
+
+    def _truncate(self, sentences: List[str], budget: int) -> List[str]:
+        """Leading sentences that fit in budget; words of the first sentence when none does"""
+        kept: List[str] = []
+        spent = 0
+        for sentence in sentences:
+            tokens = self.counter.count(sentence)
+            if spent + tokens > budget:
+                break
+            kept.append(sentence)
+            spent += tokens
+        if kept:
+            return kept
+        words: List[str] = []
+        for word in sentences[0].split():
+            tokens = self.counter.count(word)
+            if spent + tokens > budget:
+                break
+            words.append(word)
+            spent += tokens
+        return [" ".join(words)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tokenizer": "tiktoken" if self.counter.exact else "estimate",
+                "budget_cap": settings.LLM_CONTEXT_BUDGET,
+                "prompts": self.assembled,
+                "avg_context_tokens": round(self.context_tokens / self.assembled, 1) if self.assembled else 0.0,
+                "chunks_used": self.chunks_used,
+                "chunks_deduped": self.chunks_deduped,
+                "overlaps_trimmed": self.overlaps_trimmed,
+                "chunks_trimmed": self.chunks_trimmed,
+                "chunks_dropped": self.chunks_dropped
+            }
+
+# Global assembler shared by the LLM services
+context_assembler = ContextAssembler()
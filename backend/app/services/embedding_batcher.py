@@ -0,0 +1,156 @@
+import threading
+import queue
+import time
+from concurrent.futures import Future
+from typing import Callable, Any, Dict, List, Optional
+from app.config import settings
+from app.utils.logger import logger
+
+class _PendingEmbedding:
+    def __init__(self, text: str):
+        self.text = text
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+class EmbeddingBatcher:
+    """Collects concurrent single-text embedding calls and encodes them in one batch."""
+
+    # Upper bounds of the batch-size histogram buckets
+    HISTOGRAM_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+
+    def __init__(self, encode_fn: Callable[[List[str]], Any], max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_BATCH_MAX_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.EMBEDDING_BATCH_MAX_WAIT_MS) / 1000.0
+        self._queue: "queue.Queue[_PendingEmbedding]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.total_requests = 0
+        self.total_batches = 0
+        self.largest_batch = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_encode_time = 0.0
+        self.batch_size_histogram: Dict[str, int] = {self._bucket_label(i): 0 for i in range(len(self.HISTOGRAM_BUCKETS) + 1)}
+
+    def start(self):
+        """Start the batching thread."""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the batching thread."""
+        with self._lock:
+            self._running = False
+            thread = self._thread
+            self._thread = None
+        if thread:
+            thread.join(timeout=5)
+        # Fail anything still waiting so callers don't block forever
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            pending.future.set_exception(RuntimeError("Embedding batcher stopped"))
+
+    def submit(self, text: str) -> Future:
+        """Queue a text and return a future that resolves to its embedding."""
+        if not self._running:
+            self.start()
+        pending = _PendingEmbedding(text)
+        self._queue.put(pending)
+        return pending.future
+
+    def embed(self, text: str) -> Any:
+        """Embed a single text, blocking until its batch has been encoded."""
+        return self.submit(text).result()
+
+    def _collect_batch(self) -> List[_PendingEmbedding]:
+        first = self._queue.get(timeout=1)
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Still drain whatever is already waiting without blocking
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self._running:
+            try:
+                batch = self._collect_batch()
+            except queue.Empty:
+                continue
+
+            started = time.perf_counter()
+            try:
+                embeddings = self.encode_fn([item.text for item in batch])
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(batch)} failed: {e}")
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            encode_time = time.perf_counter() - started
+
+            for item, embedding in zip(batch, embeddings):
+                item.future.set_result(embedding)
+            self._record(batch, started, encode_time)
+
+    def _record(self, batch: List[_PendingEmbedding], started: float, encode_time: float):
+        with self._lock:
+            self.total_requests += len(batch)
+            self.total_batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.total_encode_time += encode_time
+            for item in batch:
+                wait = started - item.enqueued_at
+                self.total_queue_wait += wait
+                self.max_queue_wait = max(self.max_queue_wait, wait)
+            self.batch_size_histogram[self._bucket_for(len(batch))] += 1
+
+    def _bucket_label(self, index: int) -> str:
+        if index == len(self.HISTOGRAM_BUCKETS):
+            return f">{self.HISTOGRAM_BUCKETS[-1]}"
+        return f"<={self.HISTOGRAM_BUCKETS[index]}"
+
+    def _bucket_for(self, size: int) -> str:
+        for index, upper in enumerate(self.HISTOGRAM_BUCKETS):
+            if size <= upper:
+                return self._bucket_label(index)
+        return self._bucket_label(len(self.HISTOGRAM_BUCKETS))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batch-size and queue-wait metrics."""
+        with self._lock:
+            batches = self.total_batches or 1
+            requests = self.total_requests or 1
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "total_requests": self.total_requests,
+                "total_batches": self.total_batches,
+                "avg_batch_size": round(self.total_requests / batches, 2),
+                "largest_batch": self.largest_batch,
+                "avg_queue_wait_ms": round(self.total_queue_wait / requests * 1000, 3),
+                "max_queue_wait_ms": round(self.max_queue_wait * 1000, 3),
+                "avg_encode_ms": round(self.total_encode_time / batches * 1000, 3),
+                "batch_size_histogram": dict(self.batch_size_histogram)
+            }
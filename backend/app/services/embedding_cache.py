@@ -0,0 +1,149 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+from app.config import settings
+from app.utils.logger import logger
+
+CREATE_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    last_access REAL NOT NULL
+);
+"""
+
+CREATE_ACCESS_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_access ON embedding_cache(last_access);
+"""
+
+# Stay well below SQLite's bound-parameter limit
+_LOOKUP_BATCH = 500
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by the hash of (model name, chunk text)."""
+
+    def __init__(self, db_path: Optional[Path] = None, max_entries: Optional[int] = None):
+        self.db_path = Path(db_path or settings.EMBEDDING_CACHE_PATH)
+        self.max_entries = max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so importing the module never touches the disk
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(CREATE_CACHE_TABLE)
+            conn.execute(CREATE_ACCESS_INDEX)
+            conn.commit()
+            self._conn = conn
+            logger.info(f"Embedding cache opened at {self.db_path}")
+        return self._conn
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Content address of a chunk for a given model."""
+        return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings for texts; missing entries are returned as None."""
+        keys = [self.make_key(model_name, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        now = time.time()
+
+        with self._lock:
+            conn = self._connection()
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), _LOOKUP_BATCH):
+                batch = unique_keys[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" for _ in batch)
+                rows = conn.execute(
+                    f"SELECT key, dim, vector FROM embedding_cache WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, dim, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+
+            if found:
+                conn.executemany(
+                    "UPDATE embedding_cache SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model_name: str, texts: Sequence[str], embeddings: Sequence[Any]):
+        """Store embeddings for texts and evict the least recently used overflow."""
+        now = time.time()
+        rows = []
+        for text, embedding in zip(texts, embeddings):
+            vector = np.asarray(embedding, dtype=np.float32)
+            rows.append((self.make_key(model_name, text), model_name, int(vector.shape[0]), vector.tobytes(), now))
+        if not rows:
+            return
+
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, model, dim, vector, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        count = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embedding_cache WHERE key IN "
+            "(SELECT key FROM embedding_cache ORDER BY last_access ASC LIMIT ?)",
+            (overflow,)
+        )
+        conn.commit()
+        self.evictions += overflow
+        logger.info(f"Embedding cache evicted {overflow} least recently used entries")
+
+    def clear(self):
+        """Remove every cached embedding."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM embedding_cache")
+            conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            entries = 0
+            if self._conn is not None:
+                entries = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "path": str(self.db_path),
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+# Global embedding cache instance
+embedding_cache = EmbeddingCache()
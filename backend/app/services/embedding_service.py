@@ -1,25 +1,160 @@
 from sentence_transformers import SentenceTransformer
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import Dict, Any, Optional
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import threading
+import time
+import numpy as np
+import psutil
 from app.config import settings
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import embedding_cache
+from app.utils.logger import logger
 
 class EmbeddingService:
     def __init__(self, model_name=None, chunk_size=None, chunk_overlap=None):
         self.model_name = model_name or settings.EMBEDDING_MODEL
         self.chunk_size = chunk_size or settings.CHUNK_SIZE
         self.chunk_overlap = chunk_overlap or settings.CHUNK_OVERLAP
-        
+
         self.model = SentenceTransformer(self.model_name)
         self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size, 
+            chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap
         )
+        # One instance is shared by every router, so serialize calls into the model
+        self._encode_lock = threading.Lock()
+        self.batcher = EmbeddingBatcher(self._encode_batch) if settings.EMBEDDING_BATCHING_ENABLED else None
+        self.cache = embedding_cache if settings.EMBEDDING_CACHE_ENABLED else None
 
     def chunk_text(self, text):
         return self.splitter.split_text(text)
 
     def embed_texts(self, texts):
-        return self.model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-    
+        if not self.cache or not texts:
+            with self._encode_lock:
+                return self.model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+
+        # Only encode the chunks we have never seen with this model
+        cached = self.cache.get_many(self.model_name, texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            with self._encode_lock:
+                encoded = self.model.encode(missing_texts, show_progress_bar=True, convert_to_numpy=True)
+            self.cache.put_many(self.model_name, missing_texts, encoded)
+            for i, embedding in zip(missing, encoded):
+                cached[i] = embedding
+        return np.vstack(cached).astype(np.float32, copy=False)
+
+    def _encode_batch(self, texts):
+        with self._encode_lock:
+            return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
     def generate_embedding(self, text):
         """Generate embedding for a single text"""
-        return self.model.encode([text])[0] 
\ No newline at end of file
+        if self.batcher:
+            return self.batcher.embed(text)
+        with self._encode_lock:
+            return self.model.encode([text])[0]
+
+    async def agenerate_embedding(self, text):
+        """Generate embedding for a single text without blocking the event loop"""
+        if self.batcher:
+            return await asyncio.wrap_future(self.batcher.submit(text))
+        return await run_in_threadpool(self.generate_embedding, text)
+
+    def warm_up(self):
+        """Run a tiny encode so lazy initialisation happens before the first request."""
+        self.generate_embedding("warm-up")
+
+    def memory_footprint_mb(self) -> float:
+        """Approximate size of the model parameters in MB."""
+        total_bytes = 0
+        for param in self.model.parameters():
+            total_bytes += param.numel() * param.element_size()
+        return total_bytes / (1024 * 1024)
+
+class EmbeddingModelRegistry:
+    """Loads each embedding model once per process and hands out the shared instance."""
+
+    def __init__(self):
+        self._services: Dict[str, EmbeddingService] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._model_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, model_name: Optional[str] = None) -> EmbeddingService:
+        """Get the shared service for a model, loading it on first use."""
+        model_name = model_name or settings.EMBEDDING_MODEL
+        service = self._services.get(model_name)
+        if service is not None:
+            return service
+
+        # Per-model lock so concurrent first requests load the model only once
+        with self._lock:
+            model_lock = self._model_locks.setdefault(model_name, threading.Lock())
+
+        with model_lock:
+            service = self._services.get(model_name)
+            if service is None:
+                service = self._load(model_name)
+        return service
+
+    def _load(self, model_name: str) -> EmbeddingService:
+        process = psutil.Process()
+        rss_before = process.memory_info().rss
+        start_time = time.time()
+
+        logger.info(f"Loading embedding model {model_name}")
+        service = EmbeddingService(model_name=model_name)
+        load_time = time.time() - start_time
+
+        warmup_start = time.time()
+        service.warm_up()
+        warmup_time = time.time() - warmup_start
+
+        rss_after = process.memory_info().rss
+        with self._lock:
+            self._services[model_name] = service
+            self._stats[model_name] = {
+                "model_name": model_name,
+                "load_time_seconds": round(load_time, 3),
+                "warmup_time_seconds": round(warmup_time, 3),
+                "parameters_mb": round(service.memory_footprint_mb(), 2),
+                "rss_delta_mb": round((rss_after - rss_before) / (1024 * 1024), 2),
+                "loaded_at": time.time()
+            }
+        logger.info(f"Embedding model {model_name} loaded in {load_time:.2f}s (warm-up {warmup_time:.2f}s)")
+        return service
+
+    def warm_up(self):
+        """Load and warm up every configured embedding model."""
+        for model_name in settings.EMBEDDING_MODELS:
+            try:
+                self.get(model_name)
+            except Exception as e:
+                logger.error(f"Failed to warm up embedding model {model_name}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Load time and memory footprint of every loaded model."""
+        with self._lock:
+            loaded = {name: dict(stats) for name, stats in self._stats.items()}
+            services = dict(self._services)
+        for name, service in services.items():
+            if service.batcher:
+                loaded[name]["batching"] = service.batcher.get_stats()
+        return {
+            "configured_models": settings.EMBEDDING_MODELS,
+            "loaded_models": loaded,
+            "cache": embedding_cache.get_stats() if settings.EMBEDDING_CACHE_ENABLED else None,
+            "process_rss_mb": round(psutil.Process().memory_info().rss / (1024 * 1024), 2)
+        }
+
+# Global registry instance
+embedding_registry = EmbeddingModelRegistry()
+
+def get_embedding_service(model_name: Optional[str] = None) -> EmbeddingService:
+    """Get the process-wide embedding service for a model."""
+    return embedding_registry.get(model_name)
@@ -5,9 +5,16 @@ This module provides advanced customization for LLM responses
 
 import os
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, AsyncIterator, List, Tuple
 from enum import Enum
+import httpx
 import requests
+from app.services.context_assembler import context_assembler
+from app.config import settings
+from app.services.http_client import llm_http
+from app.services.llama_server_pool import LOCAL_PROVIDER, LlamaServerUnavailable, completion_endpoint
+from app.services.llm_service import stream_completion
+from app.services.rate_governor import RateLimitExceeded
 
 class ResponseTone(Enum):
     PROFESSIONAL = "professional"
@@ -49,6 +56,11 @@ class EnhancedLLMService:
             self.api_key = os.getenv("HUGGINGFACE_API_KEY", "")
             self.model = model or os.getenv("HUGGINGFACE_MODEL", "HuggingFaceH4/zephyr-7b-beta")
             self.api_url = f"{os.getenv('HUGGINGFACE_BASE_URL', 'https://api-inference.huggingface.co/models')}/{self.model}"
+        elif provider == LOCAL_PROVIDER:
+            # Offline llama.cpp server pool; the URL is that of the slot leased for each request
+            self.api_key = "local" if settings.LLAMA_SERVER_ENABLED else ""
+            self.model = model or settings.LLM_NAME
+            self.api_url = None
         else:  # fallback to groq
             self.api_key = os.getenv("GROQ_API_KEY", "")
             self.model = model or os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
@@ -129,6 +141,47 @@ EDUCATIONAL GUIDELINES:
         
         return system_message
 
+    def _tailored_prompt(
+        self,
+        prompt: str,
+        tone: ResponseTone = ResponseTone.FRIENDLY,
+        format_type: ResponseFormat = ResponseFormat.PARAGRAPH,
+        audience_level: AudienceLevel = AudienceLevel.HIGH_SCHOOL,
+        subject_area: Optional[str] = None,
+        custom_instructions: Optional[str] = None,
+        persona: Optional[str] = None,
+        context_documents: Optional[List[Dict]] = None,
+        max_tokens: int = 512
+    ) -> Tuple[str, str]:
+        """System message and prompt for a tailored response, with context fitted to the model's token budget"""
+        
+        # Build customized system message
+        system_message = self._build_system_message(
+            tone=tone,
+            format_type=format_type,
+            audience_level=audience_level,
+            subject_area=subject_area,
+            custom_instructions=custom_instructions,
+            persona=persona
+        )
+        
+        # Enhance prompt with context if provided
+        enhanced_prompt = prompt
+        template = """Based on the following educational content, please answer the question:
+
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+Please provide a comprehensive answer based on the context provided."""
+        reserved = system_message + template.format(context="", question=prompt)
+        context_text, _ = context_assembler.assemble(context_documents, self.model, max_tokens, reserved)
+        if context_text:
+            enhanced_prompt = template.format(context=context_text, question=prompt)
+        
+        return system_message, enhanced_prompt
+
     def call_llm_tailored(
         self,
         prompt: str,
@@ -161,102 +214,155 @@ EDUCATIONAL GUIDELINES:
             Tailored LLM response
         """
         
-        # Build customized system message
-        system_message = self._build_system_message(
-            tone=tone,
-            format_type=format_type,
-            audience_level=audience_level,
-            subject_area=subject_area,
-            custom_instructions=custom_instructions,
-            persona=persona
+        system_message, enhanced_prompt = self._tailored_prompt(
+            prompt, tone, format_type, audience_level, subject_area,
+            custom_instructions, persona, context_documents, max_tokens
         )
-        
-        # Enhance prompt with context if provided
-        enhanced_prompt = prompt
-        if context_documents and len(context_documents) > 0:
-            context_text = "\n\n".join([doc.get('content', '') for doc in context_documents[:3]])
-            enhanced_prompt = f"""Based on the following educational content, please answer the question:
-
-CONTEXT:
-{context_text}
+        return self._call_llm_api(enhanced_prompt, system_message, max_tokens, temperature)
 
-QUESTION: {prompt}
+    async def acall_llm_tailored(
+        self,
+        prompt: str,
+        tone: ResponseTone = ResponseTone.FRIENDLY,
+        format_type: ResponseFormat = ResponseFormat.PARAGRAPH,
+        audience_level: AudienceLevel = AudienceLevel.HIGH_SCHOOL,
+        subject_area: Optional[str] = None,
+        custom_instructions: Optional[str] = None,
+        persona: Optional[str] = None,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        context_documents: Optional[List[Dict]] = None
+    ) -> str:
+        """Non-blocking call_llm_tailored for use inside request handlers"""
+        system_message, enhanced_prompt = self._tailored_prompt(
+            prompt, tone, format_type, audience_level, subject_area,
+            custom_instructions, persona, context_documents, max_tokens
+        )
+        return await self._acall_llm_api(enhanced_prompt, system_message, max_tokens, temperature)
 
-Please provide a comprehensive answer based on the context provided."""
-        
-        return self._call_llm_api(enhanced_prompt, system_message, max_tokens, temperature)
-    
-    def _call_llm_api(self, prompt: str, system_message: str, max_tokens: int, temperature: float) -> str:
-        """Internal method to call the LLM API"""
+    async def astream_llm_tailored(
+        self,
+        prompt: str,
+        tone: ResponseTone = ResponseTone.FRIENDLY,
+        format_type: ResponseFormat = ResponseFormat.PARAGRAPH,
+        audience_level: AudienceLevel = AudienceLevel.HIGH_SCHOOL,
+        subject_area: Optional[str] = None,
+        custom_instructions: Optional[str] = None,
+        persona: Optional[str] = None,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        context_documents: Optional[List[Dict]] = None
+    ) -> AsyncIterator[str]:
+        """Streaming call_llm_tailored: yields the answer in pieces as the provider generates it"""
+        system_message, enhanced_prompt = self._tailored_prompt(
+            prompt, tone, format_type, audience_level, subject_area,
+            custom_instructions, persona, context_documents, max_tokens
+        )
         if not self.api_key:
-            return f"[ERROR] API key not configured. Please set {self.provider.upper()}_API_KEY in environment variables."
+            yield f"[ERROR] API key not configured. Please set {self.provider.upper()}_API_KEY in environment variables."
+            return
         
+        headers, payload = self._build_request(enhanced_prompt, system_message, max_tokens, temperature)
+        async for delta in stream_completion(self.provider, self.api_url, headers, payload, self._request_error):
+            yield delta
+    
+
+    def _build_request(self, prompt: str, system_message: str, max_tokens: int, temperature: float) -> Tuple[Dict, Dict]:
+        """Headers and JSON payload for one completion in this provider's format"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
-        try:
-            if self.provider == "huggingface":
-                # Hugging Face format
-                full_prompt = f"<|system|>\n{system_message}\n<|user|>\n{prompt}\n<|assistant|>\n"
-                payload = {
-                    "inputs": full_prompt,
-                    "parameters": {
-                        "max_new_tokens": max_tokens,
-                        "temperature": temperature,
-                        "return_full_text": False
-                    }
+        if self.provider == "huggingface":
+            # Hugging Face format
+            full_prompt = f"<|system|>\n{system_message}\n<|user|>\n{prompt}\n<|assistant|>\n"
+            payload = {
+                "inputs": full_prompt,
+                "parameters": {
+                    "max_new_tokens": max_tokens,
+                    "temperature": temperature,
+                    "return_full_text": False
                 }
-                
-                response = requests.post(self.api_url, headers=headers, json=payload, timeout=60)
-                response.raise_for_status()
-                data = response.json()
-                
-                if isinstance(data, list) and len(data) > 0:
-                    return data[0].get("generated_text", "").strip()
-                elif isinstance(data, dict):
-                    return data.get("generated_text", "").strip()
-                else:
-                    return "[ERROR] Unexpected response format from Hugging Face API"
-                    
+            }
+            return headers, payload
+        
+        # OpenAI-compatible format
+        if self.provider == "openrouter":
+            headers.update({
+                "HTTP-Referer": self.site_url,
+                "X-Title": self.app_name
+            })
+        
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ]
+        
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        return headers, payload
+
+    def _parse_response(self, data: Any) -> str:
+        if self.provider == "huggingface":
+            if isinstance(data, list) and len(data) > 0:
+                return data[0].get("generated_text", "").strip()
+            elif isinstance(data, dict):
+                return data.get("generated_text", "").strip()
             else:
-                # OpenAI-compatible format
-                if self.provider == "openrouter":
-                    headers.update({
-                        "HTTP-Referer": self.site_url,
-                        "X-Title": self.app_name
-                    })
-                
-                messages = [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ]
-                
-                payload = {
-                    "model": self.model,
-                    "messages": messages,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature
-                }
-                
-                response = requests.post(self.api_url, headers=headers, json=payload, timeout=60)
-                response.raise_for_status()
-                data = response.json()
-                return data["choices"][0]["message"]["content"].strip()
-                
+                return "[ERROR] Unexpected response format from Hugging Face API"
+        return data["choices"][0]["message"]["content"].strip()
+
+    def _request_error(self, e: Exception, response: Any = None) -> str:
+        error_msg = f"[LLM ERROR] Request failed: {str(e)}"
+        if response is not None:
+            try:
+                error_detail = response.json()
+                if self.provider == "huggingface":
+                    error_msg += f" - {error_detail.get('error', 'Unknown error')}"
+                else:
+                    error_msg += f" - {error_detail.get('error', {}).get('message', 'Unknown error')}"
+            except:
+                error_msg += f" - HTTP {response.status_code}"
+        return error_msg
+
+    def _call_llm_api(self, prompt: str, system_message: str, max_tokens: int, temperature: float) -> str:
+        """Internal method to call the LLM API"""
+        if not self.api_key:
+            return f"[ERROR] API key not configured. Please set {self.provider.upper()}_API_KEY in environment variables."
+        
+        headers, payload = self._build_request(prompt, system_message, max_tokens, temperature)
+        try:
+            with completion_endpoint(self.provider, self.api_url) as url:
+                response = llm_http.post(self.provider, url, headers=headers, json=payload)
+            response.raise_for_status()
+            return self._parse_response(response.json())
+        except (RateLimitExceeded, LlamaServerUnavailable) as e:
+            return f"[LLM ERROR] {str(e)}"
         except requests.exceptions.RequestException as e:
-            error_msg = f"[LLM ERROR] Request failed: {str(e)}"
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_detail = e.response.json()
-                    if self.provider == "huggingface":
-                        error_msg += f" - {error_detail.get('error', 'Unknown error')}"
-                    else:
-                        error_msg += f" - {error_detail.get('error', {}).get('message', 'Unknown error')}"
-                except:
-                    error_msg += f" - HTTP {e.response.status_code}"
-            return error_msg
+            return self._request_error(e, getattr(e, "response", None))
+        except Exception as e:
+            return f"[LLM ERROR] Unexpected error: {str(e)}"
+
+    async def _acall_llm_api(self, prompt: str, system_message: str, max_tokens: int, temperature: float) -> str:
+        """Internal method to call the LLM API without blocking the event loop"""
+        if not self.api_key:
+            return f"[ERROR] API key not configured. Please set {self.provider.upper()}_API_KEY in environment variables."
+        
+        headers, payload = self._build_request(prompt, system_message, max_tokens, temperature)
+        try:
+            with completion_endpoint(self.provider, self.api_url) as url:
+                response = await llm_http.apost(self.provider, url, headers=headers, json=payload)
+            response.raise_for_status()
+            return self._parse_response(response.json())
+        except (RateLimitExceeded, LlamaServerUnavailable) as e:
+            return f"[LLM ERROR] {str(e)}"
+        except httpx.HTTPError as e:
+            return self._request_error(e, getattr(e, "response", None))
         except Exception as e:
             return f"[LLM ERROR] Unexpected error: {str(e)}"
 
@@ -302,3 +408,45 @@ def create_step_by_step_guide(prompt: str, subject: str) -> str:
         subject_area=subject,
         custom_instructions="Break down complex processes into clear, actionable steps with examples."
     )
+
+async def acreate_student_tutor_response(prompt: str, subject: str, grade_level: str = "high_school") -> str:
+    """Non-blocking variant: create a response tailored for student tutoring"""
+    llm = EnhancedLLMService()
+    audience_map = {
+        "elementary": AudienceLevel.ELEMENTARY,
+        "middle_school": AudienceLevel.MIDDLE_SCHOOL,
+        "high_school": AudienceLevel.HIGH_SCHOOL,
+        "college": AudienceLevel.COLLEGE
+    }
+    
+    return await llm.acall_llm_tailored(
+        prompt=prompt,
+        tone=ResponseTone.ENCOURAGING,
+        format_type=ResponseFormat.EXPLANATION,
+        audience_level=audience_map.get(grade_level, AudienceLevel.HIGH_SCHOOL),
+        subject_area=subject,
+        custom_instructions="Focus on helping the student understand concepts clearly and encourage learning."
+    )
+
+async def acreate_professional_summary(prompt: str, subject: str) -> str:
+    """Non-blocking variant: create a professional summary response"""
+    llm = EnhancedLLMService()
+    return await llm.acall_llm_tailored(
+        prompt=prompt,
+        tone=ResponseTone.PROFESSIONAL,
+        format_type=ResponseFormat.SUMMARY,
+        audience_level=AudienceLevel.ADULT,
+        subject_area=subject
+    )
+
+async def acreate_step_by_step_guide(prompt: str, subject: str) -> str:
+    """Non-blocking variant: create a step-by-step instructional response"""
+    llm = EnhancedLLMService()
+    return await llm.acall_llm_tailored(
+        prompt=prompt,
+        tone=ResponseTone.FRIENDLY,
+        format_type=ResponseFormat.STEP_BY_STEP,
+        audience_level=AudienceLevel.HIGH_SCHOOL,
+        subject_area=subject,
+        custom_instructions="Break down complex processes into clear, actionable steps with examples."
+    )
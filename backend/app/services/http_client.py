@@ -0,0 +1,246 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import settings
+from app.services.rate_governor import RateGovernor, llm_governor
+from app.utils.logger import logger
+
+class ProviderClient:
+    """Keep-alive session with a bounded connection pool for one LLM provider."""
+
+    def __init__(self, provider: str, pool_size: int, timeout: Tuple[float, float]):
+        self.provider = provider
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Retries are the caller's decision; the adapter only pools connections
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0, pool_block=False)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return self.session.post(url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.requests += 1
+                self.total_latency += time.perf_counter() - started
+
+    def get_stats(self) -> Dict[str, Any]:
+        pools = []
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append({
+                "host": pool.host,
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle_connections": pool.pool.qsize() if pool.pool else 0
+            })
+        with self._lock:
+            opened = sum(pool["connections_opened"] for pool in pools)
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "avg_latency_ms": round(self.total_latency / self.requests * 1000, 2) if self.requests else 0.0,
+                "connection_reuse_ratio": round(1 - opened / self.requests, 3) if self.requests else 0.0,
+                "timeout": {"connect": self.timeout[0], "read": self.timeout[1]},
+                "pools": pools
+            }
+
+    def close(self):
+        self.session.close()
+
+class AsyncProviderClient:
+    """Non-blocking keep-alive client for one LLM provider, bound to the event loop that created it."""
+
+    def __init__(self, provider: str, pool_size: int, timeout: Tuple[float, float]):
+        self.provider = provider
+        self.timeout = timeout
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(timeout[1], connect=timeout[0])
+        )
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_latency = 0.0
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        # Counters are only touched from the owning loop, so no lock is needed
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            return await self.client.post(url, **kwargs)
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.requests += 1
+            self.total_latency += time.perf_counter() - started
+
+    @asynccontextmanager
+    async def stream(self, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """POST and expose the response before its body arrives; counted until the body is consumed."""
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            async with self.client.stream("POST", url, **kwargs) as response:
+                yield response
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.requests += 1
+            self.total_latency += time.perf_counter() - started
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "avg_latency_ms": round(self.total_latency / self.requests * 1000, 2) if self.requests else 0.0,
+            "timeout": {"connect": self.timeout[0], "read": self.timeout[1]}
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+class LLMHTTPClients:
+    """
+    Process-wide pooled HTTP clients, one per LLM provider, shared by every LLM service class.
+    Every request first passes the rate governor, which may hold it for quota or shed it.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, async_pool_size: Optional[int] = None,
+                 governor: Optional[RateGovernor] = None):
+        self.pool_size = pool_size or settings.LLM_HTTP_POOL_SIZE
+        self.async_pool_size = async_pool_size or settings.LLM_ASYNC_POOL_SIZE
+        self.governor = governor or llm_governor
+        self._clients: Dict[str, ProviderClient] = {}
+        # A connection belongs to the event loop that opened it, so each loop has its own async clients
+        self._async_clients: Dict[asyncio.AbstractEventLoop, Dict[str, AsyncProviderClient]] = {}
+        self._lock = threading.Lock()
+
+    def timeout_for(self, provider: str) -> Tuple[float, float]:
+        read_timeout = settings.LLM_READ_TIMEOUTS.get(provider, settings.LLM_READ_TIMEOUT)
+        return settings.LLM_CONNECT_TIMEOUT, read_timeout
+
+    def get(self, provider: str) -> ProviderClient:
+        client = self._clients.get(provider)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(provider)
+                if client is None:
+                    client = ProviderClient(provider, self.pool_size, self.timeout_for(provider))
+                    self._clients[provider] = client
+                    logger.info(f"Created pooled HTTP client for {provider} (pool size {self.pool_size})")
+        return client
+
+    def post(self, provider: str, url: str, **kwargs) -> requests.Response:
+        """POST through the provider's keep-alive pool with its configured timeouts."""
+        permit = self.governor.acquire(provider, kwargs.get("json"))
+        response = self.get(provider).post(url, **kwargs)
+        self.governor.settle(permit, response.status_code, response.headers, _json_body(response))
+        return response
+
+    def aget(self, provider: str) -> AsyncProviderClient:
+        """
+        Async client for provider on the running loop. Another loop's client is never reused or replaced;
+        clients of loops that closed without aclose() can no longer be closed and are dropped.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for closed in [other for other in self._async_clients if other.is_closed()]:
+                del self._async_clients[closed]
+            clients = self._async_clients.setdefault(loop, {})
+            client = clients.get(provider)
+            if client is None:
+                client = AsyncProviderClient(provider, self.async_pool_size, self.timeout_for(provider))
+                clients[provider] = client
+                logger.info(f"Created async HTTP client for {provider} (pool size {self.async_pool_size})")
+        return client
+
+    async def apost(self, provider: str, url: str, **kwargs) -> httpx.Response:
+        """POST without blocking the event loop, through the provider's async keep-alive pool."""
+        permit = await self.governor.aacquire(provider, kwargs.get("json"))
+        response = await self.aget(provider).post(url, **kwargs)
+        self.governor.settle(permit, response.status_code, response.headers, _json_body(response))
+        return response
+
+    @asynccontextmanager
+    async def astream(self, provider: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Async context manager for a streamed POST through the provider's async pool."""
+        permit = await self.governor.aacquire(provider, kwargs.get("json"))
+        async with self.aget(provider).stream(url, **kwargs) as response:
+            # Streamed bodies carry no usage, so the token estimate stands
+            self.governor.settle(permit, response.status_code, response.headers)
+            yield response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Stats of the blocking clients and of the async clients on the calling loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            clients = dict(self._clients)
+            async_clients = dict(self._async_clients.get(loop, {}))
+        return {
+            "pool_size": self.pool_size,
+            "async_pool_size": self.async_pool_size,
+            "providers": {provider: client.get_stats() for provider, client in clients.items()},
+            "async_providers": {provider: client.get_stats() for provider, client in async_clients.items()}
+        }
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
+
+    async def aclose(self):
+        """Close the running loop's async clients; await it before that loop closes."""
+        with self._lock:
+            clients = self._async_clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+def _json_body(response) -> Optional[Dict[str, Any]]:
+    """Parsed JSON of a successful response, for the usage it reports"""
+    if response.status_code >= 400 or "json" not in response.headers.get("content-type", ""):
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+# Global client registry
+llm_http = LLMHTTPClients()
@@ -0,0 +1,160 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from app.config import settings
+from app.services.chunk_manifest import chunk_ids
+from app.utils.logger import logger
+
+# Marks the end of a stage's output
+_DONE = object()
+
+class _ChunkBatch:
+    def __init__(self, ids: List[str], chunks: List[Dict], last_page: int):
+        self.ids = ids
+        self.chunks = chunks
+        self.last_page = last_page
+        self.new: List[int] = []
+        self.moved: List[int] = []
+        self.embeddings: Any = None
+
+class IngestPipeline:
+    """
+    Streams a document through extract -> chunk -> embed -> store stages.
+    Stages run on their own threads and are connected by bounded queues, so at most
+    a few batches are in memory at once and page N+1 is extracted while page N is embedded.
+    """
+
+    def __init__(self, store, embed_fn: Callable[[List[str]], Any],
+                 batch_size: Optional[int] = None, queue_size: Optional[int] = None):
+        self.store = store
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+
+    def run(self, pages: Iterable[Tuple[int, str]], chunk_fn: Callable[[str, int, str], List[Dict]],
+            topic: str, source_file: str,
+            progress: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+        """
+        Ingest (page number, text) pairs from pages. chunk_fn splits one page into chunk dicts.
+        progress, if given, is called with the last page number stored after every batch;
+        an exception it raises (e.g. a cancellation) stops the pipeline.
+        Returns the number of added, removed and unchanged chunks.
+        """
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        page_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        chunk_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        store_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        previous = self.store.begin_document(topic, source_file)
+
+        def stage(name: str, target: Callable[[], None], output: "queue.Queue"):
+            def run_stage():
+                try:
+                    target()
+                except BaseException as e:
+                    logger.error(f"Ingest {name} stage failed for {source_file}: {e}")
+                    errors.append(e)
+                    stop.set()
+                finally:
+                    self._put(output, _DONE, stop)
+            return threading.Thread(target=run_stage, name=f"ingest-{name}", daemon=True)
+
+        def extract():
+            for page in pages:
+                if not self._put(page_queue, page, stop):
+                    return
+
+        def chunk():
+            seen: Dict[str, int] = {}
+            ids: List[str] = []
+            chunks: List[Dict] = []
+            last_page = 0
+            for page_number, text in self._drain(page_queue, stop):
+                last_page = page_number
+                page_chunks = chunk_fn(text, page_number, source_file)
+                ids.extend(chunk_ids(page_chunks, seen))
+                chunks.extend(page_chunks)
+                while len(chunks) >= self.batch_size:
+                    batch = _ChunkBatch(ids[:self.batch_size], chunks[:self.batch_size], last_page)
+                    del ids[:self.batch_size], chunks[:self.batch_size]
+                    if not self._put(chunk_queue, batch, stop):
+                        return
+            if last_page:
+                self._put(chunk_queue, _ChunkBatch(ids, chunks, last_page), stop)
+
+        def embed():
+            for batch in self._drain(chunk_queue, stop):
+                for i, (chunk_id, chunk) in enumerate(zip(batch.ids, batch.chunks)):
+                    page = previous.get(chunk_id)
+                    if page is None:
+                        batch.new.append(i)
+                    elif page != chunk["page"]:
+                        batch.moved.append(i)
+                if batch.new:
+                    batch.embeddings = self.embed_fn([batch.chunks[i]["text"] for i in batch.new])
+                if not self._put(store_queue, batch, stop):
+                    return
+
+        threads = [
+            stage("extract", extract, page_queue),
+            stage("chunk", chunk, chunk_queue),
+            stage("embed", embed, store_queue)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Store on the calling thread so writes to the vector store stay sequential
+        pairs: List[Tuple[str, int]] = []
+        added = 0
+        try:
+            for batch in self._drain(store_queue, stop):
+                if batch.new:
+                    self.store.write_chunks(topic, [batch.ids[i] for i in batch.new],
+                                            [batch.chunks[i] for i in batch.new], batch.embeddings)
+                if batch.moved:
+                    self.store.update_chunk_pages(topic, [batch.ids[i] for i in batch.moved],
+                                                  [batch.chunks[i] for i in batch.moved])
+                pairs.extend((chunk_id, chunk["page"]) for chunk_id, chunk in zip(batch.ids, batch.chunks))
+                added += len(batch.new)
+                if progress:
+                    progress(batch.last_page)
+        except BaseException:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self.store.abort_document(topic, source_file, pairs, previous)
+            raise
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            self.store.abort_document(topic, source_file, pairs, previous)
+            raise errors[0]
+        removed = self.store.finish_document(topic, source_file, pairs, previous)
+        return {"added": added, "removed": removed, "unchanged": len(pairs) - added}
+
+    @staticmethod
+    def _put(q: "queue.Queue", item: Any, stop: threading.Event) -> bool:
+        """Blocking put that gives up once the pipeline is stopping."""
+        while not stop.is_set() or item is _DONE:
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if stop.is_set():
+                    return False
+        return False
+
+    @staticmethod
+    def _drain(q: "queue.Queue", stop: threading.Event):
+        """Yield items until the upstream stage finishes or the pipeline stops."""
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _DONE or stop.is_set():
+                return
+            yield item
@@ -1,14 +1,21 @@
 import asyncio
+import importlib
+import inspect
+import json
+import multiprocessing
+import os
+import sqlite3
 import threading
-import queue
 import time
-from typing import Callable, Any, Dict, Optional, List
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Any, Dict, Optional, List, Set
 from datetime import datetime
 from enum import Enum
+from app.config import settings
+from app.utils.file_lock import try_lock
 from app.utils.logger import logger
-import json
-from app.services.cache import cache
-from app.api.upload_progress import send_upload_progress
 
 class JobStatus(Enum):
     PENDING = "pending"
@@ -17,169 +24,728 @@ class JobStatus(Enum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
-class Job:
-    def __init__(self, job_id: str, func: Callable, args: tuple = (), kwargs: dict = None):
+class JobLane(Enum):
+    IO = "io"        # threads in the API process: blocking network calls, light work
+    ASYNC = "async"  # coroutines on the application event loop
+    CPU = "cpu"      # threads that hand parsing and embedding to worker processes with the model preloaded
+
+class JobPriority(Enum):
+    INTERACTIVE = 20  # a user is waiting on the result
+    NORMAL = 10
+    BULK = 0          # batch uploads and retraining; yields to everything else
+
+FINISHED_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value)
+
+CREATE_JOBS_TABLE = """
+CREATE TABLE IF NOT EXISTS job_queue (
+    job_id TEXT PRIMARY KEY,
+    func TEXT NOT NULL,
+    args TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    status TEXT NOT NULL,
+    lane TEXT NOT NULL DEFAULT 'io',
+    priority INTEGER NOT NULL DEFAULT 10,
+    submitter TEXT NOT NULL DEFAULT '',
+    weight REAL NOT NULL DEFAULT 1.0,
+    idempotency_key TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    progress_samples TEXT NOT NULL DEFAULT '[]',
+    progress REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_expires_at REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    completed_at REAL
+);
+"""
+
+CREATE_STATUS_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_job_queue_status ON job_queue(status, lane, created_at);
+"""
+
+CREATE_IDEMPOTENCY_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_job_queue_idempotency ON job_queue(idempotency_key, status);
+"""
+
+# Progress samples kept per job for throughput and ETA
+PROGRESS_WINDOW = 20
+
+# Highest priority class first; within it, the submitter with the fewest weighted jobs
+# ahead of this one (queued or running) goes next, so one bulk upload can't starve others
+CLAIM_NEXT_JOB = """
+WITH pending AS (
+    SELECT job_id, priority, submitter, weight, created_at,
+           ROW_NUMBER() OVER (PARTITION BY submitter, priority ORDER BY created_at) - 1 AS position
+    FROM job_queue WHERE status = ? AND lane = ?
+),
+running AS (
+    SELECT submitter, COUNT(*) AS active FROM job_queue WHERE status = ? GROUP BY submitter
+)
+SELECT pending.job_id FROM pending LEFT JOIN running ON running.submitter = pending.submitter
+ORDER BY pending.priority DESC,
+         (pending.position + COALESCE(running.active, 0)) / pending.weight,
+         pending.created_at
+LIMIT 1
+"""
+
+def _run_callable(func: Callable, args: tuple, kwargs: dict) -> Any:
+    if asyncio.iscoroutinefunction(func):
+        # Handle async functions
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(func(*args, **kwargs))
+        finally:
+            loop.close()
+    # Handle sync functions
+    return func(*args, **kwargs)
+
+def _init_cpu_worker(preload_embeddings: bool):
+    """CPU lane process initialiser: load the embedding model once."""
+    if preload_embeddings:
+        from app.services.embedding_service import get_embedding_service
+        get_embedding_service()
+
+def func_path(func: Callable) -> str:
+    """Import path of a module-level function, the only kind a durable job can run."""
+    qualname = getattr(func, "__qualname__", "")
+    if not qualname or "<" in qualname:
+        raise ValueError(f"Job functions must be module-level, got {func!r}")
+    return f"{func.__module__}:{qualname}"
+
+def resolve_func(path: str) -> Callable:
+    module_name, qualname = path.split(":", 1)
+    target: Any = importlib.import_module(module_name)
+    for attr in qualname.split("."):
+        target = getattr(target, attr)
+    return target
+
+def accepts_context(func: Callable) -> bool:
+    """Job functions opt into progress reporting and cancellation with a job_context parameter."""
+    return "job_context" in inspect.signature(func).parameters
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.utcfromtimestamp(value).isoformat() if value else None
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested."""
+
+class JobContext:
+    """
+    Handed to job functions that take a job_context argument: report progress as
+    (done, total) and check for cancellation between batches of work.
+    """
+
+    # Minimum seconds between progress writes and between cancellation checks
+    MIN_INTERVAL = 0.25
+
+    def __init__(self, job_id: str, queue: "JobQueue"):
         self.job_id = job_id
-        self.func = func
-        self.args = args or ()
-        self.kwargs = kwargs or {}
-        self.status = JobStatus.PENDING
-        self.result = None
-        self.error = None
-        self.created_at = datetime.utcnow()
-        self.started_at = None
-        self.completed_at = None
-        self.progress = 0.0
-        self.metadata = {}
+        self.queue = queue
+        self._last_report = 0.0
+        self._last_check = 0.0
+        self._cancelled = False
+
+    def report(self, done: float, total: float, unit: str = "items", message: Optional[str] = None):
+        """Record that done of total units are finished; writes are throttled except for the last one."""
+        now = time.time()
+        if now - self._last_report < self.MIN_INTERVAL and done < total:
+            return
+        self._last_report = now
+        self.queue.record_progress(self.job_id, done, total, unit, message)
+
+    @property
+    def cancelled(self) -> bool:
+        now = time.time()
+        if not self._cancelled and now - self._last_check >= self.MIN_INTERVAL:
+            self._last_check = now
+            self._cancelled = self.queue.is_cancel_requested(self.job_id)
+        return self._cancelled
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job has been asked to stop."""
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+    def run_cpu(self, func: Callable, *args, **kwargs) -> Any:
+        """Run one CPU-bound step of the job on the CPU lane's process pool; see JobQueue.run_cpu."""
+        return self.queue.run_cpu(func, *args, **kwargs)
+
+class Job:
+    """A claimed job row with its function resolved."""
+
+    def __init__(self, row: sqlite3.Row):
+        self.job_id = row["job_id"]
+        self.func = resolve_func(row["func"])
+        self.args = tuple(json.loads(row["args"]))
+        self.kwargs = json.loads(row["kwargs"])
+        self.lane = JobLane(row["lane"])
+        self.attempts = row["attempts"]
+        self.wants_context = accepts_context(self.func)
+
+    def call_kwargs(self, queue: "JobQueue") -> dict:
+        if self.wants_context:
+            return dict(self.kwargs, job_context=JobContext(self.job_id, queue))
+        return self.kwargs
+
+class LaneStats:
+    """Per-lane counters for jobs run by this process."""
+
+    def __init__(self, lane: JobLane, limit: int):
+        self.lane = lane
+        self.limit = limit
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_run_seconds = 0.0
+        self.total_wait_seconds = 0.0
 
 class JobQueue:
-    def __init__(self, max_workers: int = 4):
-        self.max_workers = max_workers
-        self.jobs: Dict[str, Job] = {}
-        self.job_queue = queue.Queue()
+    """
+    Durable job queue on SQLite. Workers claim jobs with an atomic UPDATE and hold a lease
+    that a heartbeat renews; jobs whose lease runs out (crashed worker or process) are
+    handed to another worker. Any number of processes can share one database file.
+    Jobs run in a lane: IO jobs on threads, coroutine jobs on the application event loop
+    and CPU jobs on threads of their own, each with its own limit. CPU jobs hand their heavy
+    steps to a process pool with run_cpu and keep every write in this process.
+    Only one queue per database runs the CPU lane: every uvicorn worker has its own queue, and a
+    lane each would start JOB_CPU_WORKERS processes, each holding the embedding model, per worker.
+    The queue holding the lock next to the database claims the CPU jobs submitted by all of them;
+    the others take the lane over if that process exits.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, db_path: Optional[Path] = None,
+                 cpu_workers: Optional[int] = None):
+        self.max_workers = max_workers or settings.JOB_QUEUE_WORKERS
+        self.cpu_workers = cpu_workers or settings.JOB_CPU_WORKERS
+        self.db_path = Path(db_path or settings.JOB_QUEUE_DB_PATH)
+        self.lease_seconds = settings.JOB_LEASE_SECONDS
+        self.heartbeat_interval = settings.JOB_HEARTBEAT_SECONDS
+        self.max_attempts = settings.JOB_MAX_ATTEMPTS
+        self.retention_seconds = settings.JOB_RETENTION_HOURS * 3600
+        self.poll_interval = settings.JOB_POLL_INTERVAL
+        # Identifies this process's workers in the worker_id column
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
         self.workers = []
         self.running = False
+        self._conn: Optional[sqlite3.Connection] = None
         self._lock = threading.Lock()
-    
+        self._wakeup = threading.Event()
+        self._active: Dict[str, str] = {}  # job_id -> worker_id for jobs running in this process
+        self._heartbeat: Optional[threading.Thread] = None
+        self.async_concurrency = settings.JOB_ASYNC_CONCURRENCY
+        self._lanes = {
+            JobLane.IO: LaneStats(JobLane.IO, self.max_workers),
+            JobLane.ASYNC: LaneStats(JobLane.ASYNC, self.async_concurrency),
+            JobLane.CPU: LaneStats(JobLane.CPU, self.cpu_workers)
+        }
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._async_tasks: Set[asyncio.Task] = set()
+        self._cpu_executor: Optional[ProcessPoolExecutor] = None
+        self._cpu_lane_lock: Optional[BinaryIO] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so importing the module never touches the disk
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(CREATE_JOBS_TABLE)
+            conn.execute(CREATE_STATUS_INDEX)
+            conn.execute(CREATE_IDEMPOTENCY_INDEX)
+            self._conn = conn
+            logger.info(f"Job queue opened at {self.db_path}")
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._connection().execute(sql, params)
+
     def start(self):
         """Start the job queue workers."""
         if self.running:
             return
-        
+
         self.running = True
-        logger.info(f"Starting job queue with {self.max_workers} workers")
-        
-        for i in range(self.max_workers):
-            worker = threading.Thread(target=self._worker, args=(i,), daemon=True)
+        logger.info(f"Starting job queue with {self.max_workers} I/O workers and {self.cpu_workers} CPU workers")
+
+        self._start_workers(JobLane.IO, self.max_workers)
+        self._claim_cpu_lane()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-queue-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _start_workers(self, lane: JobLane, count: int):
+        for _ in range(count):
+            worker = threading.Thread(target=self._worker, args=(len(self.workers), lane), daemon=True)
             worker.start()
             self.workers.append(worker)
-    
+
+    @property
+    def cpu_lane_lock_path(self) -> Path:
+        return self.db_path.with_name(self.db_path.name + ".cpu-lane.lock")
+
+    def _claim_cpu_lane(self):
+        """Start the CPU lane's workers unless another process sharing the database runs them."""
+        if self._cpu_lane_lock is not None:
+            return
+        self._cpu_lane_lock = try_lock(self.cpu_lane_lock_path)
+        if self._cpu_lane_lock is None:
+            return
+        logger.info(f"Running the CPU job lane for {self.db_path} in this process")
+        self._start_workers(JobLane.CPU, self.cpu_workers)
+
     def stop(self):
         """Stop the job queue workers."""
         self.running = False
+        self._wakeup.set()
         logger.info("Stopping job queue workers")
-        
+
         # Wait for workers to finish
         for worker in self.workers:
             worker.join(timeout=5)
-        
+        if self._heartbeat:
+            self._heartbeat.join(timeout=5)
+            self._heartbeat = None
+
         self.workers.clear()
-    
-    def _worker(self, worker_id: int):
+
+        with self._lock:
+            executor, self._cpu_executor = self._cpu_executor, None
+        if executor:
+            executor.shutdown(wait=True)
+        if self._cpu_lane_lock is not None:
+            self._cpu_lane_lock.close()
+            self._cpu_lane_lock = None
+
+    async def start_async(self):
+        """Start dispatching coroutine jobs on the running (application) event loop."""
+        if self._dispatcher is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._async_wakeup = asyncio.Event()
+        self._dispatcher = self._loop.create_task(self._dispatch_async())
+        logger.info(f"Async job lane started with concurrency {self.async_concurrency}")
+
+    async def stop_async(self, timeout: float = 5.0):
+        """Stop dispatching; running coroutine jobs get timeout seconds to finish before their leases lapse."""
+        dispatcher, self._dispatcher = self._dispatcher, None
+        if dispatcher is None:
+            return
+        dispatcher.cancel()
+        await asyncio.gather(dispatcher, return_exceptions=True)
+        if self._async_tasks:
+            await asyncio.wait(list(self._async_tasks), timeout=timeout)
+        self._loop = None
+
+    async def _dispatch_async(self):
+        """Claim async lane jobs while a semaphore slot is free and run each as a task."""
+        semaphore = asyncio.Semaphore(self.async_concurrency)
+        name = f"{self.owner}-async"
+        while True:
+            await semaphore.acquire()
+            try:
+                # Claiming touches SQLite, so keep it off the loop
+                job = await self._loop.run_in_executor(None, self.claim_job, name, JobLane.ASYNC)
+            except asyncio.CancelledError:
+                semaphore.release()
+                raise
+            except Exception as e:
+                logger.error(f"Async job dispatcher error: {e}")
+                job = None
+            if job is None:
+                semaphore.release()
+                self._async_wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._async_wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = self._loop.create_task(self._run_async_job(job, name))
+            self._async_tasks.add(task)
+            task.add_done_callback(self._async_tasks.discard)
+            task.add_done_callback(lambda _: semaphore.release())
+
+    async def _run_async_job(self, job: Job, worker: str):
+        logger.info(f"Running job {job.job_id} on the event loop (attempt {job.attempts})")
+        started = await self._loop.run_in_executor(None, self._record_start, job)
+        try:
+            result = await job.func(*job.args, **job.call_kwargs(self))
+            await self._loop.run_in_executor(None, self._finish, job.job_id, worker, JobStatus.COMPLETED, result)
+            self._record_end(job, started, JobStatus.COMPLETED)
+            logger.info(f"Job {job.job_id} completed successfully")
+        except JobCancelled:
+            await self._loop.run_in_executor(None, self._finish, job.job_id, worker, JobStatus.CANCELLED)
+            self._record_end(job, started, JobStatus.CANCELLED)
+            logger.info(f"Job {job.job_id} cancelled while running")
+        except Exception as e:
+            await self._loop.run_in_executor(None, self._finish, job.job_id, worker, JobStatus.FAILED, None, str(e))
+            self._record_end(job, started, JobStatus.FAILED)
+            logger.error(f"Job {job.job_id} failed: {e}")
+
+    def _get_cpu_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._cpu_executor is None:
+                # spawn: forking a process that already runs worker threads can deadlock
+                self._cpu_executor = ProcessPoolExecutor(
+                    max_workers=self.cpu_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_cpu_worker,
+                    initargs=(settings.JOB_CPU_PRELOAD_EMBEDDINGS,)
+                )
+                logger.info(f"Started CPU job lane with {self.cpu_workers} processes")
+            return self._cpu_executor
+
+    def run_cpu(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run func on the CPU lane's process pool and return its result to the calling thread.
+        func must be module-level and its arguments and result picklable. It should only compute
+        (extract, embed): vector store and manifest writes stay with the job in this process, whose
+        caches would not see a write made by a pool process.
+        """
+        return self._get_cpu_executor().submit(func, *args, **kwargs).result()
+
+    def _worker(self, worker_id: int, lane: JobLane):
         """Worker thread function."""
-        logger.info(f"Worker {worker_id} started")
-        
+        logger.info(f"Worker {worker_id} ({lane.value} lane) started")
+        name = f"{self.owner}-{worker_id}"
+
         while self.running:
             try:
-                # Get job from queue with timeout
-                job = self.job_queue.get(timeout=1)
-                self._process_job(job, worker_id)
-                self.job_queue.task_done()
-            except queue.Empty:
-                continue
+                job = self.claim_job(name, lane)
+                if job is None:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+                self._process_job(job, name)
             except Exception as e:
                 logger.error(f"Worker {worker_id} error: {e}")
-        
+                time.sleep(self.poll_interval)
+
         logger.info(f"Worker {worker_id} stopped")
-    
-    def _process_job(self, job: Job, worker_id: int):
-        """Process a single job."""
+
+    def _heartbeat_loop(self):
+        """Renew the leases of jobs running here, take over an unclaimed CPU lane and prune old finished jobs."""
+        last_prune = 0.0
+        while self.running:
+            try:
+                self._claim_cpu_lane()
+                now = time.time()
+                with self._lock:
+                    active = list(self._active.items())
+                for job_id, worker in active:
+                    self._execute(
+                        "UPDATE job_queue SET lease_expires_at = ? WHERE job_id = ? AND worker_id = ? AND status = ?",
+                        (now + self.lease_seconds, job_id, worker, JobStatus.RUNNING.value)
+                    )
+                if now - last_prune >= self.heartbeat_interval * 4:
+                    self.cleanup()
+                    last_prune = now
+            except Exception as e:
+                logger.error(f"Job queue heartbeat error: {e}")
+            time.sleep(self.heartbeat_interval)
+
+    def claim_job(self, worker: str, lane: JobLane = JobLane.IO) -> Optional[Job]:
+        """Atomically take the lane's next job by priority and fair share, first requeueing expired leases."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._recover_expired(conn, now)
+                row = conn.execute(
+                    CLAIM_NEXT_JOB, (JobStatus.PENDING.value, lane.value, JobStatus.RUNNING.value)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    """UPDATE job_queue SET status = ?, worker_id = ?, lease_expires_at = ?, started_at = ?,
+                       attempts = attempts + 1 WHERE job_id = ? AND status = ?""",
+                    (JobStatus.RUNNING.value, worker, now + self.lease_seconds, now,
+                     row["job_id"], JobStatus.PENDING.value)
+                )
+                claimed = conn.execute("SELECT * FROM job_queue WHERE job_id = ?", (row["job_id"],)).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._active[claimed["job_id"]] = worker
         try:
-            with self._lock:
-                job.status = JobStatus.RUNNING
-                job.started_at = datetime.utcnow()
-            
-            logger.info(f"Worker {worker_id} processing job {job.job_id}")
-            
-            # Execute the job function
-            if asyncio.iscoroutinefunction(job.func):
-                # Handle async functions
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    job.result = loop.run_until_complete(job.func(*job.args, **job.kwargs))
-                finally:
-                    loop.close()
+            return Job(claimed)
+        except Exception as e:
+            self._finish(claimed["job_id"], worker, JobStatus.FAILED, error=f"Cannot load job function: {e}")
+            return None
+
+    def _recover_expired(self, conn: sqlite3.Connection, now: float):
+        expired = conn.execute(
+            "SELECT job_id, attempts FROM job_queue WHERE status = ? AND lease_expires_at < ?",
+            (JobStatus.RUNNING.value, now)
+        ).fetchall()
+        for row in expired:
+            if row["attempts"] >= self.max_attempts:
+                conn.execute(
+                    "UPDATE job_queue SET status = ?, error = ?, completed_at = ?, worker_id = NULL WHERE job_id = ?",
+                    (JobStatus.FAILED.value, "Worker lease expired too many times", now, row["job_id"])
+                )
+                logger.error(f"Job {row['job_id']} abandoned after {row['attempts']} attempts")
             else:
-                # Handle sync functions
-                job.result = job.func(*job.args, **job.kwargs)
-            
-            with self._lock:
-                job.status = JobStatus.COMPLETED
-                job.completed_at = datetime.utcnow()
-                job.progress = 100.0
-            
+                conn.execute(
+                    "UPDATE job_queue SET status = ?, worker_id = NULL, lease_expires_at = NULL WHERE job_id = ?",
+                    (JobStatus.PENDING.value, row["job_id"])
+                )
+                logger.warning(f"Job {row['job_id']} lease expired, requeued")
+
+    def _record_start(self, job: Job) -> float:
+        row = self._execute("SELECT created_at, started_at FROM job_queue WHERE job_id = ?", (job.job_id,)).fetchone()
+        with self._lock:
+            stats = self._lanes[job.lane]
+            stats.running += 1
+            if row:
+                stats.total_wait_seconds += row["started_at"] - row["created_at"]
+        return time.time()
+
+    def _record_end(self, job: Job, started: float, outcome: JobStatus):
+        with self._lock:
+            stats = self._lanes[job.lane]
+            stats.running -= 1
+            stats.total_run_seconds += time.time() - started
+            if outcome == JobStatus.COMPLETED:
+                stats.completed += 1
+            elif outcome == JobStatus.CANCELLED:
+                stats.cancelled += 1
+            else:
+                stats.failed += 1
+
+    def _process_job(self, job: Job, worker: str):
+        """Process a single job on its lane."""
+        logger.info(f"Worker {worker} processing job {job.job_id} (attempt {job.attempts}, {job.lane.value} lane)")
+        started = self._record_start(job)
+        try:
+            # Execute the job function
+            result = _run_callable(job.func, job.args, job.call_kwargs(self))
+
+            self._finish(job.job_id, worker, JobStatus.COMPLETED, result=result)
+            self._record_end(job, started, JobStatus.COMPLETED)
             logger.info(f"Job {job.job_id} completed successfully")
-            
+
+        except JobCancelled:
+            self._finish(job.job_id, worker, JobStatus.CANCELLED)
+            self._record_end(job, started, JobStatus.CANCELLED)
+            logger.info(f"Job {job.job_id} cancelled while running")
+
         except Exception as e:
-            with self._lock:
-                job.status = JobStatus.FAILED
-                job.error = str(e)
-                job.completed_at = datetime.utcnow()
-            
+            self._finish(job.job_id, worker, JobStatus.FAILED, error=str(e))
+            self._record_end(job, started, JobStatus.FAILED)
             logger.error(f"Job {job.job_id} failed: {e}")
-    
-    def submit_job(self, job_id: str, func: Callable, args: tuple = (), kwargs: dict = None) -> str:
-        """Submit a new job to the queue."""
-        job = Job(job_id, func, args, kwargs)
-        
+
+    def _finish(self, job_id: str, worker: str, status: JobStatus, result: Any = None, error: Optional[str] = None):
+        try:
+            result_json = json.dumps(result)
+        except (TypeError, ValueError):
+            result_json = json.dumps(str(result))
+        # Only the lease holder may finish a job; a worker that lost its lease must not overwrite the retry
+        self._execute(
+            """UPDATE job_queue SET status = ?, result = ?, error = ?, completed_at = ?, lease_expires_at = NULL,
+               progress = CASE WHEN ? THEN 100.0 ELSE progress END
+               WHERE job_id = ? AND worker_id = ? AND status = ?""",
+            (status.value, result_json, error, time.time(), status == JobStatus.COMPLETED,
+             job_id, worker, JobStatus.RUNNING.value)
+        )
         with self._lock:
-            self.jobs[job_id] = job
-        
-        self.job_queue.put(job)
+            self._active.pop(job_id, None)
+
+    def submit_job(self, job_id: str, func: Callable, args: tuple = (), kwargs: dict = None,
+                   lane: Optional[JobLane] = None, priority: JobPriority = JobPriority.NORMAL,
+                   submitter: str = "", weight: float = 1.0, idempotency_key: Optional[str] = None) -> str:
+        """
+        Submit a new job to a lane. Arguments must be JSON-serialisable.
+        Without a lane, coroutine functions go to the async lane and everything else to the IO lane.
+        Submitters share each priority class in proportion to weight. If a pending or running job
+        already has idempotency_key, nothing is queued and that job's ID is returned instead.
+        """
+        if lane is None:
+            lane = JobLane.ASYNC if asyncio.iscoroutinefunction(func) else JobLane.IO
+        elif lane == JobLane.ASYNC and not asyncio.iscoroutinefunction(func):
+            raise ValueError(f"Only coroutine functions can run on the async lane, got {func!r}")
+        if weight <= 0:
+            raise ValueError("Job weight must be positive")
+        path = func_path(func)
+
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if idempotency_key:
+                    existing = conn.execute(
+                        "SELECT job_id FROM job_queue WHERE idempotency_key = ? AND status IN (?, ?) LIMIT 1",
+                        (idempotency_key, JobStatus.PENDING.value, JobStatus.RUNNING.value)
+                    ).fetchone()
+                    if existing:
+                        conn.execute("COMMIT")
+                        logger.info(f"Job {job_id} is a duplicate of in-flight job {existing['job_id']}")
+                        return existing["job_id"]
+                conn.execute(
+                    """INSERT INTO job_queue (job_id, func, args, kwargs, status, lane, priority, submitter, weight,
+                       idempotency_key, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (job_id, path, json.dumps(list(args or ())), json.dumps(kwargs or {}),
+                     JobStatus.PENDING.value, lane.value, priority.value, submitter, weight,
+                     idempotency_key, time.time())
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        self._wakeup.set()
+        if self._loop is not None and self._async_wakeup is not None:
+            self._loop.call_soon_threadsafe(self._async_wakeup.set)
         logger.info(f"Job {job_id} submitted to queue")
-        
+
         return job_id
-    
+
+    def record_progress(self, job_id: str, done: float, total: float, unit: str = "items",
+                        message: Optional[str] = None):
+        """Store fractional progress and a (time, done) sample for throughput and ETA."""
+        now = time.time()
+        progress = round(100.0 * done / total, 2) if total else 0.0
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT progress_samples FROM job_queue WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            samples = json.loads(row["progress_samples"])
+            samples.append([now, done])
+            metadata = {"done": done, "total": total, "unit": unit}
+            if message:
+                metadata["message"] = message
+            conn.execute(
+                "UPDATE job_queue SET progress = ?, metadata = ?, progress_samples = ? WHERE job_id = ?",
+                (progress, json.dumps(metadata), json.dumps(samples[-PROGRESS_WINDOW:]), job_id)
+            )
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        row = self._execute("SELECT cancel_requested FROM job_queue WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    @staticmethod
+    def _throughput(row: sqlite3.Row, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Units per second over the recent progress samples, and the ETA that implies."""
+        samples = json.loads(row["progress_samples"])
+        if row["status"] != JobStatus.RUNNING.value or len(samples) < 2:
+            return {"throughput": None, "eta_seconds": None}
+        (first_time, first_done), (last_time, last_done) = samples[0], samples[-1]
+        if last_time <= first_time or last_done <= first_done:
+            return {"throughput": None, "eta_seconds": None}
+        rate = (last_done - first_done) / (last_time - first_time)
+        remaining = max(metadata.get("total", last_done) - last_done, 0)
+        eta = max(remaining / rate - (time.time() - last_time), 0.0)
+        return {
+            "throughput": {"per_second": round(rate, 3), "unit": metadata.get("unit", "items")},
+            "eta_seconds": round(eta, 1)
+        }
+
+    def _to_status(self, row: sqlite3.Row) -> Dict[str, Any]:
+        metadata = json.loads(row["metadata"])
+        return {
+            "job_id": row["job_id"],
+            "status": row["status"],
+            "progress": row["progress"],
+            "created_at": _timestamp(row["created_at"]),
+            "started_at": _timestamp(row["started_at"]),
+            "completed_at": _timestamp(row["completed_at"]),
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "lane": row["lane"],
+            "priority": row["priority"],
+            "submitter": row["submitter"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "metadata": metadata,
+            **self._throughput(row, metadata)
+        }
+
     def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Get the status of a job."""
-        # Try cache first
-        cached_status = cache.get_job_status(job_id)
-        if cached_status:
-            return cached_status
-        
-        job = self.jobs.get(job_id)
-        if not job:
-            return None
-        
-        status = {
-            "job_id": job.job_id,
-            "status": job.status.value,
-            "progress": job.progress,
-            "created_at": job.created_at.isoformat(),
-            "started_at": job.started_at.isoformat() if job.started_at else None,
-            "completed_at": job.completed_at.isoformat() if job.completed_at else None,
-            "error": job.error,
-            "metadata": job.metadata
-        }
-        
-        # Cache the status
-        cache.set_job_status(job_id, status)
-        return status
-    
+        row = self._execute("SELECT * FROM job_queue WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_status(row) if row else None
+
     def cancel_job(self, job_id: str) -> bool:
-        """Cancel a pending job."""
-        job = self.jobs.get(job_id)
-        if not job or job.status != JobStatus.PENDING:
-            return False
-        
+        """
+        Cancel a pending job, or ask a running one to stop. Running jobs stop at their next
+        cancellation check; jobs that never check run to completion.
+        """
         with self._lock:
-            job.status = JobStatus.CANCELLED
-            job.completed_at = datetime.utcnow()
-        
+            conn = self._connection()
+            cursor = conn.execute(
+                "UPDATE job_queue SET status = ?, completed_at = ? WHERE job_id = ? AND status = ?",
+                (JobStatus.CANCELLED.value, time.time(), job_id, JobStatus.PENDING.value)
+            )
+            if cursor.rowcount == 0:
+                cursor = conn.execute(
+                    "UPDATE job_queue SET cancel_requested = 1 WHERE job_id = ? AND status = ?",
+                    (job_id, JobStatus.RUNNING.value)
+                )
+        if cursor.rowcount == 0:
+            return False
+
         logger.info(f"Job {job_id} cancelled")
         return True
-    
+
     def list_jobs(self, status: Optional[JobStatus] = None) -> List[Dict[str, Any]]:
         """List all jobs, optionally filtered by status."""
-        jobs = []
-        
+        if status is None:
+            rows = self._execute("SELECT * FROM job_queue ORDER BY created_at").fetchall()
+        else:
+            rows = self._execute("SELECT * FROM job_queue WHERE status = ? ORDER BY created_at",
+                                 (status.value,)).fetchall()
+        return [self._to_status(row) for row in rows]
+
+    def cleanup(self, older_than_seconds: Optional[float] = None) -> int:
+        """Delete finished jobs older than the retention window; returns how many were removed."""
+        retention = self.retention_seconds if older_than_seconds is None else older_than_seconds
+        cursor = self._execute(
+            f"DELETE FROM job_queue WHERE status IN ({','.join('?' for _ in FINISHED_STATUSES)}) AND completed_at < ?",
+            (*FINISHED_STATUSES, time.time() - retention)
+        )
+        if cursor.rowcount:
+            logger.info(f"Pruned {cursor.rowcount} finished jobs")
+        return cursor.rowcount
+
+    def get_lane_stats(self) -> Dict[str, Any]:
+        """Queue depth across all processes plus this process's per-lane counters."""
+        now = time.time()
+        depth = {
+            row["lane"]: row
+            for row in self._execute(
+                "SELECT lane, COUNT(*) AS pending, MIN(created_at) AS oldest FROM job_queue WHERE status = ? GROUP BY lane",
+                (JobStatus.PENDING.value,)
+            ).fetchall()
+        }
+        lanes = {}
         with self._lock:
-            for job in self.jobs.values():
-                if status is None or job.status == status:
-                    jobs.append(self.get_job_status(job.job_id))
-        
-        return jobs
+            for lane, stats in self._lanes.items():
+                pending = depth.get(lane.value)
+                finished = stats.completed + stats.failed + stats.cancelled
+                lanes[lane.value] = {
+                    "limit": stats.limit,
+                    "running": stats.running,
+                    "pending": pending["pending"] if pending else 0,
+                    "oldest_pending_seconds": round(now - pending["oldest"], 3) if pending else 0.0,
+                    "completed": stats.completed,
+                    "failed": stats.failed,
+                    "cancelled": stats.cancelled,
+                    "avg_wait_seconds": round(stats.total_wait_seconds / finished, 3) if finished else 0.0,
+                    "avg_run_seconds": round(stats.total_run_seconds / finished, 3) if finished else 0.0
+                }
+        return {"owner": self.owner, "cpu_lane_here": self._cpu_lane_lock is not None, "lanes": lanes}
 
 # Global job queue instance
-job_queue = JobQueue() 
\ No newline at end of file
+job_queue = JobQueue()
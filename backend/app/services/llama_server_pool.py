@@ -0,0 +1,279 @@
+import shlex
+import subprocess
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+import httpx
+import requests
+from app.config import settings
+from app.utils.file_lock import try_lock
+from app.utils.logger import logger
+
+LOCAL_PROVIDER = "local"
+
+STOPPED = "stopped"
+STARTING = "starting"
+READY = "ready"
+UNREACHABLE = "unreachable"
+
+class LlamaServerUnavailable(Exception):
+    """No local llama.cpp server slot is ready to take a request."""
+
+class LlamaServerSlot:
+    """One long-lived llama-server process with the model loaded, listening on its own port."""
+
+    def __init__(self, index: int, host: str, port: int):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.url = f"http://{host}:{port}"
+        self.process: Optional[subprocess.Popen] = None
+        self.state = STOPPED
+        self.in_flight = 0
+        self.requests = 0
+        self.restarts = 0
+        self.health_failures = 0
+        self.started_at = 0.0
+        self.load_seconds: Optional[float] = None
+        self.next_restart = 0.0
+        self.backoff = 1.0
+
+    @property
+    def chat_url(self) -> str:
+        return f"{self.url}/v1/chat/completions"
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "port": self.port,
+            "pid": self.process.pid if self.alive() else None,
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "restarts": self.restarts,
+            "load_seconds": round(self.load_seconds, 1) if self.load_seconds is not None else None
+        }
+
+class LlamaServerPool:
+    """
+    Managed pool of llama.cpp servers for the offline deployment. Each slot keeps the GGUF model
+    loaded between questions; a monitor thread polls /health, restarts slots that crash, hang or
+    never finish loading (with exponential back-off), and requests go to the least busy ready slot.
+
+    Every uvicorn worker runs a pool over the same ports, but only the worker holding
+    LLAMA_SERVER_LOCK_FILE supervises the processes. The others only health-check the slots and send
+    requests to them, and take over supervision if that worker exits.
+    """
+
+    def __init__(self, binary: Optional[str] = None, model_path: Optional[str] = None, size: Optional[int] = None,
+                 host: Optional[str] = None, base_port: Optional[int] = None, extra_args: Optional[str] = None):
+        self.binary = binary or settings.LLAMA_SERVER_PATH
+        self.model_path = model_path or settings.LLM_MODEL_PATH
+        self.size = size or settings.LLAMA_SERVER_SLOTS
+        self.host = host or settings.LLAMA_SERVER_HOST
+        self.base_port = base_port or settings.LLAMA_SERVER_BASE_PORT
+        self.extra_args = settings.LLAMA_SERVER_EXTRA_ARGS if extra_args is None else extra_args
+        self.slots: List[LlamaServerSlot] = []
+        self.running = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+        self._supervisor_lock: Optional[BinaryIO] = None
+
+    @property
+    def supervising(self) -> bool:
+        """Whether this process launches and restarts the servers rather than only using them"""
+        return self._supervisor_lock is not None
+
+    def command(self, slot: LlamaServerSlot) -> List[str]:
+        command = [
+            self.binary, "-m", self.model_path, "--host", slot.host, "--port", str(slot.port),
+            "-c", str(settings.LLAMA_SERVER_CTX_SIZE), "--parallel", str(settings.LLAMA_SERVER_PARALLEL)
+        ]
+        if settings.LLAMA_SERVER_THREADS > 0:
+            command += ["-t", str(settings.LLAMA_SERVER_THREADS)]
+        return command + shlex.split(self.extra_args)
+
+    def start(self):
+        """
+        Launch every slot, or follow the supervising worker's slots, and start the health monitor;
+        slots take requests once their model has loaded.
+        """
+        if self.running:
+            return
+        if not Path(self.model_path).exists():
+            logger.error(f"llama.cpp model not found at {self.model_path}; local server pool not started")
+            return
+        self.running = True
+        self.slots = [LlamaServerSlot(i, self.host, self.base_port + i) for i in range(self.size)]
+        for slot in self.slots:
+            slot.state = STARTING
+            slot.started_at = time.monotonic()
+        self._take_over()
+        if not self.supervising:
+            logger.info(f"llama.cpp server slots are supervised by another worker; using ports "
+                        f"{self.base_port}-{self.base_port + self.size - 1}")
+        self._monitor = threading.Thread(target=self._monitor_loop, name="llama-server-monitor", daemon=True)
+        self._monitor.start()
+
+    def _take_over(self):
+        """
+        Become the supervisor if no other process is. Servers left running by a previous supervisor
+        that exited without stopping them are kept rather than launched again on a busy port.
+        """
+        self._supervisor_lock = try_lock(settings.LLAMA_SERVER_LOCK_FILE)
+        if not self.supervising:
+            return
+        for slot in self.slots:
+            if self._health(slot) == 200:
+                logger.info(f"Adopted running llama.cpp server slot {slot.index} on port {slot.port}")
+            else:
+                self._launch(slot)
+        logger.info(f"Supervising {self.size} llama.cpp server slots for {self.model_path}")
+
+    def stop(self):
+        """Terminate the slots this process launched and let another worker take over supervision."""
+        if not self.running:
+            return
+        self.running = False
+        self._wakeup.set()
+        if self._monitor:
+            self._monitor.join(timeout=5)
+            self._monitor = None
+        for slot in self.slots:
+            self._terminate(slot)
+            slot.state = STOPPED
+        if self.supervising:
+            self._supervisor_lock.close()
+            self._supervisor_lock = None
+            logger.info("Stopped llama.cpp server slots")
+
+    def _launch(self, slot: LlamaServerSlot):
+        log_path = Path(settings.LOG_FILE).parent / f"llama-server-{slot.index}.log"
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "ab") as log:
+            slot.process = subprocess.Popen(self.command(slot), stdout=log, stderr=subprocess.STDOUT,
+                                            stdin=subprocess.DEVNULL)
+        slot.state = STARTING
+        slot.started_at = time.monotonic()
+        slot.health_failures = 0
+        logger.info(f"Launched llama.cpp server slot {slot.index} on port {slot.port} (pid {slot.process.pid})")
+
+    def _terminate(self, slot: LlamaServerSlot):
+        if slot.alive():
+            slot.process.terminate()
+            try:
+                slot.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                slot.process.kill()
+                slot.process.wait()
+
+    def _restart(self, slot: LlamaServerSlot, reason: str):
+        """Replace a failed slot, backing off exponentially while it keeps failing"""
+        now = time.monotonic()
+        if now < slot.next_restart:
+            return
+        logger.warning(f"Restarting llama.cpp server slot {slot.index}: {reason}")
+        self._terminate(slot)
+        slot.restarts += 1
+        slot.next_restart = now + slot.backoff
+        slot.backoff = min(slot.backoff * 2, settings.LLAMA_SERVER_MAX_BACKOFF)
+        self._launch(slot)
+
+    def _health(self, slot: LlamaServerSlot) -> Optional[int]:
+        try:
+            return requests.get(f"{slot.url}/health", timeout=settings.LLAMA_SERVER_HEALTH_TIMEOUT).status_code
+        except requests.exceptions.RequestException:
+            return None
+
+    def check(self, slot: LlamaServerSlot):
+        """
+        One health check: llama-server answers /health with 503 while loading and 200 once ready.
+        Only the supervisor restarts failed slots; the health of an adopted server is all it knows.
+        """
+        if slot.process is not None and not slot.alive():
+            slot.state = UNREACHABLE
+            if self.supervising:
+                self._restart(slot, f"process exited with code {slot.process.returncode}")
+            return
+        status = self._health(slot)
+
+        if status == 200:
+            if slot.state == STARTING:
+                slot.load_seconds = time.monotonic() - slot.started_at
+                logger.info(f"llama.cpp server slot {slot.index} ready after {slot.load_seconds:.1f}s")
+            elif slot.state == UNREACHABLE:
+                logger.info(f"llama.cpp server slot {slot.index} reachable again")
+            slot.state = READY
+            slot.health_failures = 0
+            slot.backoff = 1.0
+        elif slot.state == STARTING:
+            if self.supervising and time.monotonic() - slot.started_at > settings.LLAMA_SERVER_STARTUP_TIMEOUT:
+                self._restart(slot, "model did not load in time")
+        else:
+            slot.health_failures += 1
+            slot.state = UNREACHABLE
+            if self.supervising and slot.health_failures >= settings.LLAMA_SERVER_MAX_HEALTH_FAILURES:
+                self._restart(slot, f"{slot.health_failures} failed health checks")
+
+    def _monitor_loop(self):
+        while self.running:
+            if not self.supervising:
+                self._take_over()
+            for slot in self.slots:
+                if not self.running:
+                    break
+                try:
+                    self.check(slot)
+                except Exception as e:
+                    logger.error(f"Health check of llama.cpp server slot {slot.index} failed: {e}")
+            self._wakeup.wait(settings.LLAMA_SERVER_HEALTH_INTERVAL)
+            self._wakeup.clear()
+
+    @contextmanager
+    def lease(self) -> Iterator[str]:
+        """
+        Chat completions URL of the ready slot with the fewest requests in flight, held for the
+        duration of the request. A connection failure takes the slot out of rotation until it passes a
+        health check again.
+        """
+        with self._lock:
+            ready = [slot for slot in self.slots if slot.state == READY]
+            if not ready:
+                raise LlamaServerUnavailable("No local llama.cpp server is ready" if self.running
+                                             else "Local llama.cpp server pool is not running")
+            slot = min(ready, key=lambda candidate: candidate.in_flight)
+            slot.in_flight += 1
+            slot.requests += 1
+        try:
+            yield slot.chat_url
+        except (requests.exceptions.ConnectionError, httpx.ConnectError):
+            slot.state = UNREACHABLE
+            self._wakeup.set()
+            raise
+        finally:
+            with self._lock:
+                slot.in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "supervisor": self.supervising,
+                "model": self.model_path,
+                "ready": sum(slot.state == READY for slot in self.slots),
+                "slots": [slot.get_stats() for slot in self.slots]
+            }
+
+def completion_endpoint(provider: str, api_url: Optional[str]):
+    """Context manager giving the URL to send a completion to; local requests lease a llama.cpp slot"""
+    if provider == LOCAL_PROVIDER:
+        return llama_server_pool.lease()
+    return nullcontext(api_url)
+
+# Global pool of local llama.cpp servers, started by the app when LLAMA_SERVER_ENABLED
+llama_server_pool = LlamaServerPool()
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.cache import RedisCache, cache
+from app.utils.logger import logger
+
+PREFIX = "llm_response"
+
+class CachedAnswer(str):
+    """An answer served from the cache rather than by a provider."""
+
+def is_error_answer(answer: str) -> bool:
+    return answer.startswith("[LLM ERROR]") or answer.startswith("[ERROR]")
+
+def _manifest_version(topic: str) -> int:
+    # Imported lazily so the LLM services don't load a vector store backend on import
+    from app.services.vector_store import vector_store
+    return vector_store.manifest.version(topic)
+
+class LLMResponseCache:
+    """
+    Exact-match cache of LLM answers, keyed by the hash of (provider, model, system message, prompt,
+    retrieved chunk IDs, max_tokens, temperature) and the topic's manifest version, so answers
+    drop out as soon as any document in the topic is added, changed or removed.
+    Entries live in Redis when it is enabled, otherwise in a bounded in-process LRU.
+    """
+
+    def __init__(self, redis_cache: Optional[RedisCache] = None,
+                 topic_version: Optional[Callable[[str], int]] = None,
+                 max_entries: Optional[int] = None):
+        self.redis = redis_cache or cache
+        self.topic_version = topic_version or _manifest_version
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.enabled = settings.LLM_CACHE_ENABLED
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._topics: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self.redis.enabled else "memory"
+
+    def make_key(self, topic: str, provider: str, model: str, system_message: Optional[str], prompt: str,
+                 context_documents: Optional[List[Dict]], max_tokens: int, temperature: float) -> str:
+        chunk_ids = [
+            doc.get("id") or hashlib.sha256(doc.get("content", "").encode("utf-8")).hexdigest()
+            for doc in context_documents or []
+        ]
+        fingerprint = json.dumps(
+            [provider, model, system_message, prompt, chunk_ids, max_tokens, temperature],
+            separators=(",", ":")
+        )
+        digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+        return f"{topic}:{self.topic_version(topic)}:{digest}"
+
+    def ttl_for(self, topic: str) -> int:
+        return settings.LLM_CACHE_TOPIC_TTLS.get(topic, settings.LLM_CACHE_TTL)
+
+    def get(self, topic: str, key: str) -> Optional[str]:
+        if self.redis.enabled:
+            answer = self.redis.get(PREFIX, key)
+        else:
+            with self._lock:
+                entry = self._local.get(key)
+                answer = None
+                if entry is not None:
+                    expires_at, answer = entry
+                    if expires_at < time.time():
+                        del self._local[key]
+                        answer = None
+                    else:
+                        self._local.move_to_end(key)
+        self._count(topic, "hits" if answer is not None else "misses")
+        return CachedAnswer(answer) if answer is not None else None
+
+    def set(self, topic: str, key: str, answer: str):
+        """Store an answer; empty answers and provider errors are never cached."""
+        if not answer or is_error_answer(answer):
+            return
+        ttl = self.ttl_for(topic)
+        if self.redis.enabled:
+            self.redis.set(PREFIX, key, answer, ttl)
+        else:
+            with self._lock:
+                self._local[key] = (time.time() + ttl, answer)
+                self._local.move_to_end(key)
+                while len(self._local) > self.max_entries:
+                    self._local.popitem(last=False)
+        with self._lock:
+            self.stores += 1
+
+    def _count(self, topic: str, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            counters = self._topics.setdefault(topic, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def clear(self):
+        if self.redis.enabled:
+            self.redis.clear_prefix(PREFIX)
+        with self._lock:
+            self._local.clear()
+        logger.info("LLM response cache cleared")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rates for this process, overall and per topic."""
+        def rate(hits: int, misses: int) -> float:
+            return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "backend": self.backend,
+                "entries": len(self._local) if not self.redis.enabled else None,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": rate(self.hits, self.misses),
+                "topics": {
+                    topic: dict(counters, hit_rate=rate(counters["hits"], counters["misses"]))
+                    for topic, counters in self._topics.items()
+                }
+            }
+
+# Global response cache
+llm_response_cache = LLMResponseCache()
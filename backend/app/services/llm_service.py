@@ -1,6 +1,54 @@
 
+import httpx
+import json
 import requests
 import os
+from app.config import settings
+from app.services.context_assembler import context_assembler
+from app.services.http_client import llm_http
+from app.services.llama_server_pool import LOCAL_PROVIDER, LlamaServerUnavailable, completion_endpoint
+from app.services.llm_cache import is_error_answer, llm_response_cache
+from app.services.rate_governor import RateLimitExceeded
+
+def parse_stream_line(provider, line):
+    """Text delta carried by one server-sent event line of a streamed completion, if any"""
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == "[DONE]":
+        return None
+    event = json.loads(data)
+    if provider == "huggingface":
+        # Text Generation Inference: {"token": {"text": ..., "special": ...}, "generated_text": ...}
+        token = event.get("token") or {}
+        return None if token.get("special") else token.get("text")
+    # OpenAI-compatible: {"choices": [{"delta": {"content": ...}}]}
+    choices = event.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content")
+
+async def stream_completion(provider, url, headers, payload, request_error):
+    """
+    Yield text deltas of a completion as the provider generates them.
+    A failure is yielded as a final "[LLM ERROR] ..." piece, the same message the blocking call returns.
+    """
+    payload = dict(payload, stream=True)
+    try:
+        with completion_endpoint(provider, url) as endpoint:
+            async with llm_http.astream(provider, endpoint, headers=headers, json=payload) as response:
+                if response.is_error:
+                    # Read the error body so request_error can include the provider's message
+                    await response.aread()
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    delta = parse_stream_line(provider, line)
+                    if delta:
+                        yield delta
+    except (RateLimitExceeded, LlamaServerUnavailable) as e:
+        yield f"[LLM ERROR] {str(e)}"
+    except httpx.HTTPError as e:
+        yield request_error(e, getattr(e, "response", None))
+    except Exception as e:
+        yield f"[LLM ERROR] Unexpected error: {str(e)}"
 
 class LLMService:
     def __init__(self, model=None, provider="huggingface"):
@@ -16,98 +64,138 @@ class LLMService:
             self.api_key = os.getenv("HUGGINGFACE_API_KEY", "")
             self.model = model or os.getenv("HUGGINGFACE_MODEL", "HuggingFaceH4/zephyr-7b-beta")
             self.api_url = f"{os.getenv('HUGGINGFACE_BASE_URL', 'https://api-inference.huggingface.co/models')}/{self.model}"
+        elif provider == LOCAL_PROVIDER:
+            # Offline llama.cpp server pool; the URL is that of the slot leased for each request
+            self.api_key = "local" if settings.LLAMA_SERVER_ENABLED else ""
+            self.model = model or settings.LLM_NAME
+            self.api_url = None
         else:  # fallback to groq
             self.api_key = os.getenv("GROQ_API_KEY", "")
             self.model = model or os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
             self.api_url = "https://api.groq.com/openai/v1/chat/completions"
 
-    def call_llm(self, prompt, max_tokens=512, temp=0.7, system_message=None):
-        if not self.api_key:
-            return f"[ERROR] API key not configured. Please set {self.provider.upper()}_API_KEY in environment variables."
-        
+    def _build_request(self, prompt, max_tokens, temp, system_message=None):
+        """Headers and JSON payload for one completion in this provider's format"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
-        try:
-            if self.provider == "huggingface":
-                # Hugging Face Inference API format
-                # Combine system message and prompt for Hugging Face
-                full_prompt = prompt
-                if system_message:
-                    full_prompt = f"<|system|>\n{system_message}\n<|user|>\n{prompt}\n<|assistant|>\n"
-                else:
-                    full_prompt = f"<|system|>\nYou are a helpful AI assistant for educational purposes. Provide clear, accurate, and educational responses.\n<|user|>\n{prompt}\n<|assistant|>\n"
-                
-                payload = {
-                    "inputs": full_prompt,
-                    "parameters": {
-                        "max_new_tokens": max_tokens,
-                        "temperature": temp,
-                        "return_full_text": False
-                    }
+        if self.provider == "huggingface":
+            # Hugging Face Inference API format
+            # Combine system message and prompt for Hugging Face
+            full_prompt = prompt
+            if system_message:
+                full_prompt = f"<|system|>\n{system_message}\n<|user|>\n{prompt}\n<|assistant|>\n"
+            else:
+                full_prompt = f"<|system|>\nYou are a helpful AI assistant for educational purposes. Provide clear, accurate, and educational responses.\n<|user|>\n{prompt}\n<|assistant|>\n"
+            
+            payload = {
+                "inputs": full_prompt,
+                "parameters": {
+                    "max_new_tokens": max_tokens,
+                    "temperature": temp,
+                    "return_full_text": False
                 }
-                
-                response = requests.post(self.api_url, headers=headers, json=payload, timeout=60)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Handle Hugging Face response format
-                if isinstance(data, list) and len(data) > 0:
-                    return data[0].get("generated_text", "").strip()
-                elif isinstance(data, dict):
-                    return data.get("generated_text", "").strip()
-                else:
-                    return "[ERROR] Unexpected response format from Hugging Face API"
-                    
+            }
+            return headers, payload
+        
+        # OpenAI-compatible format for OpenRouter and Groq
+        # Add OpenRouter specific headers
+        if self.provider == "openrouter":
+            headers.update({
+                "HTTP-Referer": self.site_url,
+                "X-Title": self.app_name
+            })
+        
+        # Prepare messages
+        messages = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        else:
+            messages.append({"role": "system", "content": "You are a helpful AI assistant for educational purposes. Provide clear, accurate, and educational responses."})
+        
+        messages.append({"role": "user", "content": prompt})
+        
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temp
+        }
+        return headers, payload
+
+    def _parse_response(self, data):
+        if self.provider == "huggingface":
+            # Handle Hugging Face response format
+            if isinstance(data, list) and len(data) > 0:
+                return data[0].get("generated_text", "").strip()
+            elif isinstance(data, dict):
+                return data.get("generated_text", "").strip()
             else:
-                # OpenAI-compatible format for OpenRouter and Groq
-                # Add OpenRouter specific headers
-                if self.provider == "openrouter":
-                    headers.update({
-                        "HTTP-Referer": self.site_url,
-                        "X-Title": self.app_name
-                    })
-                
-                # Prepare messages
-                messages = []
-                if system_message:
-                    messages.append({"role": "system", "content": system_message})
+                return "[ERROR] Unexpected response format from Hugging Face API"
+        return data["choices"][0]["message"]["content"].strip()
+
+    def _request_error(self, e, response=None):
+        error_msg = f"[LLM ERROR] Request failed: {str(e)}"
+        if response is not None:
+            try:
+                error_detail = response.json()
+                if self.provider == "huggingface":
+                    error_msg += f" - {error_detail.get('error', 'Unknown error')}"
                 else:
-                    messages.append({"role": "system", "content": "You are a helpful AI assistant for educational purposes. Provide clear, accurate, and educational responses."})
-                
-                messages.append({"role": "user", "content": prompt})
-                
-                payload = {
-                    "model": self.model,
-                    "messages": messages,
-                    "max_tokens": max_tokens,
-                    "temperature": temp
-                }
-                
-                response = requests.post(self.api_url, headers=headers, json=payload, timeout=60)
-                response.raise_for_status()
-                data = response.json()
-                return data["choices"][0]["message"]["content"].strip()
-                
+                    error_msg += f" - {error_detail.get('error', {}).get('message', 'Unknown error')}"
+            except:
+                error_msg += f" - HTTP {response.status_code}"
+        return error_msg
+
+    def call_llm(self, prompt, max_tokens=512, temp=0.7, system_message=None):
+        if not self.api_key:
+            return f"[ERROR] API key not configured. Please set {self.provider.upper()}_API_KEY in environment variables."
+        
+        headers, payload = self._build_request(prompt, max_tokens, temp, system_message)
+        try:
+            with completion_endpoint(self.provider, self.api_url) as url:
+                response = llm_http.post(self.provider, url, headers=headers, json=payload)
+            response.raise_for_status()
+            return self._parse_response(response.json())
+        except (RateLimitExceeded, LlamaServerUnavailable) as e:
+            return f"[LLM ERROR] {str(e)}"
         except requests.exceptions.RequestException as e:
-            error_msg = f"[LLM ERROR] Request failed: {str(e)}"
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_detail = e.response.json()
-                    if self.provider == "huggingface":
-                        error_msg += f" - {error_detail.get('error', 'Unknown error')}"
-                    else:
-                        error_msg += f" - {error_detail.get('error', {}).get('message', 'Unknown error')}"
-                except:
-                    error_msg += f" - HTTP {e.response.status_code}"
-            return error_msg
+            return self._request_error(e, getattr(e, "response", None))
         except Exception as e:
             return f"[LLM ERROR] Unexpected error: {str(e)}"
+
+    async def acall_llm(self, prompt, max_tokens=512, temp=0.7, system_message=None):
+        """Non-blocking call_llm for use inside request handlers"""
+        if not self.api_key:
+            return f"[ERROR] API key not configured. Please set {self.provider.upper()}_API_KEY in environment variables."
+        
+        headers, payload = self._build_request(prompt, max_tokens, temp, system_message)
+        try:
+            with completion_endpoint(self.provider, self.api_url) as url:
+                response = await llm_http.apost(self.provider, url, headers=headers, json=payload)
+            response.raise_for_status()
+            return self._parse_response(response.json())
+        except (RateLimitExceeded, LlamaServerUnavailable) as e:
+            return f"[LLM ERROR] {str(e)}"
+        except httpx.HTTPError as e:
+            return self._request_error(e, getattr(e, "response", None))
+        except Exception as e:
+            return f"[LLM ERROR] Unexpected error: {str(e)}"
+
+    async def astream_llm(self, prompt, max_tokens=512, temp=0.7, system_message=None):
+        """Yield the answer in pieces as the provider generates it"""
+        if not self.api_key:
+            yield f"[ERROR] API key not configured. Please set {self.provider.upper()}_API_KEY in environment variables."
+            return
+        
+        headers, payload = self._build_request(prompt, max_tokens, temp, system_message)
+        async for delta in stream_completion(self.provider, self.api_url, headers, payload, self._request_error):
+            yield delta
     
-    def call_llm_with_context(self, question, context_documents=None, max_tokens=1024, temp=0.7):
-        """Call LLM with retrieved context from knowledge base"""
+    def _context_prompt(self, question, context_documents=None, max_tokens=1024):
+        """System message and prompt for answering question from retrieved context, fitted to the model's token budget"""
         system_message = """You are an intelligent educational assistant for Elimu Hub AI. Your role is to help students learn by providing accurate, clear, and educational responses.
 
 Guidelines:
@@ -119,19 +207,69 @@ Guidelines:
 6. Use examples when helpful
 7. Be encouraging and supportive in your tone"""
 
-        if context_documents and len(context_documents) > 0:
-            context_text = "\n\n".join([doc.get('content', '') for doc in context_documents[:3]])
-            prompt = f"""Based on the following educational content, please answer the student's question:
+        template = """Based on the following educational content, please answer the student's question:
 
 CONTEXT:
-{context_text}
+{context}
 
 STUDENT'S QUESTION: {question}
 
 Please provide a comprehensive, educational answer based on the context provided. If the context doesn't fully address the question, supplement with your knowledge while clearly indicating what comes from the provided materials versus your general knowledge."""
+        reserved = system_message + template.format(context="", question=question)
+        context_text, _ = context_assembler.assemble(context_documents, self.model, max_tokens, reserved)
+        if context_text:
+            prompt = template.format(context=context_text, question=question)
         else:
             prompt = f"""Please help answer this educational question: {question}
 
 Since no specific course materials were found, please provide a helpful educational response using your knowledge. Encourage the student and provide clear explanations."""
 
-        return self.call_llm(prompt, max_tokens=max_tokens, temp=temp, system_message=system_message) 
\ No newline at end of file
+        return system_message, prompt
+
+    def _cache_key(self, topic, system_message, prompt, context_documents, max_tokens, temp):
+        """Response cache key, or None when the answer shouldn't be cached"""
+        if not topic or not llm_response_cache.enabled:
+            return None
+        return llm_response_cache.make_key(topic, self.provider, self.model, system_message, prompt,
+                                           context_documents, max_tokens, temp)
+
+    def call_llm_with_context(self, question, context_documents=None, max_tokens=1024, temp=0.7, topic=None):
+        """Call LLM with retrieved context from knowledge base; answers are cached per topic when topic is given"""
+        system_message, prompt = self._context_prompt(question, context_documents, max_tokens)
+        key = self._cache_key(topic, system_message, prompt, context_documents, max_tokens, temp)
+        cached = llm_response_cache.get(topic, key) if key else None
+        if cached is not None:
+            return cached
+        answer = self.call_llm(prompt, max_tokens=max_tokens, temp=temp, system_message=system_message)
+        if key:
+            llm_response_cache.set(topic, key, answer)
+        return answer
+
+    async def acall_llm_with_context(self, question, context_documents=None, max_tokens=1024, temp=0.7, topic=None):
+        """Non-blocking call_llm_with_context"""
+        system_message, prompt = self._context_prompt(question, context_documents, max_tokens)
+        key = self._cache_key(topic, system_message, prompt, context_documents, max_tokens, temp)
+        cached = llm_response_cache.get(topic, key) if key else None
+        if cached is not None:
+            return cached
+        answer = await self.acall_llm(prompt, max_tokens=max_tokens, temp=temp, system_message=system_message)
+        if key:
+            llm_response_cache.set(topic, key, answer)
+        return answer
+
+    async def astream_llm_with_context(self, question, context_documents=None, max_tokens=1024, temp=0.7, topic=None):
+        """Streaming call_llm_with_context; a cached answer arrives as a single piece"""
+        system_message, prompt = self._context_prompt(question, context_documents, max_tokens)
+        key = self._cache_key(topic, system_message, prompt, context_documents, max_tokens, temp)
+        cached = llm_response_cache.get(topic, key) if key else None
+        if cached is not None:
+            yield cached
+            return
+        answer = ""
+        failed = False
+        async for delta in self.astream_llm(prompt, max_tokens=max_tokens, temp=temp, system_message=system_message):
+            failed = failed or is_error_answer(delta)
+            answer += delta
+            yield delta
+        if key and not failed:
+            llm_response_cache.set(topic, key, answer.strip())
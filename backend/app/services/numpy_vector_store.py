@@ -0,0 +1,758 @@
+import heapq
+import json
+import os
+import re
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from app.config import settings
+from app.services.ann_index import HNSWIndex, ann_available, load_ann_params, save_ann_params, INDEX_FILE as ANN_INDEX_FILE, LABELS_FILE as ANN_LABELS_FILE, PARAMS_FILE as ANN_PARAMS_FILE
+from app.services.chunk_manifest import ChunkManifest, ManifestSyncMixin, chunk_metadata
+from app.services.quantization import create_quantizer, load_quantizer
+from app.utils.logger import logger
+
+METADATA_FILE = "metadata.json"
+QUANTIZER_FILE = "quantizer.npz"
+VECTORS_PREFIX = "vectors"
+CODES_PREFIX = "codes"
+ROWS_PREFIX = "rows"
+
+def _topic_dirname(topic: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", topic)
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _segment_path(directory: Path, prefix: str, segment: int, suffix: str) -> Path:
+    return directory / f"{prefix}-{segment:05d}{suffix}"
+
+def _replace_file(path: Path, write):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+class SegmentedRows:
+    """
+    Growable in-memory matrix persisted as fixed-size .npy segments: appends fill spare capacity
+    (doubling when full) and persist() rewrites only the segments holding changed rows.
+    """
+
+    def __init__(self, directory: Path, prefix: str, segment_rows: int):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.segment_rows = segment_rows
+        self.size = 0
+        self._buffer: Optional[np.ndarray] = None
+        self._dirty: Set[int] = set()
+        self._on_disk = 0
+
+    @property
+    def array(self) -> Optional[np.ndarray]:
+        """View of the live rows; later appends and replacements leave views already handed out intact"""
+        return None if self._buffer is None else self._buffer[:self.size]
+
+    def path(self, segment: int) -> Path:
+        return _segment_path(self.directory, self.prefix, segment, ".npy")
+
+    def load(self, count: int) -> bool:
+        """Read the segments holding the first count rows; False when one is missing or the wrong size."""
+        parts = []
+        loaded = 0
+        while loaded < count:
+            path = self.path(len(parts))
+            if not path.exists():
+                return False
+            part = np.load(path)
+            if part.shape[0] != self.segment_rows and loaded + part.shape[0] < count:
+                return False
+            parts.append(part)
+            loaded += part.shape[0]
+        self._buffer = np.concatenate(parts) if parts else None
+        self.size = count
+        self._on_disk = len(parts)
+        self._dirty.clear()
+        return True
+
+    def _mark(self, start: int, stop: int):
+        if stop > start:
+            self._dirty.update(range(start // self.segment_rows, (stop - 1) // self.segment_rows + 1))
+
+    def append(self, rows: np.ndarray):
+        start = self.size
+        needed = start + rows.shape[0]
+        if self._buffer is None or needed > self._buffer.shape[0]:
+            capacity = max(needed, 2 * self._buffer.shape[0] if self._buffer is not None else 0)
+            buffer = np.empty((capacity,) + rows.shape[1:], dtype=rows.dtype)
+            if start:
+                buffer[:start] = self._buffer[:start]
+            self._buffer = buffer
+        self._buffer[start:needed] = rows
+        self.size = needed
+        self._mark(start, needed)
+
+    def set_rows(self, rows: List[int], values: np.ndarray):
+        self._buffer[rows] = values
+        for row in rows:
+            self._dirty.add(row // self.segment_rows)
+
+    def replace(self, array: np.ndarray, first_changed: int = 0):
+        """Swap in a new matrix (e.g. after removing rows); rows before first_changed are unchanged."""
+        self._buffer = array
+        self.size = array.shape[0]
+        self._mark(first_changed, self.size)
+
+    def delete(self, rows: Set[int]):
+        keep = [i for i in range(self.size) if i not in rows]
+        # Fancy indexing copies, so searches still holding the old matrix see consistent rows
+        self.replace(self.array[keep], min(rows))
+
+    def persist(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segments = -(-self.size // self.segment_rows)
+        for segment in sorted(self._dirty):
+            if segment < segments:
+                start = segment * self.segment_rows
+                block = self._buffer[start:min(start + self.segment_rows, self.size)]
+                _replace_file(self.path(segment), lambda f: np.save(f, block))
+        for segment in range(segments, self._on_disk):
+            self.path(segment).unlink(missing_ok=True)
+        self._on_disk = segments
+        self._dirty.clear()
+
+    def remove_files(self):
+        for path in self.directory.glob(f"{self.prefix}-*.npy"):
+            path.unlink()
+        self._buffer = None
+        self.size = 0
+        self._on_disk = 0
+        self._dirty.clear()
+
+class RowsView:
+    """Read-only snapshot of a MappedRows matrix, indexed like an ndarray by row lists and slices."""
+
+    def __init__(self, segments: List[np.ndarray], segment_rows: int, size: int):
+        self.segments = segments
+        self.segment_rows = segment_rows
+        self.shape = (size,) + segments[0].shape[1:]
+        self.dtype = segments[0].dtype
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = np.concatenate(self.segments)
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        """Copy of the given rows, reading only the pages that hold them"""
+        if isinstance(rows, slice):
+            rows = np.arange(self.shape[0])[rows]
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((rows.shape[0],) + self.shape[1:], dtype=self.dtype)
+        segments = rows // self.segment_rows
+        for segment in np.unique(segments):
+            mask = segments == segment
+            out[mask] = self.segments[segment][rows[mask] - segment * self.segment_rows]
+        return out
+
+    def blocks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """(first row, rows) of each segment in order"""
+        for segment, rows in enumerate(self.segments):
+            yield segment * self.segment_rows, rows
+
+class MappedRows(SegmentedRows):
+    """
+    Segmented matrix that stays on disk: persisted segments are memory-mapped, so the OS pages in
+    only the rows a search reads, and a changed segment is held in memory until persist() writes it.
+    Segments are replaced rather than written in place, so a RowsView stays consistent while rows
+    change.
+    """
+
+    def __init__(self, directory: Path, prefix: str, segment_rows: int):
+        super().__init__(directory, prefix, segment_rows)
+        self._segments: List[np.ndarray] = []
+
+    @property
+    def array(self) -> Optional[RowsView]:
+        return RowsView(list(self._segments), self.segment_rows, self.size) if self.size else None
+
+    def load(self, count: int) -> bool:
+        """Map the segments holding the first count rows; False when one is missing or the wrong size."""
+        segments = []
+        loaded = 0
+        while loaded < count:
+            path = self.path(len(segments))
+            if not path.exists():
+                return False
+            part = np.load(path, mmap_mode="r")
+            if part.shape[0] != self.segment_rows and loaded + part.shape[0] < count:
+                return False
+            segments.append(part)
+            loaded += part.shape[0]
+        if segments:
+            segments[-1] = segments[-1][:count - (len(segments) - 1) * self.segment_rows]
+        self._segments = segments
+        self.size = count
+        self._on_disk = len(segments)
+        self._dirty.clear()
+        return True
+
+    def _split(self, rows: np.ndarray) -> List[np.ndarray]:
+        return [rows[start:start + self.segment_rows] for start in range(0, rows.shape[0], self.segment_rows)]
+
+    def append(self, rows: np.ndarray):
+        start = self.size
+        rows = np.array(rows)
+        if self._segments and self._segments[-1].shape[0] < self.segment_rows:
+            room = self.segment_rows - self._segments[-1].shape[0]
+            self._segments[-1] = np.concatenate([self._segments[-1], rows[:room]])
+            rows = rows[room:]
+        self._segments.extend(self._split(rows))
+        self.size = sum(segment.shape[0] for segment in self._segments)
+        self._mark(start, self.size)
+
+    def set_rows(self, rows: List[int], values: np.ndarray):
+        rows = np.asarray(rows, dtype=np.int64)
+        segments = rows // self.segment_rows
+        for segment in np.unique(segments):
+            mask = segments == segment
+            block = np.array(self._segments[segment])
+            block[rows[mask] - segment * self.segment_rows] = values[mask]
+            self._segments[segment] = block
+            self._dirty.add(int(segment))
+
+    def replace(self, array: np.ndarray, first_changed: int = 0):
+        first = first_changed // self.segment_rows
+        self._segments = self._segments[:first] + self._split(np.array(array[first * self.segment_rows:]))
+        self.size = array.shape[0]
+        self._mark(first_changed, self.size)
+
+    def delete(self, rows: Set[int]):
+        """Drop rows, rewriting only the segments from the first dropped row on"""
+        start = min(rows) // self.segment_rows * self.segment_rows
+        keep = [i for i in range(start, self.size) if i not in rows]
+        tail = self.array[keep]
+        self._segments = self._segments[:start // self.segment_rows] + self._split(tail)
+        self.size = start + len(keep)
+        self._mark(start, self.size)
+
+    def persist(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for segment in sorted(self._dirty):
+            if segment < len(self._segments):
+                path = self.path(segment)
+                block = self._segments[segment]
+                _replace_file(path, lambda f: np.save(f, block))
+                self._segments[segment] = np.load(path, mmap_mode="r")
+        for segment in range(len(self._segments), self._on_disk):
+            self.path(segment).unlink(missing_ok=True)
+        self._on_disk = len(self._segments)
+        self._dirty.clear()
+
+    def remove_files(self):
+        super().remove_files()
+        self._segments = []
+
+class NumpyTopicIndex:
+    """
+    Embeddings of one topic. On disk the matrix, its ids/documents/metadata and any quantised codes
+    are split into VECTOR_SEGMENT_ROWS-row segments, so an incremental ingest writes only the
+    segments it touched plus a small header. The full-precision segments are memory-mapped rather
+    than read into RAM; quantised codes are held in memory and only re-ranked candidates are read
+    from the mapped rows.
+    """
+
+    # Rows scored per block when the matrix is stored as float16
+    SCORE_BLOCK = 65536
+
+    def __init__(self, topic: str, directory: Path, dtype: str = "float32", quantization: Optional[str] = None,
+                 segment_rows: Optional[int] = None):
+        self.topic = topic
+        self.directory = Path(directory)
+        self.dtype = np.dtype(dtype)
+        self.quantization = quantization or settings.VECTOR_QUANTIZATION
+        self.segment_rows = segment_rows or settings.VECTOR_SEGMENT_ROWS
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._id_index: Dict[str, int] = {}
+        self._rows: Optional[MappedRows] = None
+        self._dirty_meta: Set[int] = set()
+        self._meta_segments = 0
+        self.ann: Optional[HNSWIndex] = None
+        # Bumped by every change to the rows, so a graph built outside the lock can tell it is outdated
+        self._generation = 0
+        self.quantizer = None
+        self._code_rows: Optional[SegmentedRows] = None
+        self._lock = threading.RLock()
+        self._load()
+        self._load_ann()
+        self._load_quantization()
+
+    @property
+    def metadata_path(self) -> Path:
+        return self.directory / METADATA_FILE
+
+    @property
+    def _vectors(self) -> Optional[RowsView]:
+        return self._rows.array
+
+    @property
+    def _codes(self) -> Optional[np.ndarray]:
+        return self._code_rows.array if self.quantizer is not None else None
+
+    def _load(self):
+        if self.metadata_path.exists():
+            with open(self.metadata_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+            # A topic keeps the segment size it was written with
+            self.segment_rows = header["segment_rows"]
+        else:
+            header = None
+        self._rows = MappedRows(self.directory, VECTORS_PREFIX, self.segment_rows)
+        self._code_rows = SegmentedRows(self.directory, CODES_PREFIX, self.segment_rows)
+        if header is None or not header["count"]:
+            return
+
+        for segment in range(-(-header["count"] // self.segment_rows)):
+            with open(_segment_path(self.directory, ROWS_PREFIX, segment, ".json"), "r", encoding="utf-8") as f:
+                rows = json.load(f)
+            self.ids.extend(rows["ids"])
+            self.documents.extend(rows["documents"])
+            self.metadatas.extend(rows["metadatas"])
+            self._meta_segments += 1
+        del self.ids[header["count"]:], self.documents[header["count"]:], self.metadatas[header["count"]:]
+        self._id_index = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        if not self._rows.load(header["count"]):
+            raise RuntimeError(f"Vector index of topic '{self.topic}' in {self.directory} is missing segments")
+
+    def _mark_rows(self, rows: Iterable[int]):
+        self._dirty_meta.update(row // self.segment_rows for row in rows)
+
+    def _persist(self):
+        """Write the segments holding changed rows, then the header that makes them current."""
+        self._rows.persist()
+        segments = -(-self.count() // self.segment_rows)
+        for segment in sorted(self._dirty_meta):
+            if segment < segments:
+                start, stop = segment * self.segment_rows, (segment + 1) * self.segment_rows
+                data = json.dumps({
+                    "ids": self.ids[start:stop],
+                    "documents": self.documents[start:stop],
+                    "metadatas": self.metadatas[start:stop]
+                }, separators=(",", ":")).encode("utf-8")
+                _replace_file(_segment_path(self.directory, ROWS_PREFIX, segment, ".json"), lambda f: f.write(data))
+        for segment in range(segments, self._meta_segments):
+            _segment_path(self.directory, ROWS_PREFIX, segment, ".json").unlink(missing_ok=True)
+        self._meta_segments = segments
+        self._dirty_meta.clear()
+
+        header = json.dumps({
+            "topic": self.topic,
+            "dtype": self.dtype.name,
+            "count": self.count(),
+            "segment_rows": self.segment_rows
+        }).encode("utf-8")
+        _replace_file(self.metadata_path, lambda f: f.write(header))
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], embeddings: Any):
+        """Insert new rows and overwrite rows whose id already exists."""
+        new_rows = _normalize(np.asarray(embeddings, dtype=np.float32)).astype(self.dtype)
+        with self._lock:
+            start = self.count()
+            appended = []
+            overwritten: Dict[int, int] = {}
+            for row, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                existing = self._id_index.get(doc_id)
+                if existing is not None and existing >= start:
+                    # Repeated id within this batch: the later row wins
+                    appended[existing - start] = row
+                    self.documents[existing] = document
+                    self.metadatas[existing] = metadata
+                elif existing is not None:
+                    overwritten[existing] = row
+                    self.documents[existing] = document
+                    self.metadatas[existing] = metadata
+                else:
+                    self._id_index[doc_id] = len(self.ids)
+                    self.ids.append(doc_id)
+                    self.documents.append(document)
+                    self.metadatas.append(metadata)
+                    appended.append(row)
+
+            changed_rows = sorted(overwritten)
+            if changed_rows:
+                self._rows.set_rows(changed_rows, new_rows[[overwritten[i] for i in changed_rows]])
+            if appended:
+                self._rows.append(new_rows[appended])
+            changed_rows += range(start, self.count())
+            self._generation += 1
+            self._mark_rows(changed_rows)
+            self._persist()
+            self._update_ann(changed_rows)
+            self._update_codes(changed_rows)
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Replace the metadata of existing rows without touching their vectors."""
+        with self._lock:
+            changed = []
+            for doc_id, metadata in zip(ids, metadatas):
+                row = self._id_index.get(doc_id)
+                if row is not None:
+                    self.metadatas[row] = metadata
+                    changed.append(row)
+            if changed:
+                self._mark_rows(changed)
+                self._persist()
+
+    def delete(self, ids: List[str]):
+        """
+        Remove rows by id; segments before the first removed row are left as they are. The HNSW graph
+        only marks the rows deleted and is compacted once deleted labels pass ANN_REBUILD_DELETED_RATIO.
+        """
+        with self._lock:
+            drop = {self._id_index[doc_id] for doc_id in ids if doc_id in self._id_index}
+            if not drop:
+                return
+            first = min(drop)
+            keep = [i for i in range(len(self.ids)) if i not in drop]
+            self._rows.delete(drop)
+            self.ids = [self.ids[i] for i in keep]
+            self.documents = [self.documents[i] for i in keep]
+            self.metadatas = [self.metadatas[i] for i in keep]
+            self._id_index = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            self._generation += 1
+            self._mark_rows(range(first, self.count()))
+            self._persist()
+            if self.quantizer is not None:
+                self._code_rows.delete(drop)
+                self._code_rows.persist()
+
+            compact = False
+            if self.ann is not None and self._ann_wanted():
+                self.ann.remove_rows(sorted(drop))
+                self.ann.save()
+                compact = self.ann.deleted() > settings.ANN_REBUILD_DELETED_RATIO * self.ann.count()
+            else:
+                self._rebuild_ann()
+        if compact:
+            self._compact_ann()
+
+    def _ann_wanted(self) -> bool:
+        return settings.ANN_ENABLED and ann_available() and self.count() >= settings.ANN_MIN_VECTORS
+
+    def _new_ann(self) -> HNSWIndex:
+        return HNSWIndex(self.directory, self._vectors.shape[1], **load_ann_params(self.directory))
+
+    def _load_ann(self):
+        if not (settings.ANN_ENABLED and ann_available()) or self._vectors is None:
+            return
+        ann = self._new_ann()
+        if ann.load(self.count()) and ann.count() == self.count():
+            self.ann = ann
+        elif self._ann_wanted():
+            self._rebuild_ann()
+
+    def _rebuild_ann(self):
+        if not self._ann_wanted():
+            if self.ann is not None:
+                self.ann.remove_files()
+                self.ann = None
+            return
+        logger.info(f"Building HNSW index for topic '{self.topic}' over {self.count()} vectors")
+        ann = self._new_ann()
+        ann.build(np.asarray(self._vectors, dtype=np.float32))
+        ann.save()
+        self.ann = ann
+
+    def _compact_ann(self):
+        """Rebuild the graph without its deleted labels; searches keep using the old graph meanwhile"""
+        with self._lock:
+            ann, vectors, generation = self.ann, self._vectors, self._generation
+        logger.info(f"Compacting HNSW index for topic '{self.topic}': {ann.deleted()} deleted of {ann.count() + ann.deleted()}")
+        fresh = self._new_ann()
+        fresh.build(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.ann is not ann or self._generation != generation:
+                # The rows changed while building; the next delete tries again
+                return
+            fresh.save()
+            self.ann = fresh
+
+    def _update_ann(self, rows: List[int]):
+        if self.ann is None:
+            # Builds the graph the first time the topic crosses ANN_MIN_VECTORS
+            self._rebuild_ann()
+            return
+        if rows:
+            self.ann.add(rows, np.asarray(self._vectors[rows], dtype=np.float32))
+            self.ann.save()
+
+    def _load_quantization(self):
+        if self.quantization == "none" or self._vectors is None:
+            return
+        quantizer_path = self.directory / QUANTIZER_FILE
+        if quantizer_path.exists():
+            quantizer = load_quantizer(quantizer_path)
+            if quantizer.mode == self.quantization and self._code_rows.load(self.count()):
+                self.quantizer = quantizer
+                return
+        self._update_codes([])
+
+    def _update_codes(self, rows: List[int]):
+        if self.quantization == "none":
+            return
+        if self.quantizer is None:
+            min_vectors = settings.PQ_MIN_TRAIN_VECTORS if self.quantization == "pq" else 1
+            if self.count() >= min_vectors:
+                self.train_quantizer()
+            return
+
+        # Codes stay aligned with matrix rows: encode appended rows, re-encode overwritten ones
+        codes = self._code_rows
+        existing = [row for row in rows if row < codes.size]
+        if existing:
+            codes.set_rows(existing, self.quantizer.encode(np.asarray(self._vectors[existing], dtype=np.float32)))
+        if codes.size < self.count():
+            codes.append(self.quantizer.encode(np.asarray(self._vectors[codes.size:], dtype=np.float32)))
+        codes.persist()
+
+    def train_quantizer(self, training_vectors: Optional[np.ndarray] = None):
+        """Fit the quantizer (on training_vectors if given) and re-encode every row."""
+        with self._lock:
+            if self.quantization == "none" or self._vectors is None:
+                return
+            vectors = np.asarray(self._vectors, dtype=np.float32)
+            quantizer = create_quantizer(self.quantization, subspaces=settings.PQ_SUBSPACES)
+            quantizer.fit(vectors if training_vectors is None else training_vectors)
+            self._code_rows.replace(quantizer.encode(vectors))
+            self._code_rows.persist()
+            quantizer.save(self.directory / QUANTIZER_FILE)
+            self.quantizer = quantizer
+            logger.info(f"Quantized topic '{self.topic}' with {self.quantization}: {self._codes.nbytes} bytes of codes")
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """
+        Bytes held for scoring versus the full-precision float32 matrix. Unquantised searches scan
+        every mapped row, so the whole matrix counts as resident; with codes only the candidates
+        being re-ranked are read from the mapped rows.
+        """
+        dim = self._vectors.shape[1] if self._vectors is not None else 0
+        full_bytes = self.count() * dim * 4
+        mapped_bytes = self.count() * dim * self.dtype.itemsize
+        if self._codes is not None:
+            resident_bytes = self._codes.nbytes + self.quantizer.overhead_bytes()
+        else:
+            resident_bytes = mapped_bytes
+        return {
+            "vectors": self.count(),
+            "dimension": dim,
+            "quantization": self.quantization if self._codes is not None else "none",
+            "float32_bytes": full_bytes,
+            "mapped_bytes": mapped_bytes,
+            "resident_bytes": resident_bytes,
+            "compression_ratio": round(full_bytes / resident_bytes, 2) if resident_bytes else 0.0
+        }
+
+    def configure_ann(self, M: Optional[int] = None, ef_construction: Optional[int] = None, ef_search: Optional[int] = None):
+        """Set this topic's HNSW parameters; changing M or ef_construction rebuilds the graph."""
+        with self._lock:
+            params = load_ann_params(self.directory)
+            rebuild = (M is not None and M != params["M"]) or \
+                (ef_construction is not None and ef_construction != params["ef_construction"])
+            if M is not None:
+                params["M"] = M
+            if ef_construction is not None:
+                params["ef_construction"] = ef_construction
+            if ef_search is not None:
+                params["ef_search"] = ef_search
+            save_ann_params(self.directory, params)
+
+            if rebuild or self.ann is None:
+                self._rebuild_ann()
+            else:
+                self.ann.set_ef(params["ef_search"])
+
+    def _scores(self, vectors: RowsView, query: np.ndarray) -> np.ndarray:
+        scores = np.empty(vectors.shape[0], dtype=np.float32)
+        for first, segment in vectors.blocks():
+            if segment.dtype == np.float32:
+                scores[first:first + segment.shape[0]] = segment @ query
+                continue
+            # float16 matmul is slow in NumPy, so upcast block by block
+            for start in range(0, segment.shape[0], self.SCORE_BLOCK):
+                block = np.asarray(segment[start:start + self.SCORE_BLOCK], dtype=np.float32)
+                scores[first + start:first + start + self.SCORE_BLOCK] = block @ query
+        return scores
+
+    def search(self, query_embedding: Any, top_k: int) -> List[Dict[str, Any]]:
+        """Exact cosine top-k: one matrix-vector product plus argpartition."""
+        with self._lock:
+            vectors, ids, documents, metadatas, ann = self._vectors, self.ids, self.documents, self.metadatas, self.ann
+            label_rows = ann.label_rows if ann is not None else None
+            quantizer, codes = self.quantizer, self._codes
+        if vectors is None or vectors.shape[0] == 0 or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        if ann is not None:
+            # Approximate candidates from the graph, exact scores from the matrix rows
+            candidates = np.asarray(ann.search(query, top_k, label_rows), dtype=np.int64)
+            candidate_scores = np.asarray(vectors[candidates], dtype=np.float32) @ query
+            order = np.argsort(-candidate_scores)
+            return [
+                {"id": ids[i], "document": documents[i], "metadata": metadatas[i], "score": float(candidate_scores[j])}
+                for i, j in zip(candidates[order], order)
+            ]
+
+        if codes is not None:
+            # Approximate scores from the codes, full-precision re-rank of the best candidates
+            approximate = quantizer.score(codes, query)
+            n_candidates = min(top_k * settings.QUANTIZATION_RERANK_FACTOR, approximate.shape[0])
+            candidates = np.argpartition(-approximate, n_candidates - 1)[:n_candidates]
+            candidates.sort()
+            candidate_scores = np.asarray(vectors[candidates], dtype=np.float32) @ query
+            order = np.argsort(-candidate_scores)[:top_k]
+            return [
+                {"id": ids[i], "document": documents[i], "metadata": metadatas[i], "score": float(candidate_scores[j])}
+                for i, j in zip(candidates[order], order)
+            ]
+
+        scores = self._scores(vectors, query)
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"id": ids[i], "document": documents[i], "metadata": metadatas[i], "score": float(scores[i])}
+            for i in top
+        ]
+
+class NumpyVectorStore(ManifestSyncMixin):
+    """In-process vector store backend with the same interface as the Chroma VectorStore."""
+
+    def __init__(self, persist_directory: Optional[str] = None, dtype: Optional[str] = None, quantization: Optional[str] = None):
+        self.persist_directory = Path(persist_directory or settings.VECTOR_INDEX_DIR)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype or settings.VECTOR_INDEX_DTYPE
+        self.quantization = quantization or settings.VECTOR_QUANTIZATION
+        self._indexes: Dict[str, NumpyTopicIndex] = {}
+        self._dir_topics: Dict[str, str] = {}
+        self.manifest = ChunkManifest(self.persist_directory)
+        self._lock = threading.Lock()
+
+    def get_collection(self, topic: str) -> NumpyTopicIndex:
+        with self._lock:
+            index = self._indexes.get(topic)
+            if index is None:
+                index = NumpyTopicIndex(topic, self.persist_directory / _topic_dirname(topic), self.dtype, self.quantization)
+                self._indexes[topic] = index
+                self._dir_topics[_topic_dirname(topic)] = topic
+            return index
+
+    def list_topics(self) -> List[str]:
+        topics = []
+        for meta_path in self.persist_directory.glob(f"*/{METADATA_FILE}"):
+            dirname = meta_path.parent.name
+            topic = self._dir_topics.get(dirname)
+            if topic is None:
+                # Only read the metadata of indexes this process hasn't opened yet
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        topic = json.load(f)["topic"]
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable vector index {meta_path.parent}: {e}")
+                    continue
+                self._dir_topics[dirname] = topic
+            topics.append(topic)
+        return topics
+
+    def get_collection_size(self, topic: str) -> int:
+        return self.get_collection(topic).count()
+
+    def configure_ann(self, topic: str, **params):
+        """Tune the HNSW parameters of one topic."""
+        self.get_collection(topic).configure_ann(**params)
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """Per-topic vector memory, including savings from quantisation."""
+        return {topic: self.get_collection(topic).memory_stats() for topic in self.list_topics()}
+
+    def delete_collection(self, topic: str):
+        with self._lock:
+            self._indexes.pop(topic, None)
+            self._dir_topics.pop(_topic_dirname(topic), None)
+        directory = self.persist_directory / _topic_dirname(topic)
+        for name in (METADATA_FILE, ANN_INDEX_FILE, ANN_LABELS_FILE, ANN_PARAMS_FILE, QUANTIZER_FILE):
+            path = directory / name
+            if path.exists():
+                path.unlink()
+        for prefix in (VECTORS_PREFIX, CODES_PREFIX, ROWS_PREFIX):
+            for path in directory.glob(f"{prefix}-*"):
+                path.unlink()
+        self.manifest.remove_topic(topic)
+
+    def _upsert_chunks(self, topic: str, ids: List[str], chunks: List[Dict], embeddings: Any):
+        metadatas = [chunk_metadata(chunk) for chunk in chunks]
+        documents = [chunk["text"] for chunk in chunks]
+        self.get_collection(topic).upsert(ids, documents, metadatas, embeddings)
+
+    def _update_chunk_metadata(self, topic: str, ids: List[str], chunks: List[Dict]):
+        self.get_collection(topic).update_metadata(ids, [chunk_metadata(chunk) for chunk in chunks])
+
+    def _delete_chunks(self, topic: str, ids: List[str]):
+        self.get_collection(topic).delete(ids)
+
+    def _delete_source(self, topic: str, source_file: str):
+        index = self.get_collection(topic)
+        index.delete([doc_id for doc_id, metadata in zip(index.ids, index.metadatas)
+                      if metadata.get("source_file") == source_file])
+
+    def query(self, topic: str, query_embedding: Any, top_k: int = 5):
+        """Return results in the same shape as a Chroma collection query."""
+        hits = self.get_collection(topic).search(query_embedding, top_k)
+        return {
+            "ids": [[hit["id"] for hit in hits]],
+            "documents": [[hit["document"] for hit in hits]],
+            "metadatas": [[hit["metadata"] for hit in hits]],
+            "distances": [[1 - hit["score"] for hit in hits]]
+        }
+
+    def _search_topic(self, topic: str, query_embedding: Any, top_k: int, include_topic: bool) -> List[Dict]:
+        results = []
+        for hit in self.get_collection(topic).search(query_embedding, top_k):
+            result = {
+                'id': hit['id'],
+                'content': hit['document'],
+                'source': hit['metadata'].get('source_file', 'Unknown'),
+                'page': hit['metadata'].get('page', 0),
+                'score': hit['score']
+            }
+            if include_topic:
+                result['topic'] = topic
+            results.append(result)
+        return results
+
+    def search_similar(self, query_embedding: Any, topic_filter: str = None, top_k: int = 5):
+        """Search for similar documents across topics or a specific topic"""
+        try:
+            if topic_filter:
+                return self._search_topic(topic_filter, query_embedding, top_k, include_topic=False)
+
+            all_results = []
+            for topic in self.list_topics():
+                all_results.extend(self._search_topic(topic, query_embedding, top_k, include_topic=True))
+            return heapq.nlargest(top_k, all_results, key=lambda x: x['score'])
+        except Exception as e:
+            logger.error(f"Error in search_similar: {e}")
+            return []
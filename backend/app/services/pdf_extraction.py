@@ -0,0 +1,90 @@
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.utils.logger import logger
+
+def extract_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Worker-process entry point: text of pages [start, stop) of one PDF."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return [doc.load_page(page_num).get_text() for page_num in range(start, min(stop, len(doc)))]
+
+def _page_count(pdf_path: str) -> int:
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+class PDFExtractionPool:
+    """
+    Extracts PDF text on a pool of worker processes. PyMuPDF holds the GIL while it
+    parses, so page ranges of large PDFs are spread across processes instead of threads.
+    Results always come back in page order.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, pages_per_task: Optional[int] = None):
+        self.max_workers = max_workers or settings.PDF_EXTRACT_WORKERS
+        self.pages_per_task = pages_per_task or settings.PDF_EXTRACT_PAGES_PER_TASK
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 1
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs worker threads can deadlock
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Started PDF extraction pool with {self.max_workers} processes")
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+    def _ranges(self, pdf_path: str, page_count: int) -> Iterator[Tuple[str, int, int]]:
+        for start in range(0, page_count, self.pages_per_task):
+            yield pdf_path, start, min(start + self.pages_per_task, page_count)
+
+    def _run_ordered(self, tasks: Iterable[Tuple[str, int, int]]) -> Iterator[Tuple[str, int, List[str]]]:
+        """
+        Submit tasks with a bounded look-ahead window and yield (path, first page, texts)
+        in submission order, so memory stays bounded however large the input is.
+        """
+        executor = self._get_executor()
+        window = self.max_workers * 2
+        pending: Deque[Tuple[str, int, Future]] = deque()
+        tasks = iter(tasks)
+        try:
+            for pdf_path, start, stop in tasks:
+                pending.append((pdf_path, start, executor.submit(extract_range, pdf_path, start, stop)))
+                if len(pending) >= window:
+                    pdf_path, start, future = pending.popleft()
+                    yield pdf_path, start, future.result()
+            while pending:
+                pdf_path, start, future = pending.popleft()
+                yield pdf_path, start, future.result()
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+    def iter_pages(self, pdf_path: str, page_count: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """Yields (page number, text) for one PDF, extracting page ranges in parallel."""
+        page_count = _page_count(pdf_path) if page_count is None else page_count
+        for _, start, texts in self._run_ordered(self._ranges(pdf_path, page_count)):
+            for offset, text in enumerate(texts):
+                yield start + offset + 1, text
+
+# Global extraction pool instance
+pdf_extraction_pool = PDFExtractionPool()
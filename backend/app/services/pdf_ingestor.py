@@ -1,33 +1,98 @@
 import fitz  # PyMuPDF
-from typing import List, Dict
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+from app.config import settings
+from app.services.pdf_extraction import pdf_extraction_pool
+from app.utils.logger import logger
 import os
 
+def embed_texts(texts: List[str]) -> Any:
+    """Embeds chunk texts with the default model; module-level so a CPU job lane process can run it."""
+    from app.services.embedding_service import get_embedding_service
+    return get_embedding_service().embed_texts(texts)
+
 class PDFIngestor:
     def __init__(self, chunk_size: int = 300):
         self.chunk_size = chunk_size
 
-    def extract_text_chunks(self, pdf_path: str) -> List[Dict]:
+    def iter_pages(self, pdf_path: str,
+                   extract_fn: Optional[Callable[[str, int, int], List[str]]] = None) -> Iterator[Tuple[int, str]]:
         """
-        Extracts text from a PDF and splits it into chunks with metadata.
-        Returns a list of dicts: { 'text': ..., 'page': ..., 'source_file': ... }
+        Yields (page number, text) one page at a time so the whole PDF is never held in memory.
+        Large PDFs are extracted on the process pool, still in page order. Smaller ones are
+        extracted here, or range by range through extract_fn (path, start, stop) if given.
         """
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF not found: {pdf_path}")
-        doc = fitz.open(pdf_path)
+        page_count = self.page_count(pdf_path)
+        if pdf_extraction_pool.enabled and page_count >= settings.PDF_PARALLEL_MIN_PAGES:
+            yield from pdf_extraction_pool.iter_pages(pdf_path, page_count)
+            return
+        if extract_fn is not None:
+            for start in range(0, page_count, settings.PDF_EXTRACT_PAGES_PER_TASK):
+                texts = extract_fn(pdf_path, start, min(start + settings.PDF_EXTRACT_PAGES_PER_TASK, page_count))
+                for offset, text in enumerate(texts):
+                    yield start + offset + 1, text
+            return
+        with fitz.open(pdf_path) as doc:
+            for page_num in range(len(doc)):
+                yield page_num + 1, doc.load_page(page_num).get_text()
+
+    def page_count(self, pdf_path: str) -> int:
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+
+    def chunk_page(self, text: str, page: int, source_file: str) -> List[Dict]:
+        """Splits one page's text into chunks of roughly self.chunk_size words."""
+        words = text.split()
+        chunks = []
+        for i in range(0, len(words), self.chunk_size):
+            chunk_text = ' '.join(words[i:i+self.chunk_size])
+            if chunk_text.strip():
+                chunks.append({
+                    'text': chunk_text,
+                    'page': page,
+                    'source_file': source_file
+                })
+        return chunks
+
+    def extract_text_chunks(self, pdf_path: str, source_file: Optional[str] = None) -> List[Dict]:
+        """
+        Extracts text from a PDF and splits it into chunks with metadata.
+        Returns a list of dicts: { 'text': ..., 'page': ..., 'source_file': ... }
+        """
+        source_file = source_file or os.path.basename(pdf_path)
         chunks = []
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            text = page.get_text()
-            # Split text into chunks of roughly self.chunk_size words
-            words = text.split()
-            for i in range(0, len(words), self.chunk_size):
-                chunk_text = ' '.join(words[i:i+self.chunk_size])
-                if chunk_text.strip():
-                    chunks.append({
-                        'text': chunk_text,
-                        'page': page_num + 1,
-                        'source_file': os.path.basename(pdf_path)
-                    })
+        for page, text in self.iter_pages(pdf_path):
+            chunks.extend(self.chunk_page(text, page, source_file))
         return chunks
 
+    def ingest_pdf(self, pdf_path: str, topic: str, source_file: Optional[str] = None,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   embed_fn: Optional[Callable[[List[str]], Any]] = None,
+                   extract_fn: Optional[Callable[[str, int, int], List[str]]] = None) -> Dict[str, Any]:
+        """
+        Streams a PDF page by page through the extract/chunk/embed/store pipeline.
+        Re-ingesting a document under the same source_file only embeds and writes chunks
+        whose text changed, and deletes the chunks that disappeared.
+        progress, if given, is called with (pages stored, total pages) after every batch.
+        embed_fn, if given, embeds a batch of chunk texts in place of the embedding service,
+        e.g. on a CPU job lane process; the chunks are still written from this process.
+        extract_fn, if given, extracts the text of a page range of a PDF below PDF_PARALLEL_MIN_PAGES
+        (see iter_pages), e.g. on a CPU job lane process as well.
+        """
+        from app.services.embedding_service import get_embedding_service
+        from app.services.ingest_pipeline import IngestPipeline
+        from app.services.vector_store import vector_store
+
+        source_file = source_file or os.path.basename(pdf_path)
+        page_count = self.page_count(pdf_path)
+        pipeline = IngestPipeline(vector_store, embed_fn or get_embedding_service().embed_texts)
+        changes = pipeline.run(
+            self.iter_pages(pdf_path, extract_fn), self.chunk_page, topic, source_file,
+            progress=(lambda page: progress(page, page_count)) if progress else None
+        )
+        logger.info(f"Ingested {source_file} into '{topic}': {changes['added']} new, "
+                    f"{changes['removed']} removed, {changes['unchanged']} unchanged chunks")
+        return {'pages': page_count, 'chunks': changes['added'] + changes['unchanged'], **changes}
+
 pdf_ingestor = PDFIngestor() 
\ No newline at end of file
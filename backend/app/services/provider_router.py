@@ -0,0 +1,277 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.enhanced_llm_service import EnhancedLLMService
+from app.services.llm_cache import CachedAnswer, is_error_answer
+from app.services.llm_service import LLMService
+from app.utils.logger import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class ProviderHealth:
+    """
+    Latency and error EWMAs of one provider, plus a circuit breaker: the circuit opens when
+    either EWMA crosses its threshold and, after a cool-down, lets a single probe request through.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.state = CLOSED
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.samples = 0
+        self.successes = 0
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.latencies: "deque[float]" = deque(maxlen=settings.LLM_LATENCY_WINDOW)
+
+    def available(self) -> bool:
+        """Whether the circuit admits a request; an open circuit turns half-open after the cool-down."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= settings.LLM_BREAKER_COOLDOWN:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            return not self.probing
+        return self.state == CLOSED
+
+    def begin(self):
+        """Called when a request is actually sent; a half-open circuit allows just this one probe."""
+        if self.state == HALF_OPEN:
+            self.probing = True
+
+    def record(self, latency: float, failed: bool):
+        alpha = settings.LLM_EWMA_ALPHA
+        self.samples += 1
+        self.latency_ewma = latency if self.latency_ewma is None else alpha * latency + (1 - alpha) * self.latency_ewma
+        self.error_ewma = alpha * float(failed) + (1 - alpha) * self.error_ewma
+        if failed:
+            self.failures += 1
+        else:
+            self.successes += 1
+            self.latencies.append(latency)
+
+        if self.state == HALF_OPEN:
+            self.probing = False
+            if failed:
+                self._open("probe failed")
+            else:
+                self.state = CLOSED
+                self.error_ewma = 0.0
+                self.latency_ewma = latency
+                logger.info(f"LLM provider {self.provider} recovered; circuit closed")
+        elif self.state == CLOSED and self.samples >= settings.LLM_BREAKER_MIN_SAMPLES:
+            if self.error_ewma > settings.LLM_BREAKER_ERROR_RATE:
+                self._open(f"error rate {self.error_ewma:.2f}")
+            elif self.latency_ewma > settings.LLM_BREAKER_LATENCY:
+                self._open(f"latency {self.latency_ewma:.1f}s")
+
+    def release_probe(self):
+        """A probe that was cancelled (e.g. lost a hedge race) frees the slot for another."""
+        self.probing = False
+
+    def _open(self, reason: str):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        logger.warning(f"LLM provider {self.provider} circuit opened: {reason}")
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < settings.LLM_BREAKER_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "state": self.state,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_ewma": round(self.error_ewma, 4),
+            "successes": self.successes,
+            "failures": self.failures
+        }
+
+class ProviderHealthRegistry:
+    """Process-wide health of each provider, shared by every router."""
+
+    def __init__(self):
+        self._providers: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def get(self, provider: str) -> ProviderHealth:
+        with self._lock:
+            health = self._providers.get(provider)
+            if health is None:
+                health = self._providers[provider] = ProviderHealth(provider)
+            return health
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            providers = dict(self._providers)
+        return {
+            "order": settings.LLM_PROVIDER_ORDER,
+            "hedging": settings.LLM_HEDGE_ENABLED,
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "providers": {provider: health.get_stats() for provider, health in providers.items()}
+        }
+
+class ProviderRouter:
+    """
+    Sends each completion to the first healthy provider in LLM_PROVIDER_ORDER and fails over to the
+    next one on an error. With hedging on, a second provider is raced once the first has been silent
+    for longer than its own p95 latency, and the first good answer wins.
+    """
+
+    def __init__(self, service_class=LLMService, order: Optional[List[str]] = None,
+                 health: Optional[ProviderHealthRegistry] = None, hedge: Optional[bool] = None):
+        self.service_class = service_class
+        self.order = order or settings.LLM_PROVIDER_ORDER
+        self.health = health or provider_health
+        self.hedge = settings.LLM_HEDGE_ENABLED if hedge is None else hedge
+        self._services: Dict[str, Any] = {}
+
+    def service(self, provider: str):
+        service = self._services.get(provider)
+        if service is None:
+            service = self._services[provider] = self.service_class(provider=provider)
+        return service
+
+    def primary(self):
+        """Service of the first configured provider, for reporting which model a route uses."""
+        return self.service(self.order[0])
+
+    def candidates(self) -> List[str]:
+        """Configured providers with an API key whose circuit admits a request, in order."""
+        configured = [provider for provider in self.order if self.service(provider).api_key]
+        allowed = [provider for provider in configured if self.health.get(provider).available()]
+        # With every circuit open, trying is better than failing outright
+        return allowed or configured[:1]
+
+    def hedge_delay(self, provider: str) -> float:
+        p95 = self.health.get(provider).p95()
+        if p95 is None:
+            return settings.LLM_HEDGE_DELAY
+        return max(p95, settings.LLM_HEDGE_MIN_DELAY)
+
+    async def _timed(self, provider: str, method: str, args: tuple, kwargs: dict) -> str:
+        health = self.health.get(provider)
+        started = time.perf_counter()
+        try:
+            answer = await getattr(self.service(provider), method)(*args, **kwargs)
+        except asyncio.CancelledError:
+            health.release_probe()
+            raise
+        except Exception as e:
+            answer = f"[LLM ERROR] Unexpected error: {str(e)}"
+        if isinstance(answer, CachedAnswer):
+            # Says nothing about the provider and would drag its p95 towards zero
+            health.release_probe()
+        else:
+            health.record(time.perf_counter() - started, is_error_answer(answer))
+        return answer
+
+    async def acall(self, method: str, *args, **kwargs) -> Tuple[str, Any]:
+        """
+        Await service.<method>(*args, **kwargs) on the routed provider(s).
+        Returns the answer and the service that produced it; when every provider fails, the last error.
+        """
+        remaining = self.candidates()
+        if not remaining:
+            return "[ERROR] No LLM provider API key configured.", self.primary()
+
+        pending: Dict[asyncio.Future, str] = {}
+
+        def launch():
+            provider = remaining.pop(0)
+            self.health.get(provider).begin()
+            pending[asyncio.ensure_future(self._timed(provider, method, args, kwargs))] = provider
+
+        launch()
+        primary = next(iter(pending.values()))
+        answer, provider = None, primary
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and remaining and len(pending) == 1:
+                    timeout = self.hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than its p95: race the next provider
+                    self.health.hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    answer = task.result()
+                    if not is_error_answer(answer):
+                        if provider != primary and len(pending):
+                            self.health.hedge_wins += 1
+                        return answer, self.service(provider)
+                    logger.warning(f"LLM provider {provider} failed: {answer[:200]}")
+                if not pending and remaining:
+                    self.health.failovers += 1
+                    launch()
+            return answer, self.service(provider)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def astream(self, method: str, *args, **kwargs) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream service.<method>(*args, **kwargs), failing over while nothing has been yielded yet.
+        Yields (delta, service) pairs; once a provider has produced text the stream stays with it.
+        """
+        remaining = self.candidates()
+        if not remaining:
+            yield "[ERROR] No LLM provider API key configured.", self.primary()
+            return
+
+        while remaining:
+            provider = remaining.pop(0)
+            service = self.service(provider)
+            health = self.health.get(provider)
+            health.begin()
+            started = time.perf_counter()
+            first = True
+            failed = False
+            stream = getattr(service, method)(*args, **kwargs)
+            try:
+                async for delta in stream:
+                    if is_error_answer(delta):
+                        failed = True
+                        if first and remaining:
+                            logger.warning(f"LLM provider {provider} failed: {delta[:200]}")
+                            self.health.failovers += 1
+                            break
+                    if first:
+                        # Time to first token is what a streaming caller waits on
+                        if isinstance(delta, CachedAnswer):
+                            health.release_probe()
+                        else:
+                            health.record(time.perf_counter() - started, failed)
+                        first = False
+                    yield delta, service
+            except (asyncio.CancelledError, GeneratorExit):
+                health.release_probe()
+                raise
+            finally:
+                await stream.aclose()
+            if first:
+                health.record(time.perf_counter() - started, failed)
+            if not (failed and first):
+                return
+
+# Shared provider health and the routers for the chat and tailored chat services
+provider_health = ProviderHealthRegistry()
+llm_router = ProviderRouter(LLMService)
+tailored_llm_router = ProviderRouter(EnhancedLLMService)
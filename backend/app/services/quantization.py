@@ -0,0 +1,151 @@
+import numpy as np
+from pathlib import Path
+from typing import Optional
+from app.utils.logger import logger
+
+# Rows decoded per block while scoring, to bound temporary float32 memory
+SCORE_BLOCK = 65536
+
+class ScalarQuantizer:
+    """int8 scalar quantisation with a per-dimension symmetric scale (4x smaller than float32)."""
+
+    mode = "int8"
+
+    def __init__(self, scale: Optional[np.ndarray] = None):
+        self.scale = scale
+
+    @property
+    def trained(self) -> bool:
+        return self.scale is not None
+
+    def fit(self, vectors: np.ndarray):
+        max_abs = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0)
+        max_abs[max_abs == 0] = 1.0
+        self.scale = (max_abs / 127.0).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint(np.asarray(vectors, dtype=np.float32) / self.scale)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products of every code row with the query."""
+        scaled_query = np.asarray(query, dtype=np.float32) * self.scale
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK):
+            scores[start:start + SCORE_BLOCK] = codes[start:start + SCORE_BLOCK].astype(np.float32) @ scaled_query
+        return scores
+
+    def overhead_bytes(self) -> int:
+        return self.scale.nbytes if self.scale is not None else 0
+
+    def save(self, path: Path):
+        np.savez(path, mode=self.mode, scale=self.scale)
+
+class ProductQuantizer:
+    """Product quantisation: each vector becomes one byte per subspace, scored with lookup tables."""
+
+    mode = "pq"
+
+    def __init__(self, subspaces: int = 256, centroids: int = 256, codebooks: Optional[np.ndarray] = None):
+        self.subspaces = subspaces
+        self.centroids = centroids
+        self.codebooks = codebooks  # (subspaces, centroids, subspace_dim)
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        n, dim = vectors.shape
+        if dim % self.subspaces != 0:
+            raise ValueError(f"Dimension {dim} is not divisible into {self.subspaces} subspaces")
+        return vectors.reshape(n, self.subspaces, dim // self.subspaces)
+
+    @staticmethod
+    def _assign(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (
+            (points ** 2).sum(axis=1, keepdims=True)
+            - 2 * points @ centroids.T
+            + (centroids ** 2).sum(axis=1)
+        )
+        return distances.argmin(axis=1)
+
+    def fit(self, vectors: np.ndarray, iterations: int = 15, max_training_points: int = 20000, seed: int = 0):
+        """Train one k-means codebook per subspace."""
+        rng = np.random.default_rng(seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[0] > max_training_points:
+            vectors = vectors[rng.choice(vectors.shape[0], max_training_points, replace=False)]
+        parts = self._split(vectors)
+        centroids = min(self.centroids, vectors.shape[0])
+
+        codebooks = np.zeros((self.subspaces, self.centroids, parts.shape[2]), dtype=np.float32)
+        for j in range(self.subspaces):
+            points = parts[:, j, :]
+            centers = points[rng.choice(points.shape[0], centroids, replace=False)].copy()
+            for _ in range(iterations):
+                labels = self._assign(points, centers)
+                counts = np.bincount(labels, minlength=centroids)
+                sums = np.zeros_like(centers)
+                np.add.at(sums, labels, points)
+                filled = counts > 0
+                centers[filled] = sums[filled] / counts[filled, None]
+                # Re-seed empty clusters on random points
+                empty = np.flatnonzero(~filled)
+                if len(empty):
+                    centers[empty] = points[rng.integers(points.shape[0], size=len(empty))]
+            codebooks[j, :centroids] = centers
+            if centroids < self.centroids:
+                codebooks[j, centroids:] = centers[0]
+        self.codebooks = codebooks
+        logger.info(f"Trained PQ codebooks: {self.subspaces} subspaces x {self.centroids} centroids")
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((parts.shape[0], self.subspaces), dtype=np.uint8)
+        for j in range(self.subspaces):
+            codes[:, j] = self._assign(parts[:, j, :], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = self.codebooks[np.arange(self.subspaces), codes]
+        return parts.reshape(codes.shape[0], -1)
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Asymmetric distance computation: sum of per-subspace lookup-table entries."""
+        query_parts = self._split(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        tables = np.einsum("jcd,jd->jc", self.codebooks, query_parts)
+        scores = np.zeros(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK):
+            block = codes[start:start + SCORE_BLOCK]
+            scores[start:start + SCORE_BLOCK] = tables[np.arange(self.subspaces), block].sum(axis=1)
+        return scores
+
+    def overhead_bytes(self) -> int:
+        return self.codebooks.nbytes if self.codebooks is not None else 0
+
+    def save(self, path: Path):
+        np.savez(path, mode=self.mode, codebooks=self.codebooks,
+                 subspaces=self.subspaces, centroids=self.centroids)
+
+def create_quantizer(mode: str, subspaces: int = 256):
+    if mode == "int8":
+        return ScalarQuantizer()
+    if mode == "pq":
+        return ProductQuantizer(subspaces=subspaces)
+    raise ValueError(f"Unknown quantization mode: {mode}")
+
+def load_quantizer(path: Path):
+    """Load a quantizer saved with save()."""
+    data = np.load(path, allow_pickle=False)
+    mode = str(data["mode"])
+    if mode == "int8":
+        return ScalarQuantizer(scale=data["scale"])
+    return ProductQuantizer(
+        subspaces=int(data["subspaces"]),
+        centroids=int(data["centroids"]),
+        codebooks=data["codebooks"]
+    )
@@ -0,0 +1,259 @@
+import asyncio
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.utils.logger import logger
+
+# Rough tokens per character of English prompt text; the provider's reported usage corrects it afterwards
+CHARS_PER_TOKEN = 4
+
+class RateLimitExceeded(Exception):
+    """Raised instead of sending a request that would have to wait too long for the provider's quota."""
+
+def estimate_tokens(payload: Optional[Dict[str, Any]]) -> int:
+    """Prompt plus maximum completion tokens of a request, which is what providers count against TPM"""
+    if not payload:
+        return 0
+    if "messages" in payload:
+        text = "".join(str(message.get("content", "")) for message in payload["messages"])
+        completion = payload.get("max_tokens") or 0
+    else:
+        text = str(payload.get("inputs", ""))
+        completion = (payload.get("parameters") or {}).get("max_new_tokens") or 0
+    return len(text) // CHARS_PER_TOKEN + 1 + int(completion)
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds from a rate-limit reset header: "7.66s", "2m59.56s", "120ms", plain seconds,
+    epoch seconds/milliseconds (OpenRouter) or an HTTP date (Retry-After).
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+        if parts:
+            scale = {"ms": 0.001, "h": 3600, "m": 60, "s": 1}
+            return sum(float(amount) * scale[unit] for amount, unit in parts)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    if number > 1e12:
+        return max(0.0, number / 1000 - time.time())
+    if number > 1e9:
+        return max(0.0, number - time.time())
+    return number
+
+class TokenBucket:
+    """
+    Per-minute budget refilled continuously. Reservations may drive the balance negative: a request
+    is admitted once the refill has paid off everything reserved before it, which keeps waiters FIFO.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.balance = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.balance = min(self.capacity, self.balance + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until amount more could be taken, given the current balance"""
+        shortfall = amount - self.balance
+        return max(0.0, shortfall) * 60 / self.capacity
+
+class Permit:
+    """An admitted request: what it reserved and how long it has to wait before sending."""
+
+    def __init__(self, budget: "ProviderBudget", tokens: int, wait: float):
+        self.budget = budget
+        self.tokens = tokens
+        self.wait = wait
+
+class ProviderBudget:
+    """Request and token buckets of one provider, adapted from the rate-limit headers it returns."""
+
+    def __init__(self, provider: str, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.provider = provider
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self, tokens: int) -> Permit:
+        """Reserve quota for one request, or raise RateLimitExceeded when it can't start in time"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.blocked_until - now)
+            for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_for(amount))
+
+            reason = None
+            if self.tokens is not None and tokens > self.tokens.capacity:
+                reason = f"request of ~{tokens} tokens exceeds the {self.tokens.capacity:.0f} TPM budget"
+            elif wait > settings.LLM_GOVERNOR_MAX_WAIT:
+                reason = f"quota frees up in {wait:.1f}s"
+            elif wait > 0 and self.queued >= settings.LLM_GOVERNOR_MAX_QUEUE:
+                reason = f"{self.queued} requests already queued"
+            if reason:
+                self.shed += 1
+                raise RateLimitExceeded(f"{self.provider} rate limit budget exhausted: {reason}")
+
+            if self.requests is not None:
+                self.requests.balance -= 1
+            if self.tokens is not None:
+                self.tokens.balance -= tokens
+            self.admitted += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if wait > 0:
+                self.queued += 1
+                self.peak_queued = max(self.peak_queued, self.queued)
+            # Only what was actually taken from a bucket is refunded later
+            return Permit(self, tokens if self.tokens is not None else 0, wait)
+
+    def dequeue(self, permit: Permit):
+        if permit.wait > 0:
+            with self._lock:
+                self.queued -= 1
+
+    def refund(self, permit: Permit, tokens: Optional[int] = None):
+        """Give back a reservation (or the unused part when the actual token count is known)"""
+        with self._lock:
+            if tokens is None and self.requests is not None:
+                self.requests.balance = min(self.requests.capacity, self.requests.balance + 1)
+            if self.tokens is not None and permit.tokens:
+                unused = permit.tokens - (tokens or 0)
+                self.tokens.balance = min(self.tokens.capacity, self.tokens.balance + unused)
+
+    def observe(self, status_code: int, headers: Any):
+        """Adapt to the provider's view of the quota: its limits, what remains and when it resets"""
+        now = time.monotonic()
+        with self._lock:
+            limit_tokens = _number(headers.get("x-ratelimit-limit-tokens"))
+            if limit_tokens:
+                if self.tokens is None:
+                    self.tokens = TokenBucket(limit_tokens)
+                    logger.info(f"{self.provider} token budget set to {limit_tokens:.0f}/min from response headers")
+                self.tokens.capacity = limit_tokens
+
+            for bucket, suffix in ((self.requests, "-requests"), (self.tokens, "-tokens"), (self.requests, "")):
+                remaining = _number(headers.get(f"x-ratelimit-remaining{suffix}"))
+                if remaining is None:
+                    continue
+                if bucket is not None:
+                    bucket.refill(now)
+                    bucket.balance = min(bucket.balance, remaining)
+                reset = parse_duration(headers.get(f"x-ratelimit-reset{suffix}"))
+                if remaining < 1 and reset:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+
+            if status_code == 429:
+                self.throttled += 1
+                retry_after = parse_duration(headers.get("retry-after")) or settings.LLM_GOVERNOR_DEFAULT_BACKOFF
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                logger.warning(f"{self.provider} returned 429; holding requests for {retry_after:.1f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rpm": self.requests.capacity if self.requests else None,
+                "tpm": self.tokens.capacity if self.tokens else None,
+                "queue_depth": self.queued,
+                "peak_queue_depth": self.peak_queued,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "throttled_responses": self.throttled,
+                "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "blocked_for_s": round(max(0.0, self.blocked_until - time.monotonic()), 2)
+            }
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class RateGovernor:
+    """
+    Client-side quota governor shared by every LLM call path. Each request reserves one request and its
+    estimated tokens from the provider's buckets, waits its turn when the budget is short, and is shed
+    with RateLimitExceeded when the wait would exceed LLM_GOVERNOR_MAX_WAIT, so quota is used up to
+    the limit without the provider answering 429.
+    """
+
+    def __init__(self, rpm_limits: Optional[Dict[str, float]] = None, tpm_limits: Optional[Dict[str, float]] = None):
+        self.rpm_limits = settings.LLM_RPM_LIMITS if rpm_limits is None else rpm_limits
+        self.tpm_limits = settings.LLM_TPM_LIMITS if tpm_limits is None else tpm_limits
+        self._budgets: Dict[str, ProviderBudget] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, provider: str) -> ProviderBudget:
+        budget = self._budgets.get(provider)
+        if budget is None:
+            with self._lock:
+                budget = self._budgets.get(provider)
+                if budget is None:
+                    budget = ProviderBudget(provider, self.rpm_limits.get(provider), self.tpm_limits.get(provider))
+                    self._budgets[provider] = budget
+        return budget
+
+    def acquire(self, provider: str, payload: Optional[Dict[str, Any]] = None) -> Permit:
+        """Blocking admission for the synchronous client"""
+        permit = self.budget(provider).reserve(estimate_tokens(payload))
+        if permit.wait > 0:
+            try:
+                time.sleep(permit.wait)
+            finally:
+                permit.budget.dequeue(permit)
+        return permit
+
+    async def aacquire(self, provider: str, payload: Optional[Dict[str, Any]] = None) -> Permit:
+        """Non-blocking admission; a caller cancelled while queued gives its reservation back"""
+        permit = self.budget(provider).reserve(estimate_tokens(payload))
+        if permit.wait > 0:
+            try:
+                await asyncio.sleep(permit.wait)
+            except asyncio.CancelledError:
+                permit.budget.refund(permit)
+                raise
+            finally:
+                permit.budget.dequeue(permit)
+        return permit
+
+    def settle(self, permit: Permit, status_code: int, headers: Any, body: Optional[Dict[str, Any]] = None):
+        """Replace the token estimate with reported usage, then defer to the provider's rate-limit headers"""
+        usage = body.get("usage") if isinstance(body, dict) else None
+        if usage and usage.get("total_tokens") is not None:
+            permit.budget.refund(permit, tokens=int(usage["total_tokens"]))
+        permit.budget.observe(status_code, headers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            budgets = dict(self._budgets)
+        return {
+            "max_wait_s": settings.LLM_GOVERNOR_MAX_WAIT,
+            "max_queue": settings.LLM_GOVERNOR_MAX_QUEUE,
+            "providers": {provider: budget.get_stats() for provider, budget in budgets.items()}
+        }
+
+# Global governor for the hosted LLM providers
+llm_governor = RateGovernor()
@@ -0,0 +1,214 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+from app.services.llm_cache import is_error_answer
+
+# Seconds between sweeps for expired entries that lookups never reach
+PURGE_INTERVAL = 60.0
+
+def _manifest_version(topic: str) -> int:
+    # Imported lazily so importing the cache never loads a vector store backend
+    from app.services.vector_store import vector_store
+    return vector_store.manifest.version(topic)
+
+def _normalize(embedding: Any) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class _Entry:
+    __slots__ = ("entry_id", "topic", "question", "answer", "sources", "used_context", "expires_at", "slot")
+
+    def __init__(self, entry_id: int, topic: str, question: str, answer: str,
+                 sources: List[str], used_context: List[str], expires_at: float):
+        self.entry_id = entry_id
+        self.topic = topic
+        self.question = question
+        self.answer = answer
+        self.sources = sources
+        self.used_context = used_context
+        self.expires_at = expires_at
+        self.slot = -1
+
+class _TopicIndex:
+    """Dense matrix of one topic's cached question embeddings; rows are compacted on removal."""
+
+    def __init__(self, dim: int, version: int):
+        self.version = version
+        self.vectors = np.empty((16, dim), dtype=np.float32)
+        self.entries: List[_Entry] = []
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def add(self, entry: _Entry, vector: np.ndarray):
+        count = len(self.entries)
+        if count == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+        self.vectors[count] = vector
+        entry.slot = count
+        self.entries.append(entry)
+
+    def remove(self, entry: _Entry):
+        # Move the last row into the freed slot so the matrix stays contiguous
+        last = self.entries.pop()
+        if last is not entry:
+            self.vectors[entry.slot] = self.vectors[len(self.entries)]
+            last.slot = entry.slot
+            self.entries[entry.slot] = last
+
+    def matches(self, vector: np.ndarray, threshold: float) -> List[Tuple[_Entry, float]]:
+        """Entries at least threshold similar to vector, most similar first"""
+        if not self.entries:
+            return []
+        scores = self.vectors[:len(self.entries)] @ vector
+        above = np.flatnonzero(scores >= threshold)
+        return [(self.entries[i], float(scores[i])) for i in above[np.argsort(-scores[above])]]
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question meaning rather than wording: a new question whose embedding has
+    cosine similarity >= threshold with a cached question in the same topic gets that answer.
+    Bounded by an LRU over all topics; a topic's entries are dropped when its manifest version changes.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, max_entries: Optional[int] = None,
+                 topic_version: Optional[Callable[[str], int]] = None):
+        self.threshold = threshold if threshold is not None else settings.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = max_entries or settings.SEMANTIC_CACHE_MAX_ENTRIES
+        self.topic_version = topic_version or _manifest_version
+        self.enabled = settings.SEMANTIC_CACHE_ENABLED
+        self._indexes: Dict[str, _TopicIndex] = {}
+        self._lru: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _index(self, topic: str, dim: int) -> _TopicIndex:
+        """The topic's index, emptied if its documents (or the embedding size) changed."""
+        version = self.topic_version(topic)
+        index = self._indexes.get(topic)
+        if index is None or index.version != version or index.dim != dim:
+            if index is not None:
+                for entry in index.entries:
+                    self._lru.pop(entry.entry_id, None)
+            index = _TopicIndex(dim, version)
+            self._indexes[topic] = index
+        return index
+
+    def _remove(self, entry: _Entry):
+        self._lru.pop(entry.entry_id, None)
+        self._indexes[entry.topic].remove(entry)
+
+    def _purge_expired(self, now: float):
+        """Every PURGE_INTERVAL, drop all expired entries, not only those a lookup ran into"""
+        if now < self._next_purge:
+            return
+        self._next_purge = now + PURGE_INTERVAL
+        for entry in [entry for entry in self._lru.values() if entry.expires_at < now]:
+            self._remove(entry)
+
+    def lookup(self, topic: str, embedding: Any) -> Optional[Dict[str, Any]]:
+        """Cached answer for the closest unexpired earlier question in topic, if it is similar enough."""
+        if not self.enabled:
+            return None
+        vector = _normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            index = self._index(topic, len(vector))
+            entry = None
+            for candidate, score in index.matches(vector, self.threshold):
+                if candidate.expires_at >= now:
+                    entry = candidate
+                    break
+                self._remove(candidate)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._lru.move_to_end(entry.entry_id)
+            self.hits += 1
+            return {
+                "answer": entry.answer,
+                "sources": list(entry.sources),
+                "used_context": list(entry.used_context),
+                "matched_question": entry.question,
+                "score": score
+            }
+
+    def add(self, topic: str, embedding: Any, question: str, answer: str,
+            sources: Optional[List[str]] = None, used_context: Optional[List[str]] = None):
+        """Remember an answer; provider errors are never cached."""
+        if not self.enabled or not answer or is_error_answer(answer):
+            return
+        vector = _normalize(embedding)
+        ttl = settings.LLM_CACHE_TOPIC_TTLS.get(topic, settings.LLM_CACHE_TTL)
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            index = self._index(topic, len(vector))
+            entry = _Entry(next(self._ids), topic, question, answer, sources or [], used_context or [], now + ttl)
+            index.add(entry, vector)
+            self._lru[entry.entry_id] = entry
+            while len(self._lru) > self.max_entries:
+                _, oldest = self._lru.popitem(last=False)
+                self._indexes[oldest.topic].remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._lru.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "entries": len(self._lru),
+                "max_entries": self.max_entries,
+                "topics": {topic: len(index.entries) for topic, index in self._indexes.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+def evaluate_hit_precision(pairs: Sequence[Tuple[str, str, bool]], embed_fn: Callable[[List[str]], Any],
+                           thresholds: Sequence[float]) -> List[Dict[str, Any]]:
+    """
+    Precision and recall of cache hits on labelled question pairs.
+    Each pair is (cached question, new question, whether the cached answer is right for the new one).
+    A pair is a hit at a threshold when the two questions' cosine similarity reaches it.
+    """
+    first = np.asarray(embed_fn([pair[0] for pair in pairs]), dtype=np.float32)
+    second = np.asarray(embed_fn([pair[1] for pair in pairs]), dtype=np.float32)
+    first /= np.linalg.norm(first, axis=1, keepdims=True)
+    second /= np.linalg.norm(second, axis=1, keepdims=True)
+    scores = np.sum(first * second, axis=1)
+    labels = np.array([bool(pair[2]) for pair in pairs])
+
+    report = []
+    for threshold in thresholds:
+        hits = scores >= threshold
+        correct = int(np.sum(hits & labels))
+        report.append({
+            "threshold": threshold,
+            "hits": int(np.sum(hits)),
+            "correct_hits": correct,
+            "precision": round(correct / int(np.sum(hits)), 4) if hits.any() else 1.0,
+            "recall": round(correct / int(np.sum(labels)), 4) if labels.any() else 0.0
+        })
+    return report
+
+# Global semantic answer cache
+semantic_answer_cache = SemanticAnswerCache()
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts the computation and
+    every duplicate that arrives while it is in flight awaits the same result (or exception).
+    The computation runs as its own task, so a caller that disconnects doesn't cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 1
+            task.add_done_callback(lambda finished, key=key: self._forget(key, finished))
+            self.leaders += 1
+        else:
+            self._waiters[key] += 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, finished: asyncio.Task):
+        if self._calls.get(key) is finished:
+            del self._calls[key]
+            del self._waiters[key]
+        if not finished.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            finished.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls),
+            "executed": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            "max_waiters": self.max_waiters
+        }
+
+# Concurrent identical /chat requests
+chat_singleflight = SingleFlight("chat")
@@ -1,29 +1,159 @@
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Set
+import heapq
+import itertools
+import math
 import os
+import threading
+import time
+from app.config import settings
+from app.services.chunk_manifest import ChunkManifest, ManifestSyncMixin, chunk_metadata
+from app.utils.logger import logger
 
-class VectorStore:
+class VectorStore(ManifestSyncMixin):
     def __init__(self, persist_directory: str = "./data/chroma/"):
         os.makedirs(persist_directory, exist_ok=True)
         self.client = chromadb.Client(Settings(persist_directory=persist_directory))
         self.persist_directory = persist_directory
+        self.manifest = ChunkManifest(persist_directory)
+        self._init_search_pool()
+
+    def _init_search_pool(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Collections with a timed-out query still holding a pool thread
+        self._stuck: Set[str] = set()
+        self._stuck_lock = threading.Lock()
 
     def get_collection(self, topic: str):
         return self.client.get_or_create_collection(topic)
 
-    def add_documents(self, topic: str, chunks: List[Dict], embeddings: List[Any]):
+    def get_collection_size(self, topic: str) -> int:
+        return self.get_collection(topic).count()
+
+    def delete_collection(self, topic: str):
+        self.client.delete_collection(topic)
+        self.manifest.remove_topic(topic)
+
+    def _upsert_chunks(self, topic: str, ids: List[str], chunks: List[Dict], embeddings: Any):
         collection = self.get_collection(topic)
-        ids = [f"{chunk['source_file']}_{chunk['page']}_{i}" for i, chunk in enumerate(chunks)]
-        metadatas = [{"source_file": chunk["source_file"], "page": chunk["page"]} for chunk in chunks]
+        metadatas = [chunk_metadata(chunk) for chunk in chunks]
         documents = [chunk["text"] for chunk in chunks]
-        collection.add(documents=documents, embeddings=embeddings, ids=ids, metadatas=metadatas)
+        if hasattr(embeddings, "tolist"):
+            embeddings = embeddings.tolist()
+        collection.upsert(documents=documents, embeddings=embeddings, ids=ids, metadatas=metadatas)
+
+    def _update_chunk_metadata(self, topic: str, ids: List[str], chunks: List[Dict]):
+        self.get_collection(topic).update(ids=ids, metadatas=[chunk_metadata(chunk) for chunk in chunks])
+
+    def _delete_chunks(self, topic: str, ids: List[str]):
+        self.get_collection(topic).delete(ids=ids)
+
+    def _delete_source(self, topic: str, source_file: str):
+        self.get_collection(topic).delete(where={"source_file": source_file})
 
     def query(self, topic: str, query_embedding: Any, top_k: int = 5):
         collection = self.get_collection(topic)
         results = collection.query(query_embeddings=[query_embedding], n_results=top_k, include=["documents", "metadatas", "distances"])
         return results
     
+    def _format_results(self, results: Dict, topic: str = None) -> List[Dict]:
+        formatted_results = []
+        if results['documents'] and len(results['documents'][0]) > 0:
+            for i, doc in enumerate(results['documents'][0]):
+                result = {
+                    'id': results['ids'][0][i],
+                    'content': doc,
+                    'source': results['metadatas'][0][i].get('source_file', 'Unknown'),
+                    'page': results['metadatas'][0][i].get('page', 0),
+                    'score': 1 - results['distances'][0][i]  # Convert distance to similarity score
+                }
+                if topic is not None:
+                    result['topic'] = topic
+                formatted_results.append(result)
+        return formatted_results
+
+    def _query_collection(self, name: str, query_embedding: Any, top_k: int) -> List[Dict]:
+        collection = self.client.get_collection(name)
+        results = collection.query(
+            query_embeddings=[query_embedding], 
+            n_results=top_k, 
+            include=["documents", "metadatas", "distances"]
+        )
+        return self._format_results(results, topic=name)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.VECTOR_SEARCH_MAX_WORKERS,
+                thread_name_prefix="vector-search"
+            )
+        return self._executor
+
+    def _search_all_parallel(self, names: List[str], query_embedding: Any, top_k: int) -> List[Dict]:
+        """
+        Fan out to every collection on a bounded pool and merge with a top-k heap. Each query gets
+        VECTOR_SEARCH_TIMEOUT from the moment it starts running; one that overruns is abandoned, and its
+        collection is skipped by later searches until that query finishes, so a hung collection holds
+        at most one pool thread.
+        """
+        with self._stuck_lock:
+            stuck = [name for name in names if name in self._stuck]
+        for name in stuck:
+            logger.warning(f"Skipping collection '{name}': a previous query is still running")
+        names = [name for name in names if name not in stuck]
+
+        budget = settings.VECTOR_SEARCH_TIMEOUT
+        started: Dict[str, float] = {}
+
+        def query(name: str) -> List[Dict]:
+            started[name] = time.monotonic()
+            return self._query_collection(name, query_embedding, top_k)
+
+        executor = self._get_executor()
+        futures = {executor.submit(query, name): name for name in names}
+        # Backstop for queries stuck in the queue behind threads held by hung collections
+        waves = math.ceil(len(names) / settings.VECTOR_SEARCH_MAX_WORKERS)
+        give_up = time.monotonic() + budget * (waves + 1)
+
+        collection_results = []
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[futures[future]] + budget for future in pending if futures[future] in started]
+            timeout = min(deadlines + [give_up]) - now
+            done, pending = wait(pending, timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    collection_results.append(future.result())
+                except Exception as e:
+                    logger.warning(f"Vector search in collection '{futures[future]}' failed: {e}")
+
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                overran = name in started and now - started[name] >= budget
+                if overran or now >= give_up:
+                    pending.discard(future)
+                    self._abandon(future, name)
+
+        return heapq.nlargest(top_k, itertools.chain.from_iterable(collection_results), key=lambda x: x['score'])
+
+    def _abandon(self, future: Future, name: str):
+        """Drop a query that missed its budget; a running one marks its collection stuck until it ends"""
+        logger.warning(f"Vector search in collection '{name}' timed out")
+        if future.cancel():
+            return
+        with self._stuck_lock:
+            self._stuck.add(name)
+
+        def release(_):
+            with self._stuck_lock:
+                self._stuck.discard(name)
+
+        future.add_done_callback(release)
+
     def search_similar(self, query_embedding: Any, topic_filter: str = None, top_k: int = 5):
         """Search for similar documents across collections or specific topic"""
         try:
@@ -35,46 +165,28 @@ class VectorStore:
                     n_results=top_k, 
                     include=["documents", "metadatas", "distances"]
                 )
-                
-                # Format results
-                formatted_results = []
-                if results['documents'] and len(results['documents'][0]) > 0:
-                    for i, doc in enumerate(results['documents'][0]):
-                        formatted_results.append({
-                            'content': doc,
-                            'source': results['metadatas'][0][i].get('source_file', 'Unknown'),
-                            'page': results['metadatas'][0][i].get('page', 0),
-                            'score': 1 - results['distances'][0][i]  # Convert distance to similarity score
-                        })
-                return formatted_results
+                return self._format_results(results)
             else:
                 # Search across all collections (topics)
+                names = [collection_info.name for collection_info in self.client.list_collections()]
+                if settings.VECTOR_SEARCH_PARALLEL and len(names) > 1:
+                    return self._search_all_parallel(names, query_embedding, top_k)
+
                 all_results = []
-                collections = self.client.list_collections()
-                for collection_info in collections:
-                    collection = self.client.get_collection(collection_info.name)
-                    results = collection.query(
-                        query_embeddings=[query_embedding], 
-                        n_results=top_k, 
-                        include=["documents", "metadatas", "distances"]
-                    )
-                    
-                    if results['documents'] and len(results['documents'][0]) > 0:
-                        for i, doc in enumerate(results['documents'][0]):
-                            all_results.append({
-                                'content': doc,
-                                'source': results['metadatas'][0][i].get('source_file', 'Unknown'),
-                                'page': results['metadatas'][0][i].get('page', 0),
-                                'score': 1 - results['distances'][0][i],
-                                'topic': collection_info.name
-                            })
-                
-                # Sort by score and return top_k
-                all_results.sort(key=lambda x: x['score'], reverse=True)
-                return all_results[:top_k]
+                for name in names:
+                    all_results.extend(self._query_collection(name, query_embedding, top_k))
+                return heapq.nlargest(top_k, all_results, key=lambda x: x['score'])
                 
         except Exception as e:
             print(f"Error in search_similar: {e}")
             return []
 
-vector_store = VectorStore() 
\ No newline at end of file
+def create_vector_store():
+    """Create the vector store backend selected in settings."""
+    if settings.VECTOR_BACKEND == "numpy":
+        from app.services.numpy_vector_store import NumpyVectorStore
+        logger.info(f"Using NumPy vector store at {settings.VECTOR_INDEX_DIR}")
+        return NumpyVectorStore(settings.VECTOR_INDEX_DIR, settings.VECTOR_INDEX_DTYPE, settings.VECTOR_QUANTIZATION)
+    return VectorStore()
+
+vector_store = create_vector_store() 
\ No newline at end of file
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Recall-vs-latency benchmark of the HNSW index mode against exact search.
+Usage:
+    python scripts/benchmark_ann.py --topic Biology
+    python scripts/benchmark_ann.py --synthetic 200000 --dim 1024
+"""
+
+import sys
+import os
+import argparse
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.config import settings
+from app.services.ann_index import HNSWIndex, ann_available
+from app.services.numpy_vector_store import NumpyVectorStore
+
+def load_vectors(args) -> np.ndarray:
+    """Topic matrix from the NumPy vector store, or random unit vectors."""
+    if args.topic:
+        store = NumpyVectorStore(settings.VECTOR_INDEX_DIR)
+        index = store.get_collection(args.topic)
+        if index.count() == 0:
+            raise SystemExit(f"Topic '{args.topic}' has no vectors in {settings.VECTOR_INDEX_DIR}")
+        return np.asarray(index._vectors, dtype=np.float32)
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.synthetic, args.dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """Perturbed copies of stored vectors, so each query has real near neighbours."""
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.choice(vectors.shape[0], size=min(count, vectors.shape[0]), replace=False)
+    queries = vectors[picks] + rng.normal(scale=0.05, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int):
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        scores = vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        results.append(set(top[np.argsort(-scores[top])].tolist()))
+    latency_ms = (time.perf_counter() - started) / len(queries) * 1000
+    return results, latency_ms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topic", help="Benchmark a topic stored in the NumPy vector store")
+    parser.add_argument("--synthetic", type=int, default=100000, help="Number of random vectors when no topic is given")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--M", type=int, nargs="+", default=[settings.ANN_M])
+    parser.add_argument("--ef-construction", type=int, default=settings.ANN_EF_CONSTRUCTION)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not ann_available():
+        raise SystemExit("hnswlib is not installed")
+
+    vectors = load_vectors(args)
+    queries = make_queries(vectors, args.queries, args.seed)
+    truth, exact_ms = exact_top_k(vectors, queries, args.k)
+
+    print(f"Vectors: {vectors.shape[0]} x {vectors.shape[1]}, queries: {len(queries)}, k={args.k}")
+    print(f"Exact search: {exact_ms:.3f} ms/query")
+    print(f"{'M':>4} {'ef':>6} {'build_s':>9} {'ms/query':>10} {'recall@k':>9} {'speedup':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for M in args.M:
+            index = HNSWIndex(tmp, vectors.shape[1], M=M, ef_construction=args.ef_construction)
+            started = time.perf_counter()
+            index.build(vectors)
+            build_seconds = time.perf_counter() - started
+
+            for ef in args.ef:
+                index.set_ef(ef)
+                hits = 0
+                started = time.perf_counter()
+                for query, expected in zip(queries, truth):
+                    hits += len(expected.intersection(index.search(query, args.k)))
+                latency_ms = (time.perf_counter() - started) / len(queries) * 1000
+                recall = hits / (len(queries) * args.k)
+                print(f"{M:>4} {ef:>6} {build_seconds:>9.2f} {latency_ms:>10.3f} {recall:>9.4f} {exact_ms / latency_ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
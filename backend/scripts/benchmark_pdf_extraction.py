@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Pages-per-second of PDF text extraction by number of worker processes.
+Usage:
+    python scripts/benchmark_pdf_extraction.py path/to/book.pdf
+    python scripts/benchmark_pdf_extraction.py --synthetic 800 --workers 1 2 4 8
+"""
+
+import sys
+import os
+import argparse
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from app.config import settings
+from app.services.pdf_extraction import PDFExtractionPool
+
+def make_synthetic_pdf(path: str, pages: int):
+    """A text-dense PDF so extraction cost dominates."""
+    line = "The mitochondria is the powerhouse of the cell and converts glucose into ATP. "
+    with fitz.open() as doc:
+        for page_num in range(pages):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(36, 36, 576, 756), f"Page {page_num + 1}. " + line * 40, fontsize=9)
+        doc.save(path)
+
+def serial_extract(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return sum(1 for page in doc if page.get_text() is not None)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", help="PDF to extract; a synthetic one is generated when omitted")
+    parser.add_argument("--synthetic", type=int, default=400, help="Pages of the synthetic PDF")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pages-per-task", type=int, default=settings.PDF_EXTRACT_PAGES_PER_TASK)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if not pdf_path:
+            pdf_path = os.path.join(tmp, "synthetic.pdf")
+            make_synthetic_pdf(pdf_path, args.synthetic)
+
+        started = time.perf_counter()
+        page_count = serial_extract(pdf_path)
+        serial_seconds = time.perf_counter() - started
+
+        print(f"PDF: {pdf_path} ({page_count} pages), {args.pages_per_task} pages per task")
+        print(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+        print(f"{'serial':>8} {serial_seconds:>9.2f} {page_count / serial_seconds:>9.1f} {1.0:>7.1f}x")
+
+        for workers in args.workers:
+            pool = PDFExtractionPool(max_workers=workers, pages_per_task=args.pages_per_task)
+            try:
+                # Start the worker processes outside the timed region
+                list(pool.iter_pages(pdf_path, min(page_count, workers * args.pages_per_task)))
+                started = time.perf_counter()
+                extracted = sum(1 for _ in pool.iter_pages(pdf_path, page_count))
+                seconds = time.perf_counter() - started
+            finally:
+                pool.shutdown()
+            assert extracted == page_count
+            print(f"{workers:>8} {seconds:>9.2f} {page_count / seconds:>9.1f} {serial_seconds / seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Hit precision of the semantic answer cache on labelled question pairs, per similarity threshold.
+A hit is correct when the cached question's answer is also right for the new question.
+Usage:
+    python scripts/evaluate_semantic_cache.py
+    python scripts/evaluate_semantic_cache.py --pairs labelled_pairs.jsonl --thresholds 0.85 0.9 0.95
+The pairs file has one JSON object per line: {"cached": "...", "question": "...", "same_answer": true}
+"""
+
+import sys
+import os
+import argparse
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.services.embedding_service import get_embedding_service
+from app.services.semantic_cache import evaluate_hit_precision
+
+# Paraphrases that should share an answer, and near-misses that must not
+DEFAULT_PAIRS = [
+    ("What is photosynthesis?", "Explain photosynthesis", True),
+    ("What is photosynthesis?", "How do plants make their food?", True),
+    ("What is photosynthesis?", "What is respiration?", False),
+    ("What is photosynthesis?", "What is the equation for photosynthesis?", False),
+    ("Define a noun", "What is a noun?", True),
+    ("Define a noun", "Define a verb", False),
+    ("Who was the first president of Kenya?", "Who was Kenya's first president?", True),
+    ("Who was the first president of Kenya?", "Who was the second president of Kenya?", False),
+    ("How do I solve a quadratic equation?", "Steps to solve quadratic equations", True),
+    ("How do I solve a quadratic equation?", "How do I solve a linear equation?", False),
+    ("What causes earthquakes?", "Why do earthquakes happen?", True),
+    ("What causes earthquakes?", "What causes volcanoes?", False),
+    ("What is the meaning of 'jambo'?", "What does jambo mean?", True),
+    ("What is the capital of Tanzania?", "What is the capital of Kenya?", False),
+    ("What is inflation in economics?", "Explain inflation", True),
+    ("What is inflation in economics?", "What is deflation?", False),
+]
+
+def load_pairs(path: str):
+    pairs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                pairs.append((item["cached"], item["question"], bool(item["same_answer"])))
+    return pairs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", help="JSONL file of labelled pairs; a built-in set is used when omitted")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.85, 0.9, settings.SEMANTIC_CACHE_THRESHOLD, 0.95])
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.pairs) if args.pairs else DEFAULT_PAIRS
+    embedding_service = get_embedding_service(args.model)
+    report = evaluate_hit_precision(pairs, embedding_service.embed_texts, sorted(set(args.thresholds)))
+
+    positives = sum(1 for pair in pairs if pair[2])
+    print(f"Model: {args.model}, {len(pairs)} pairs ({positives} should hit), configured threshold {settings.SEMANTIC_CACHE_THRESHOLD}")
+    print(f"{'threshold':>10} {'hits':>6} {'correct':>8} {'precision':>10} {'recall':>8}")
+    for row in report:
+        print(f"{row['threshold']:>10.3f} {row['hits']:>6} {row['correct_hits']:>8} {row['precision']:>10.3f} {row['recall']:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import os
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+
+# Log to a scratch file rather than the tracked logs/app.log; set before app.config is first imported
+os.environ["LOG_FILE"] = os.path.join(tempfile.mkdtemp(prefix="elimu-hub-tests-"), "app.log")
+
+@pytest.fixture
+def serve_http():
+    """Starts a local fake provider for a request handler class and returns its base URL; stopped after the test."""
+    servers = []
+
+    def serve(handler):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,107 @@
+import os
+import pytest
+from app.api import admin
+
+class FakeSession:
+    def add(self, row):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def ingested(monkeypatch):
+    calls = []
+
+    def fake_ingest(self, path, topic, source_file=None, progress=None, embed_fn=None, extract_fn=None):
+        with open(path, "rb") as f:
+            calls.append((source_file, f.read()))
+        return {"pages": 1, "chunks": 1}
+
+    monkeypatch.setattr(admin.PDFIngestor, "ingest_pdf", fake_ingest)
+    monkeypatch.setattr(admin, "SessionLocal", FakeSession)
+    return calls
+
+def upload(directory, name, content, mtime_ns):
+    path = directory / f".{content.decode()}-{name}.part"
+    path.write_bytes(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+def test_revisions_move_into_place_and_older_ones_are_skipped(tmp_path, ingested):
+    """Each upload is read from its own path; a revision older than the one in place is not ingested."""
+    old = upload(tmp_path, "cells.pdf", b"v1", 1_000_000_000)
+    new = upload(tmp_path, "cells.pdf", b"v2", 2_000_000_000)
+
+    admin.process_training_file(new, "Biology", "cells.pdf", 2)
+    result = admin.process_training_file(old, "Biology", "cells.pdf", 2)
+
+    assert ingested == [("cells.pdf", b"v2")]
+    assert "skipped" in result
+    assert (tmp_path / "cells.pdf").read_bytes() == b"v2"
+    assert list(tmp_path.glob("*.part")) == []
+
+def test_failed_ingest_leaves_the_previous_revision(tmp_path, ingested, monkeypatch):
+    """A failing job removes its own upload and keeps the file already in place."""
+    (tmp_path / "cells.pdf").write_bytes(b"v1")
+    os.utime(tmp_path / "cells.pdf", ns=(1_000_000_000, 1_000_000_000))
+    monkeypatch.setattr(admin.PDFIngestor, "ingest_pdf", lambda *args, **kwargs: 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        admin.process_training_file(upload(tmp_path, "cells.pdf", b"v2", 2_000_000_000), "Biology", "cells.pdf", 2)
+
+    assert (tmp_path / "cells.pdf").read_bytes() == b"v1"
+    assert list(tmp_path.glob("*.part")) == []
+
+class FakeJobContext:
+    def __init__(self):
+        self.reports = []
+
+    def report(self, done, total, unit="items", message=None):
+        self.reports.append((done, total, message))
+
+    def check_cancelled(self):
+        pass
+
+    def run_cpu(self, func, *args):
+        return func(*args)
+
+class FakeManifest:
+    def documents(self, topic):
+        return ["cells.pdf", "removed.pdf"]
+
+class FakeStore:
+    manifest = FakeManifest()
+
+    def __init__(self):
+        self.deleted = []
+
+    def delete_document(self, topic, source_file):
+        self.deleted.append(source_file)
+
+def test_retrain_reports_pages_across_files(tmp_path, monkeypatch):
+    """Retraining re-ingests every file of the topic, drops missing ones and reports progress over all pages."""
+    monkeypatch.setattr("app.config.settings.PDF_DIR", tmp_path)
+    (tmp_path / "Biology").mkdir()
+    for name in ("cells.pdf", "genes.pdf"):
+        (tmp_path / "Biology" / name).write_bytes(b"%PDF")
+    store = FakeStore()
+    monkeypatch.setattr("app.services.vector_store.vector_store", store)
+    monkeypatch.setattr(admin.PDFIngestor, "page_count", lambda self, path: 3 if path.endswith("cells.pdf") else 2)
+
+    def fake_ingest(self, path, topic, source_file=None, progress=None, embed_fn=None, extract_fn=None):
+        for page in range(1, self.page_count(path) + 1):
+            progress(page, self.page_count(path))
+
+    monkeypatch.setattr(admin.PDFIngestor, "ingest_pdf", fake_ingest)
+    context = FakeJobContext()
+
+    result = admin.retrain_topic_files("Biology", job_context=context)
+
+    assert result == {"files": 2, "pages": 5}
+    assert store.deleted == ["removed.pdf"]
+    assert [done for done, _, _ in context.reports] == [1, 2, 3, 4, 5]
+    assert context.reports[-1] == (5, 5, "genes.pdf")
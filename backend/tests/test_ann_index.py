@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from app.services.ann_index import HNSWIndex, ann_available
+from app.services.numpy_vector_store import NumpyVectorStore, _normalize
+
+pytestmark = pytest.mark.skipif(not ann_available(), reason="hnswlib is not installed")
+
+def make_chunks(source_file, count):
+    return [{"text": f"{source_file} chunk {i}", "source_file": source_file, "page": i + 1} for i in range(count)]
+
+@pytest.fixture
+def ann_store(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.config.settings.ANN_ENABLED", True)
+    monkeypatch.setattr("app.config.settings.ANN_MIN_VECTORS", 50)
+    return NumpyVectorStore(str(tmp_path))
+
+def test_recall_against_exact_search(tmp_path):
+    """The graph finds nearly all of the exact top-10 neighbours."""
+    rng = np.random.default_rng(0)
+    vectors = _normalize(rng.standard_normal((2000, 32)).astype(np.float32))
+    queries = _normalize(vectors[:50] + 0.1 * rng.standard_normal((50, 32)).astype(np.float32))
+    index = HNSWIndex(tmp_path, 32)
+    index.build(vectors)
+
+    hits = 0
+    for query in queries:
+        exact = set(np.argsort(-(vectors @ query))[:10])
+        hits += len(exact.intersection(index.search(query, 10)))
+
+    assert hits / (len(queries) * 10) >= 0.95
+
+def test_graph_and_labels_reload(tmp_path):
+    """A saved graph reloads with its row mapping, including rows removed before saving."""
+    vectors = _normalize(np.random.default_rng(1).standard_normal((100, 16)).astype(np.float32))
+    index = HNSWIndex(tmp_path, 16)
+    index.build(vectors)
+    index.remove_rows([0, 1, 2])
+    index.save()
+
+    reloaded = HNSWIndex(tmp_path, 16)
+
+    assert reloaded.load(100)
+    assert (reloaded.count(), reloaded.deleted()) == (97, 3)
+    # Row 10 of the original matrix is row 7 once the first three are gone
+    assert reloaded.search(vectors[10], 1) == [7]
+
+def test_store_reopens_saved_graph(ann_store, tmp_path, monkeypatch):
+    """A topic over ANN_MIN_VECTORS answers from the graph after reopening, without rebuilding it."""
+    embeddings = np.random.default_rng(2).standard_normal((80, 16))
+    ann_store.add_documents("Physics", make_chunks("motion.pdf", 80), embeddings)
+    monkeypatch.setattr(HNSWIndex, "build", lambda self, vectors: pytest.fail("graph was rebuilt"))
+
+    reopened = NumpyVectorStore(str(tmp_path)).get_collection("Physics")
+
+    assert reopened.ann is not None and reopened.ann.count() == 80
+    assert reopened.search(embeddings[42], 1)[0]["document"] == "motion.pdf chunk 42"
+
+def test_delete_marks_rows_instead_of_rebuilding(ann_store):
+    """Deletes leave the graph in place until deleted labels pass the compaction ratio."""
+    embeddings = np.random.default_rng(3).standard_normal((100, 16))
+    ann_store.add_documents("Physics", make_chunks("motion.pdf", 90), embeddings[:90])
+    ann_store.add_documents("Physics", make_chunks("waves.pdf", 10), embeddings[90:])
+    index = ann_store.get_collection("Physics")
+    graph = index.ann
+
+    ann_store.delete_document("Physics", "waves.pdf")
+    ann_store._delete_chunks("Physics", index.ids[:5])
+
+    assert index.ann is graph and graph.deleted() == 15
+    hits = index.search(embeddings[50], 100)
+    assert hits[0]["document"] == "motion.pdf chunk 50"
+    assert {hit["document"] for hit in hits}.isdisjoint({f"waves.pdf chunk {i}" for i in range(10)})
+
+    ann_store._delete_chunks("Physics", index.ids[:5])
+
+    assert index.ann is not graph and index.ann.deleted() == 0 and index.ann.count() == 80
+    assert index.search(embeddings[50], 1)[0]["document"] == "motion.pdf chunk 50"
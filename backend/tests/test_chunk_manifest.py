@@ -0,0 +1,16 @@
+import threading
+from app.services.chunk_manifest import ChunkManifest
+
+def test_concurrent_writers_keep_every_entry(tmp_path):
+    """Separate manifest instances (as in separate processes) never overwrite each other's updates."""
+    def record_documents(manifest, prefix):
+        for i in range(40):
+            manifest.record("Physics", {f"{prefix}-{i}.pdf": [(f"{prefix}-{i}", 1)]}, replace=False)
+
+    writers = [threading.Thread(target=record_documents, args=(ChunkManifest(tmp_path), prefix)) for prefix in "abc"]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert len(ChunkManifest(tmp_path).documents("Physics")) == 120
@@ -0,0 +1,94 @@
+import pytest
+from app.services.context_assembler import ContextAssembler, TokenCounter
+from app.services.llm_service import LLMService
+
+@pytest.fixture
+def assembler(monkeypatch):
+    monkeypatch.setattr("app.config.settings.LLM_CONTEXT_WINDOWS", {"small-model": 400})
+    monkeypatch.setattr("app.config.settings.LLM_CONTEXT_SAFETY_MARGIN", 0)
+    monkeypatch.setattr("app.config.settings.LLM_CONTEXT_MIN_CHUNK_TOKENS", 10)
+    return ContextAssembler()
+
+def chunk(content, score, source=None):
+    return {"content": content, "score": score, "source": source}
+
+def split_text(text, chunk_size=250, chunk_overlap=40):
+    """RecursiveCharacterTextSplitter's merge of the words of one paragraph, at the app's CHUNK_SIZE/CHUNK_OVERLAP"""
+    chunks, current, total = [], [], 0
+    for word in text.split(" "):
+        if total + len(word) + (1 if current else 0) > chunk_size and current:
+            chunks.append(" ".join(current))
+            while total > chunk_overlap or (total + len(word) + (1 if current else 0) > chunk_size and total > 0):
+                total -= len(current[0]) + (1 if len(current) > 1 else 0)
+                current = current[1:]
+        current.append(word)
+        total += len(word) + (1 if len(current) > 1 else 0)
+    chunks.append(" ".join(current))
+    return chunks
+
+def test_budget_reserves_completion_and_prompt(assembler, monkeypatch):
+    """The context budget is the window less max_tokens and the surrounding prompt, capped globally."""
+    counter = assembler.counter
+    assert assembler.budget("small-model", 100, "What is osmosis?") == 400 - 100 - counter.count("What is osmosis?")
+    assert assembler.budget("small-model", 500) == 0
+    monkeypatch.setattr("app.config.settings.LLM_CONTEXT_BUDGET", 50)
+    assert assembler.budget("unlisted-model", 100) == 50
+
+def test_most_relevant_chunks_first_and_overlap_removed(assembler):
+    """Chunks are taken by score, and sentences shared with a better chunk are not repeated."""
+    documents = [
+        chunk("Osmosis moves water across a membrane. It needs a concentration gradient.", 0.7),
+        chunk("Cells have membranes. Osmosis moves water across a membrane.", 0.9),
+        chunk("Cells have membranes.", 0.5),
+    ]
+
+    text, used = assembler.assemble(documents, "small-model", max_tokens=100)
+
+    assert text == ("Cells have membranes. Osmosis moves water across a membrane.\n\n"
+                    "It needs a concentration gradient.")
+    assert [doc["score"] for doc in used] == [0.9, 0.7]
+    assert assembler.get_stats()["chunks_deduped"] == 1
+
+def test_splitter_overlap_between_neighbouring_chunks_is_cut(assembler):
+    """The sentence fragment the splitter repeats across neighbouring chunks of a source appears once."""
+    page = ("Photosynthesis takes place in the chloroplasts of green plants. Light energy is absorbed by "
+            "chlorophyll and used to split water molecules, releasing oxygen as a by-product. The hydrogen "
+            "from water reduces carbon dioxide to glucose in the Calvin cycle, which runs in the stroma. "
+            "Glucose is then used for respiration or stored as starch in the leaves and roots of the plant.")
+    pieces = split_text(page)
+    shared = "carbon dioxide to glucose in the Calvin"
+    assert len(pieces) == 2 and pieces[0].endswith(shared) and pieces[1].startswith(shared)
+    elsewhere = f"{shared} cycle is named after Melvin Calvin."
+    documents = [chunk(pieces[1], 0.9, "biology.pdf"), chunk(pieces[0], 0.8, "biology.pdf"),
+                 chunk(elsewhere, 0.7, "history.pdf")]
+
+    text, used = assembler.assemble(documents, "small-model", max_tokens=50)
+
+    later, earlier, other = text.split("\n\n")
+    assert f"{earlier} {later}" == page
+    assert other == elsewhere
+    assert assembler.get_stats()["overlaps_trimmed"] == 1
+
+def test_chunk_crossing_budget_is_trimmed_at_sentence(assembler):
+    """Context never exceeds the budget; the last chunk that fits partially is cut at a sentence."""
+    long_chunk = " ".join(f"Sentence number {i} explains part of the topic." for i in range(100))
+    documents = [chunk(long_chunk, 0.9), chunk("Another relevant passage.", 0.8)]
+
+    text, used = assembler.assemble(documents, "small-model", max_tokens=300)
+
+    assert assembler.counter.count(text) <= 100
+    assert text.startswith("Sentence number 0") and text.endswith(".")
+    assert len(used) == 1
+    stats = assembler.get_stats()
+    assert (stats["chunks_trimmed"], stats["chunks_dropped"]) == (1, 1)
+
+def test_context_prompt_stays_within_model_window(monkeypatch):
+    """Many large chunks still give a prompt that leaves room for the completion."""
+    monkeypatch.setattr("app.config.settings.LLM_CONTEXT_WINDOWS", {"tiny": 1024})
+    service = LLMService(model="tiny", provider="groq")
+    documents = [chunk(f"Fact {i}. " + "Details about photosynthesis. " * 200, 1 - i / 10) for i in range(5)]
+
+    system_message, prompt = service._context_prompt("How do plants eat?", documents, max_tokens=512)
+
+    assert "Fact 0." in prompt and "How do plants eat?" in prompt
+    assert TokenCounter().count(system_message + prompt) + 512 <= 1024
@@ -0,0 +1,66 @@
+import threading
+import pytest
+from app.services.embedding_batcher import EmbeddingBatcher
+
+class FakeEncoder:
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+@pytest.fixture
+def encoder():
+    return FakeEncoder()
+
+def test_single_embedding(encoder):
+    """A lone request is encoded and returned through its future."""
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=1)
+    try:
+        assert batcher.embed("abc") == [3.0]
+    finally:
+        batcher.stop()
+
+def test_concurrent_requests_share_a_batch(encoder):
+    """Concurrent requests are encoded together and each gets its own result."""
+    batcher = EmbeddingBatcher(encoder, max_batch_size=16, max_wait_ms=200)
+    try:
+        futures = [batcher.submit("x" * i) for i in range(1, 9)]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.stop()
+
+    assert results == [[float(i)] for i in range(1, 9)]
+    assert len(encoder.calls) == 1
+    stats = batcher.get_stats()
+    assert stats["total_requests"] == 8
+    assert stats["total_batches"] == 1
+    assert stats["largest_batch"] == 8
+
+def test_batch_size_is_capped(encoder):
+    """No encode call receives more than max_batch_size texts."""
+    batcher = EmbeddingBatcher(encoder, max_batch_size=3, max_wait_ms=100)
+    try:
+        futures = [batcher.submit(str(i)) for i in range(7)]
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        batcher.stop()
+
+    assert all(len(call) <= 3 for call in encoder.calls)
+    assert sum(len(call) for call in encoder.calls) == 7
+
+def test_encode_errors_propagate():
+    """An encode failure is raised to every waiting caller."""
+    def failing_encoder(texts):
+        raise ValueError("model unavailable")
+
+    batcher = EmbeddingBatcher(failing_encoder, max_batch_size=4, max_wait_ms=1)
+    try:
+        with pytest.raises(ValueError):
+            batcher.embed("question")
+    finally:
+        batcher.stop()
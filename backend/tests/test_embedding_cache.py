@@ -0,0 +1,41 @@
+import time
+import numpy as np
+import pytest
+from app.services.embedding_cache import EmbeddingCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(db_path=tmp_path / "cache.db", max_entries=3)
+
+def test_round_trip_and_counters(cache):
+    """Stored embeddings come back unchanged and lookups are counted."""
+    cache.put_many("model-a", ["one", "two"], [[1.0, 2.0], [3.0, 4.0]])
+
+    results = cache.get_many("model-a", ["one", "missing", "two"])
+
+    np.testing.assert_array_equal(results[0], np.array([1.0, 2.0], dtype=np.float32))
+    assert results[1] is None
+    np.testing.assert_array_equal(results[2], np.array([3.0, 4.0], dtype=np.float32))
+    stats = cache.get_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+def test_keys_include_model_name(cache):
+    """The same text embedded by another model is a miss."""
+    cache.put_many("model-a", ["text"], [[1.0]])
+    assert cache.get_many("model-b", ["text"]) == [None]
+
+def test_least_recently_used_entries_are_evicted(cache):
+    """Going over the size cap drops the entries read least recently."""
+    for text, value in [("a", 1.0), ("b", 2.0), ("c", 3.0)]:
+        cache.put_many("m", [text], [[value]])
+        time.sleep(0.01)
+    cache.get_many("m", ["a"])  # refresh "a"
+    time.sleep(0.01)
+
+    cache.put_many("m", ["d"], [[4.0]])
+
+    results = cache.get_many("m", ["a", "b", "c", "d"])
+    assert results[1] is None
+    assert all(result is not None for i, result in enumerate(results) if i != 1)
+    assert cache.get_stats()["evictions"] == 1
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+import pytest
+from app.services.http_client import LLMHTTPClients
+from app.services.llm_service import LLMService
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Set to hold every request until that many are in flight at once
+    barrier = None
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        if self.barrier is not None:
+            self.barrier.wait()
+        body = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server_url(serve_http):
+    return serve_http(CompletionHandler) + "/chat/completions"
+
+def test_sequential_calls_reuse_one_connection(server_url):
+    """Keep-alive means repeated completions pay for a single connection."""
+    clients = LLMHTTPClients(pool_size=4)
+    try:
+        for _ in range(5):
+            response = clients.post("groq", server_url, json={"messages": []})
+            assert response.json()["choices"][0]["message"]["content"] == "ok"
+
+        stats = clients.get_stats()["providers"]["groq"]
+        assert stats["requests"] == 5
+        assert stats["pools"][0]["connections_opened"] == 1
+        assert stats["connection_reuse_ratio"] == 0.8
+    finally:
+        clients.close()
+
+def test_providers_get_separate_pools(server_url):
+    """Each provider has its own client so pool limits and timeouts are independent."""
+    clients = LLMHTTPClients(pool_size=2)
+    try:
+        assert clients.get("groq") is clients.get("groq")
+        assert clients.get("groq") is not clients.get("openrouter")
+        assert clients.get("openrouter").timeout[0] > 0
+    finally:
+        clients.close()
+
+def test_async_completions_overlap(server_url, monkeypatch):
+    """Concurrent awaited completions share the event loop instead of queueing behind each other."""
+    # No request is answered until all twenty are in flight; queued calls would break the barrier
+    monkeypatch.setattr(CompletionHandler, "barrier", threading.Barrier(20, timeout=10))
+    monkeypatch.setattr("app.services.llm_service.llm_http", LLMHTTPClients(async_pool_size=50))
+    llm = LLMService(provider="groq")
+    llm.api_key, llm.api_url = "test-key", server_url
+
+    async def scenario():
+        return await asyncio.gather(*(llm.acall_llm(f"question {i}") for i in range(20)))
+
+    assert asyncio.run(scenario()) == ["ok"] * 20
+
+def test_async_clients_are_kept_per_loop(server_url):
+    """Another event loop gets its own client instead of orphaning the open one of the first loop."""
+    clients = LLMHTTPClients()
+
+    async def post():
+        await clients.apost("groq", server_url, json={"messages": []})
+        return clients.aget("groq")
+
+    async def post_and_close():
+        client = await post()
+        await clients.aclose()
+        return client
+
+    first_loop = asyncio.new_event_loop()
+    try:
+        first = first_loop.run_until_complete(post())
+        second = asyncio.run(post_and_close())
+
+        assert second is not first and second.client.is_closed and not first.client.is_closed
+        assert first_loop.run_until_complete(post()) is first
+        first_loop.run_until_complete(clients.aclose())
+        assert first.client.is_closed
+    finally:
+        first_loop.close()
+
+def test_async_errors_use_the_sync_error_format(monkeypatch):
+    """A connection failure on the async path is reported like the blocking client reports it."""
+    monkeypatch.setattr("app.services.llm_service.llm_http", LLMHTTPClients())
+    llm = LLMService(provider="groq")
+    llm.api_key, llm.api_url = "test-key", "http://127.0.0.1:9/chat/completions"
+
+    assert asyncio.run(llm.acall_llm("hello")).startswith("[LLM ERROR] Request failed")
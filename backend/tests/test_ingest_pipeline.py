@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.numpy_vector_store import NumpyVectorStore
+
+def chunk_page(text, page, source_file):
+    return [{"text": line, "page": page, "source_file": source_file} for line in text.splitlines()]
+
+def make_pages(count, lines_per_page=3):
+    return [(page, "\n".join(f"page {page} line {i}" for i in range(lines_per_page))) for page in range(1, count + 1)]
+
+class FakeEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return np.random.rand(len(texts), 8).astype(np.float32)
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path))
+
+def test_streams_pages_in_fixed_size_batches(store):
+    """Every chunk is stored, embedded in batches of at most batch_size, with progress per batch."""
+    embedder = FakeEmbedder()
+    progress = []
+    pipeline = IngestPipeline(store, embedder, batch_size=4, queue_size=1)
+
+    changes = pipeline.run(iter(make_pages(5)), chunk_page, "Physics", "motion.pdf", progress=progress.append)
+
+    assert changes == {"added": 15, "removed": 0, "unchanged": 0}
+    assert store.get_collection_size("Physics") == 15
+    assert all(len(batch) <= 4 for batch in embedder.batches)
+    assert progress == sorted(progress) and progress[-1] == 5
+
+def test_reingest_only_embeds_changed_chunks(store):
+    """Streaming a revised document writes new chunks and removes stale ones."""
+    pipeline = IngestPipeline(store, FakeEmbedder(), batch_size=2)
+    pipeline.run(iter(make_pages(2)), chunk_page, "Physics", "motion.pdf")
+
+    embedder = FakeEmbedder()
+    revised = make_pages(1) + [(2, "page 2 line 0\npage 2 line 1 (revised)")]
+    changes = IngestPipeline(store, embedder, batch_size=2).run(iter(revised), chunk_page, "Physics", "motion.pdf")
+
+    assert changes == {"added": 1, "removed": 2, "unchanged": 4}
+    assert [text for batch in embedder.batches for text in batch] == ["page 2 line 1 (revised)"]
+    assert store.get_collection_size("Physics") == 5
+
+def test_progress_callback_can_cancel(store):
+    """An exception from the progress callback stops the pipeline after the current batch."""
+    class Stop(Exception):
+        pass
+
+    def cancel(page):
+        raise Stop()
+
+    with pytest.raises(Stop):
+        IngestPipeline(store, FakeEmbedder(), batch_size=3, queue_size=1).run(
+            iter(make_pages(50)), chunk_page, "Physics", "long.pdf", progress=cancel)
+    assert store.get_collection_size("Physics") == 3
+
+def test_stage_failure_is_raised(store):
+    """An error in an upstream stage stops the pipeline and surfaces to the caller."""
+    def pages():
+        yield 1, "page 1 line 0"
+        raise ValueError("corrupt page")
+
+    with pytest.raises(ValueError, match="corrupt page"):
+        IngestPipeline(store, FakeEmbedder(), batch_size=1, queue_size=1).run(pages(), chunk_page, "Physics", "bad.pdf")
+    # Chunks written before the failure stay tracked so a later re-ingest or delete cleans them up
+    tracked = store.manifest.load("Physics").get("bad.pdf", {})
+    assert set(tracked) == set(store.get_collection("Physics").ids)
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import numpy as np
+import pytest
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.job_queue import Job, JobLane, JobPriority, JobQueue, JobStatus
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.pdf_ingestor import PDFIngestor
+
+def add(a, b):
+    return a + b
+
+async def async_add(a, b):
+    return a + b
+
+def fail():
+    raise RuntimeError("boom")
+
+def worker_pid():
+    return os.getpid()
+
+def job_and_step_pids(job_context=None):
+    return {"job": os.getpid(), "step": job_context.run_cpu(worker_pid)}
+
+# The API process's vector store, set by test_cpu_lane_ingest_is_searchable_here
+api_store = None
+
+def embed_in_pool(texts):
+    return [[1.0, float(len(text))] for text in texts], os.getpid()
+
+def ingest_on_cpu_lane(topic, pages, job_context=None):
+    pids = set()
+
+    def embed(texts):
+        vectors, pid = job_context.run_cpu(embed_in_pool, texts)
+        pids.add(pid)
+        return np.array(vectors, dtype=np.float32)
+
+    IngestPipeline(api_store, embed).run(iter(pages), PDFIngestor().chunk_page, topic, "notes.pdf")
+    return sorted(pids)
+
+def count_pages(total, job_context=None):
+    for page in range(1, total + 1):
+        time.sleep(0.01)
+        job_context.report(page, total, unit="pages")
+        job_context.check_cancelled()
+    return total
+
+async def loop_id():
+    return id(asyncio.get_running_loop())
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "jobs.db"
+
+@pytest.fixture
+def queue(db_path):
+    return JobQueue(max_workers=1, db_path=db_path)
+
+def run_next(queue, worker="test-worker"):
+    job = queue.claim_job(worker)
+    queue._process_job(job, worker)
+    return job
+
+def wait_for_status(queue, job_id, status, timeout=15):
+    deadline = time.monotonic() + timeout
+    while queue.get_job_status(job_id)["status"] != status:
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+def test_jobs_run_and_report_status(queue):
+    """Sync and async jobs complete and their status is read back from the database."""
+    queue.submit_job("sync", add, args=(1, 2))
+    queue.submit_job("async", async_add, args=(3, 4), lane=JobLane.IO)
+    run_next(queue)
+    run_next(queue)
+
+    assert queue.get_job_status("sync")["status"] == "completed"
+    assert queue.get_job_status("async")["progress"] == 100.0
+    queue.submit_job("bad", fail)
+    run_next(queue)
+    assert queue.get_job_status("bad")["error"] == "boom"
+    assert [job["job_id"] for job in queue.list_jobs(JobStatus.COMPLETED)] == ["sync", "async"]
+
+def test_pending_jobs_survive_restart(db_path):
+    """A job submitted before a restart is picked up by the next queue on the same file."""
+    JobQueue(max_workers=1, db_path=db_path).submit_job("durable", add, args=(2, 2))
+
+    restarted = JobQueue(max_workers=1, db_path=db_path)
+    job = run_next(restarted)
+
+    assert job.job_id == "durable"
+    assert restarted.get_job_status("durable")["status"] == "completed"
+
+def test_claims_are_exclusive_across_queues(db_path):
+    """Two processes sharing the database never claim the same job."""
+    first, second = JobQueue(max_workers=1, db_path=db_path), JobQueue(max_workers=1, db_path=db_path)
+    first.submit_job("only", add, args=(1, 1))
+
+    assert first.claim_job("a") is not None
+    assert second.claim_job("b") is None
+
+def test_expired_lease_is_requeued(queue):
+    """A job whose worker stopped heartbeating is handed to another worker."""
+    queue.lease_seconds = 0
+    queue.submit_job("crashy", add, args=(1, 1))
+    queue.claim_job("crashed-worker")
+    time.sleep(0.01)
+
+    queue.lease_seconds = 60
+    job = queue.claim_job("healthy-worker")
+
+    assert job.job_id == "crashy"
+    assert job.attempts == 2
+    # The crashed worker can no longer overwrite the retry
+    queue._finish("crashy", "crashed-worker", JobStatus.FAILED, error="late")
+    assert queue.get_job_status("crashy")["status"] == "running"
+
+def test_cancel_and_cleanup(queue):
+    """Pending jobs cancel at once and finished ones cannot; finished jobs are pruned after the retention window."""
+    queue.submit_job("cancel-me", add, args=(1, 1))
+    assert queue.cancel_job("cancel-me")
+    assert not queue.cancel_job("cancel-me")
+
+    assert queue.cleanup(older_than_seconds=3600) == 0
+    assert queue.cleanup(older_than_seconds=0) == 1
+    assert queue.get_job_status("cancel-me") is None
+
+def test_async_lane_runs_on_the_callers_loop(queue):
+    """Coroutine jobs default to the async lane and run on the loop that started it."""
+    async def scenario():
+        await queue.start_async()
+        try:
+            queue.submit_job("loop", loop_id)
+            for _ in range(100):
+                if queue.get_job_status("loop")["status"] == "completed":
+                    break
+                await asyncio.sleep(0.02)
+            return id(asyncio.get_running_loop())
+        finally:
+            await queue.stop_async()
+
+    loop_identity = asyncio.run(scenario())
+
+    status = queue.get_job_status("loop")
+    assert status["lane"] == "async" and status["status"] == "completed"
+    assert json.loads(queue._execute("SELECT result FROM job_queue WHERE job_id = 'loop'").fetchone()[0]) == loop_identity
+    with pytest.raises(ValueError):
+        queue.submit_job("sync-on-async", add, args=(1, 1), lane=JobLane.ASYNC)
+
+def test_priority_then_fair_share_across_submitters(queue):
+    """Interactive jobs jump the bulk backlog, and submitters in a class take turns."""
+    for i in range(3):
+        queue.submit_job(f"bulk-{i}", add, args=(i, i), priority=JobPriority.BULK, submitter="admin")
+    for i in range(3):
+        queue.submit_job(f"admin-{i}", add, args=(i, i), submitter="admin")
+    queue.submit_job("teacher-0", add, args=(1, 1), submitter="teacher")
+    queue.submit_job("urgent", add, args=(1, 1), priority=JobPriority.INTERACTIVE, submitter="principal")
+
+    order = [queue.claim_job(f"w{i}").job_id for i in range(8)]
+
+    assert order[0] == "urgent"
+    # The admin's earlier backlog doesn't hold back the teacher's single job
+    assert order[1:5] == ["admin-0", "teacher-0", "admin-1", "admin-2"]
+    assert order[5:] == ["bulk-0", "bulk-1", "bulk-2"]
+
+def test_duplicate_submission_attaches_to_in_flight_job(queue):
+    """A job with the same idempotency key as a queued or running job is not queued again."""
+    assert queue.submit_job("first", add, args=(1, 1), idempotency_key="pdf:abc") == "first"
+    assert queue.submit_job("second", add, args=(1, 1), idempotency_key="pdf:abc") == "first"
+    assert queue.get_job_status("second") is None
+
+    run_next(queue)
+    assert queue.submit_job("third", add, args=(1, 1), idempotency_key="pdf:abc") == "third"
+
+def test_running_job_reports_progress_and_stops_on_cancel(queue):
+    """A job using its context reports throughput and ETA, and stops soon after cancel_job."""
+    queue.submit_job("textbook", count_pages, args=(2000,))
+    job = queue.claim_job("w")
+    worker = threading.Thread(target=queue._process_job, args=(job, "w"))
+    worker.start()
+    time.sleep(0.8)
+
+    status = queue.get_job_status("textbook")
+    assert 0 < status["progress"] < 100
+    assert status["throughput"]["unit"] == "pages" and status["throughput"]["per_second"] > 0
+    assert status["eta_seconds"] > 0
+
+    cancelled_at = time.time()
+    assert queue.cancel_job("textbook")
+    worker.join(timeout=5)
+    assert time.time() - cancelled_at < 1.0
+    assert queue.get_job_status("textbook")["status"] == "cancelled"
+
+def test_local_functions_are_rejected(queue):
+    """Jobs must reference importable functions so another process can run them."""
+    with pytest.raises(ValueError):
+        queue.submit_job("lambda", lambda: None)
+
+def test_cpu_lane_runs_steps_in_worker_process(db_path, monkeypatch):
+    """CPU lane jobs run here and hand run_cpu steps to the process pool; both are counted per lane."""
+    monkeypatch.setattr("app.config.settings.JOB_CPU_PRELOAD_EMBEDDINGS", False)
+    queue = JobQueue(max_workers=1, db_path=db_path, cpu_workers=1)
+    queue.submit_job("cpu", job_and_step_pids, lane=JobLane.CPU)
+    queue.submit_job("io", worker_pid)
+    try:
+        assert queue.claim_job("io-worker", JobLane.CPU).job_id == "cpu"
+        queue._process_job(queue.claim_job("io-worker-2", JobLane.IO), "io-worker-2")
+        queue._process_job(Job(queue._execute("SELECT * FROM job_queue WHERE job_id = 'cpu'").fetchone()), "io-worker")
+    finally:
+        queue.stop()
+
+    results = {job_id: json.loads(queue._execute("SELECT result FROM job_queue WHERE job_id = ?", (job_id,)).fetchone()[0])
+               for job_id in ("cpu", "io")}
+    assert results["io"] == os.getpid()
+    assert results["cpu"]["job"] == os.getpid() and results["cpu"]["step"] != os.getpid()
+    lanes = queue.get_lane_stats()["lanes"]
+    assert lanes["cpu"]["completed"] == 1 and lanes["io"]["completed"] == 1
+    assert lanes["cpu"]["pending"] == 0
+
+def test_one_queue_per_database_runs_the_cpu_lane(db_path, monkeypatch):
+    """Of two queues sharing a database only one starts CPU workers; the other takes over once it stops."""
+    monkeypatch.setattr("app.config.settings.JOB_CPU_PRELOAD_EMBEDDINGS", False)
+    monkeypatch.setattr("app.config.settings.JOB_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr("app.config.settings.JOB_POLL_INTERVAL", 0.05)
+    first = JobQueue(max_workers=1, db_path=db_path, cpu_workers=1)
+    second = JobQueue(max_workers=1, db_path=db_path, cpu_workers=1)
+    first.start()
+    second.start()
+    try:
+        assert first.get_lane_stats()["cpu_lane_here"] and not second.get_lane_stats()["cpu_lane_here"]
+        assert len(first.workers) == 2 and len(second.workers) == 1
+        second.submit_job("cpu", add, args=(2, 3), lane=JobLane.CPU)
+        wait_for_status(second, "cpu", "completed")
+
+        first.stop()
+        second.submit_job("after", add, args=(1, 1), lane=JobLane.CPU)
+        wait_for_status(second, "after", "completed")
+        assert second.get_lane_stats()["cpu_lane_here"]
+    finally:
+        first.stop()
+        second.stop()
+
+def test_cpu_lane_ingest_is_searchable_here(db_path, tmp_path, monkeypatch):
+    """A CPU lane ingest embeds on the pool but stores from this process, so its chunks are searchable here."""
+    monkeypatch.setattr("app.config.settings.JOB_CPU_PRELOAD_EMBEDDINGS", False)
+    monkeypatch.setitem(globals(), "api_store", NumpyVectorStore(str(tmp_path / "vectors")))
+    api_store.add_documents("Physics", [{"text": "inertia", "source_file": "old.pdf", "page": 1}], [[1.0, 0.0]])
+    assert len(api_store.search_similar([1.0, 0.0], topic_filter="Physics")) == 1
+    queue = JobQueue(max_workers=1, db_path=db_path, cpu_workers=1)
+    queue.submit_job("ingest", ingest_on_cpu_lane, args=("Physics", [[1, "Force equals mass times acceleration."]]),
+                     lane=JobLane.CPU)
+    try:
+        queue._process_job(queue.claim_job("cpu-worker", JobLane.CPU), "cpu-worker")
+    finally:
+        queue.stop()
+
+    assert queue.get_job_status("ingest")["status"] == "completed"
+    pool_pids = json.loads(queue._execute("SELECT result FROM job_queue WHERE job_id = 'ingest'").fetchone()[0])
+    assert pool_pids and os.getpid() not in pool_pids
+    hits = api_store.search_similar([0.0, 1.0], topic_filter="Physics")
+    assert hits[0]["content"] == "Force equals mass times acceleration."
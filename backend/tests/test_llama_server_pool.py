@@ -0,0 +1,134 @@
+import asyncio
+import socket
+import sys
+import time
+import pytest
+from app.services.llama_server_pool import READY, LlamaServerPool, LlamaServerUnavailable
+from app.services.llm_service import LLMService
+
+# Stand-in for llama-server: /health and an OpenAI-compatible completion naming the port that answered
+FAKE_SERVER = """#!{python}
+import argparse, json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+parser = argparse.ArgumentParser()
+parser.add_argument("--host")
+parser.add_argument("--port", type=int)
+args, _ = parser.parse_known_args()
+
+class Handler(BaseHTTPRequestHandler):
+    def reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.reply({{"status": "ok"}})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.reply({{"choices": [{{"message": {{"content": "answer from %d" % args.port}}}}]}})
+
+    def log_message(self, *args):
+        pass
+
+ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
+"""
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until(condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.config.settings.LOG_FILE", str(tmp_path / "app.log"))
+    monkeypatch.setattr("app.config.settings.LLAMA_SERVER_HEALTH_INTERVAL", 0.05)
+    monkeypatch.setattr("app.config.settings.LLAMA_SERVER_ENABLED", True)
+    monkeypatch.setattr("app.config.settings.LLAMA_SERVER_LOCK_FILE", str(tmp_path / "llama-server.lock"))
+    binary = tmp_path / "llama-server"
+    binary.write_text(FAKE_SERVER.format(python=sys.executable))
+    binary.chmod(0o755)
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+
+    pool = LlamaServerPool(binary=str(binary), model_path=str(model), size=2, host="127.0.0.1",
+                           base_port=free_port(), extra_args="")
+    monkeypatch.setattr("app.services.llama_server_pool.llama_server_pool", pool)
+    yield pool
+    pool.stop()
+
+def test_local_provider_answers_from_ready_slots(pool):
+    """Once the slots have loaded, local completions go through them without launching anything."""
+    pool.start()
+    wait_until(lambda: all(slot.state == READY for slot in pool.slots))
+
+    service = LLMService(provider="local")
+    answers = [service.call_llm("What is a cell?") for _ in range(2)]
+    answers.append(asyncio.run(service.acall_llm("What is a cell?")))
+
+    assert all(answer.startswith("answer from") for answer in answers)
+    assert [slot.restarts for slot in pool.slots] == [0, 0]
+    assert sum(slot.requests for slot in pool.slots) == 3
+
+def test_concurrent_requests_spread_across_slots(pool):
+    """The least busy ready slot takes the next request."""
+    pool.start()
+    wait_until(lambda: all(slot.state == READY for slot in pool.slots))
+
+    with pool.lease() as first, pool.lease() as second:
+        assert first != second
+        assert [slot.in_flight for slot in pool.slots] == [1, 1]
+    assert [slot.in_flight for slot in pool.slots] == [0, 0]
+
+def test_crashed_slot_is_restarted(pool):
+    """A slot whose process dies is relaunched by the monitor and rejoins the rotation."""
+    pool.start()
+    wait_until(lambda: all(slot.state == READY for slot in pool.slots))
+    slot = pool.slots[0]
+    old_pid = slot.process.pid
+
+    slot.process.kill()
+
+    wait_until(lambda: slot.restarts == 1 and slot.state == READY)
+    assert slot.process.pid != old_pid
+    assert pool.get_stats()["ready"] == 2
+
+def test_one_worker_supervises_shared_slots(pool):
+    """A second worker's pool uses the first one's servers without launching its own, and takes over when it stops."""
+    follower = LlamaServerPool(binary=pool.binary, model_path=pool.model_path, size=2, host="127.0.0.1",
+                               base_port=pool.base_port, extra_args="")
+    pool.start()
+    follower.start()
+    try:
+        wait_until(lambda: all(slot.state == READY for slot in follower.slots))
+        assert pool.supervising and not follower.supervising
+        assert all(slot.process is None for slot in follower.slots)
+        with follower.lease() as url:
+            assert url in {slot.chat_url for slot in pool.slots}
+
+        pool.stop()
+
+        wait_until(lambda: follower.supervising and all(slot.alive() and slot.state == READY
+                                                         for slot in follower.slots))
+    finally:
+        follower.stop()
+    assert not any(slot.alive() for slot in follower.slots)
+
+def test_no_ready_slot_is_an_llm_error(pool, monkeypatch):
+    """Without a loaded model the pool stays down and local calls fail like any provider error."""
+    monkeypatch.setattr(pool, "model_path", "/missing/model.gguf")
+    pool.start()
+
+    with pytest.raises(LlamaServerUnavailable):
+        with pool.lease():
+            pass
+    assert LLMService(provider="local").call_llm("hi").startswith("[LLM ERROR]")
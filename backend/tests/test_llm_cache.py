@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_service import LLMService
+from app.services.numpy_vector_store import NumpyVectorStore
+
+CONTEXT = [{"id": "abc123", "content": "Plants turn light into sugar.", "source": "bio.pdf"}]
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path))
+
+@pytest.fixture
+def response_cache(store, monkeypatch):
+    response_cache = LLMResponseCache(topic_version=store.manifest.version, max_entries=10)
+    response_cache.enabled = True
+    monkeypatch.setattr("app.services.llm_service.llm_response_cache", response_cache)
+    return response_cache
+
+@pytest.fixture
+def llm(monkeypatch):
+    service = LLMService(provider="groq")
+    service.calls = []
+
+    def fake_call(prompt, max_tokens=512, temp=0.7, system_message=None):
+        service.calls.append(prompt)
+        return f"answer {len(service.calls)}"
+
+    monkeypatch.setattr(service, "call_llm", fake_call)
+    return service
+
+def test_repeated_question_is_served_from_cache(llm, response_cache):
+    """The same question over the same chunks and parameters reaches the provider once."""
+    first = llm.call_llm_with_context("What is photosynthesis?", CONTEXT, topic="Biology")
+    second = llm.call_llm_with_context("What is photosynthesis?", CONTEXT, topic="Biology")
+    llm.call_llm_with_context("What is photosynthesis?", CONTEXT, temp=0.2, topic="Biology")
+    llm.call_llm_with_context("What is photosynthesis?", [dict(CONTEXT[0], id="def456")], topic="Biology")
+
+    assert first == second == "answer 1"
+    assert len(llm.calls) == 3
+    stats = response_cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+    assert stats["topics"]["Biology"]["hit_rate"] == 0.25
+
+def test_document_change_in_topic_invalidates_answers(llm, response_cache, store):
+    """Ingesting into a topic makes its earlier answers unreachable, leaving other topics cached."""
+    llm.call_llm_with_context("What is photosynthesis?", None, topic="Biology")
+    llm.call_llm_with_context("What is a noun?", None, topic="English")
+
+    chunk = {"text": "Chlorophyll absorbs light.", "page": 1, "source_file": "bio.pdf"}
+    store.add_documents("Biology", [chunk], np.random.rand(1, 8).astype(np.float32))
+
+    assert llm.call_llm_with_context("What is photosynthesis?", None, topic="Biology") == "answer 3"
+    assert llm.call_llm_with_context("What is a noun?", None, topic="English") == "answer 2"
+
+def test_errors_are_not_cached_and_entries_expire(llm, response_cache, monkeypatch):
+    """Provider errors are retried on the next request, and topic TTLs bound an answer's lifetime."""
+    monkeypatch.setattr(llm, "call_llm", lambda *args, **kwargs: "[LLM ERROR] Request failed: timeout")
+    llm.call_llm_with_context("Why is the sky blue?", None, topic="Physics")
+    assert response_cache.get_stats()["stores"] == 0
+
+    monkeypatch.setattr("app.config.settings.LLM_CACHE_TOPIC_TTLS", {"Physics": -1})
+    monkeypatch.setattr(llm, "call_llm", lambda *args, **kwargs: "Rayleigh scattering.")
+    llm.call_llm_with_context("Why is the sky blue?", None, topic="Physics")
+    llm.call_llm_with_context("Why is the sky blue?", None, topic="Physics")
+    assert response_cache.get_stats()["hits"] == 0
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+import pytest
+from app.services.http_client import LLMHTTPClients
+from app.services.llm_service import LLMService, parse_stream_line
+
+PIECES = ["Photo", "synthesis ", "makes sugar."]
+
+class StreamingHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if body.get("messages", [{}])[-1].get("content") == "fail":
+            error = json.dumps({"error": {"message": "rate limited"}}).encode()
+            self.send_response(429)
+            self.send_header("Content-Length", str(len(error)))
+            self.end_headers()
+            self.wfile.write(error)
+            return
+        assert body["stream"] is True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for piece in PIECES:
+            event = {"choices": [{"delta": {"content": piece}}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(0.3)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def llm(serve_http, monkeypatch):
+    monkeypatch.setattr("app.services.llm_service.llm_http", LLMHTTPClients())
+    service = LLMService(provider="groq")
+    service.api_key = "test-key"
+    service.api_url = serve_http(StreamingHandler) + "/chat/completions"
+    return service
+
+def collect(stream):
+    async def run():
+        started = time.perf_counter()
+        arrivals = []
+        async for delta in stream:
+            arrivals.append((delta, time.perf_counter() - started))
+        return arrivals
+    return asyncio.run(run())
+
+def test_deltas_arrive_as_they_are_generated(llm):
+    """The first piece reaches the caller long before the provider finishes generating."""
+    arrivals = collect(llm.astream_llm("Explain photosynthesis"))
+
+    assert [delta for delta, _ in arrivals] == PIECES
+    assert arrivals[0][1] < 0.25
+    assert arrivals[-1][1] > 0.5
+
+def test_stream_failure_yields_provider_error(llm):
+    """An HTTP error ends the stream with the same message the blocking call returns."""
+    arrivals = collect(llm.astream_llm("fail"))
+
+    assert len(arrivals) == 1
+    assert arrivals[0][0].startswith("[LLM ERROR] Request failed")
+    assert "rate limited" in arrivals[0][0]
+
+def test_parse_stream_line_handles_both_provider_formats():
+    """OpenAI-compatible deltas and Text Generation Inference tokens are both understood."""
+    assert parse_stream_line("groq", 'data: {"choices": [{"delta": {"content": "Hi"}}]}') == "Hi"
+    assert parse_stream_line("groq", "data: [DONE]") is None
+    assert parse_stream_line("groq", ": keep-alive") is None
+    assert parse_stream_line("huggingface", 'data:{"token": {"text": " there", "special": false}}') == " there"
+    assert parse_stream_line("huggingface", 'data:{"token": {"text": "</s>", "special": true}}') is None
@@ -0,0 +1,172 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from app.services.numpy_vector_store import NumpyVectorStore
+
+def make_chunks(source_file, count):
+    return [{"text": f"{source_file} chunk {i}", "source_file": source_file, "page": i + 1} for i in range(count)]
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path))
+
+def test_query_returns_nearest_first(store):
+    """Exact search ranks the most similar chunk first, in Chroma's result shape."""
+    embeddings = np.eye(4, dtype=np.float32)
+    store.add_documents("Biology", make_chunks("cells.pdf", 4), embeddings)
+
+    results = store.query("Biology", [0.1, 0.9, 0.0, 0.0], top_k=2)
+
+    assert results["documents"][0][0] == "cells.pdf chunk 1"
+    assert len(results["ids"][0]) == 2
+    assert results["distances"][0][0] < results["distances"][0][1]
+
+def test_search_similar_across_topics(store):
+    """Searching without a topic filter merges every topic's matches."""
+    store.add_documents("Biology", make_chunks("cells.pdf", 2), [[1.0, 0.0], [0.0, 1.0]])
+    store.add_documents("Physics", make_chunks("motion.pdf", 2), [[0.9, 0.1], [-1.0, 0.0]])
+
+    results = store.search_similar([1.0, 0.0], top_k=2)
+
+    assert [r["topic"] for r in results] == ["Biology", "Physics"]
+    assert results[0]["score"] == pytest.approx(1.0)
+
+def test_index_persists_across_instances(store, tmp_path):
+    """A new store loads the saved matrix instead of starting empty."""
+    store.add_documents("History", make_chunks("wars.pdf", 3), np.random.rand(3, 8))
+
+    reopened = NumpyVectorStore(str(tmp_path))
+
+    assert reopened.get_collection_size("History") == 3
+    assert reopened.list_topics() == ["History"]
+
+def test_incremental_writes_touch_only_changed_segments(tmp_path, monkeypatch):
+    """Appending rewrites the tail segment only; deletes rewrite from the first removed row on."""
+    monkeypatch.setattr("app.config.settings.VECTOR_SEGMENT_ROWS", 4)
+    store = NumpyVectorStore(str(tmp_path))
+    embeddings = np.random.default_rng(1).standard_normal((10, 8))
+    store.add_documents("History", make_chunks("wars.pdf", 9), embeddings[:9])
+    directory = tmp_path / "History"
+    written = {path.name: path.stat().st_ino for path in directory.glob("*-*")}
+
+    store.add_documents("History", make_chunks("peace.pdf", 1), embeddings[9:])
+    rewritten = {path.name for path in directory.glob("*-*") if path.stat().st_ino != written.get(path.name)}
+    assert rewritten == {"vectors-00002.npy", "rows-00002.json"}
+
+    store.delete_document("History", "peace.pdf")
+    store.delete_document("History", "wars.pdf")
+    store.add_documents("History", make_chunks("wars.pdf", 6), embeddings[:6])
+    reopened = NumpyVectorStore(str(tmp_path)).get_collection("History")
+
+    assert sorted(path.name for path in directory.glob("vectors-*")) == ["vectors-00000.npy", "vectors-00001.npy"]
+    assert reopened.ids == store.get_collection("History").ids
+    assert reopened.search(embeddings[5], top_k=1)[0]["document"] == "wars.pdf chunk 5"
+
+def test_float16_storage(tmp_path):
+    """Half-precision matrices still rank correctly."""
+    store = NumpyVectorStore(str(tmp_path), dtype="float16")
+    store.add_documents("Maths", make_chunks("algebra.pdf", 3), np.eye(3))
+
+    results = store.search_similar([0.0, 0.0, 1.0], topic_filter="Maths", top_k=1)
+
+    assert results[0]["content"] == "algebra.pdf chunk 2"
+
+def test_int8_quantized_search(tmp_path):
+    """Quantised topics keep codes in memory and re-rank candidates at full precision."""
+    store = NumpyVectorStore(str(tmp_path), quantization="int8")
+    embeddings = np.random.default_rng(0).standard_normal((50, 16))
+    store.add_documents("Chemistry", make_chunks("atoms.pdf", 50), embeddings)
+
+    results = store.search_similar(embeddings[7], topic_filter="Chemistry", top_k=1)
+    stats = store.memory_stats()["Chemistry"]
+
+    assert results[0]["content"] == "atoms.pdf chunk 7"
+    assert results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert stats["quantization"] == "int8"
+    assert stats["resident_bytes"] < stats["float32_bytes"]
+    assert NumpyVectorStore(str(tmp_path), quantization="int8").get_collection("Chemistry")._codes.shape == (50, 16)
+
+def test_full_precision_rows_stay_memory_mapped(tmp_path, monkeypatch):
+    """Saved vector segments are mapped, not read into memory, and quantised topics count only their codes as resident."""
+    monkeypatch.setattr("app.config.settings.VECTOR_SEGMENT_ROWS", 16)
+    embeddings = np.random.default_rng(6).standard_normal((60, 16))
+    NumpyVectorStore(str(tmp_path), quantization="int8").add_documents("Chemistry", make_chunks("atoms.pdf", 40), embeddings[:40])
+    store = NumpyVectorStore(str(tmp_path), quantization="int8")
+    index = store.get_collection("Chemistry")
+
+    store.add_documents("Chemistry", make_chunks("bonds.pdf", 20), embeddings[40:])
+    store.delete_document("Chemistry", "atoms.pdf")
+    stats = index.memory_stats()
+
+    assert all(isinstance(segment, np.memmap) for segment in index._rows._segments)
+    assert index.search(embeddings[55], 1)[0]["document"] == "bonds.pdf chunk 15"
+    assert stats["resident_bytes"] == index._codes.nbytes + index.quantizer.overhead_bytes()
+    assert stats["mapped_bytes"] == 20 * 16 * 4
+
+def test_sync_document_writes_only_changed_chunks(store):
+    """Re-ingesting a revised document embeds new chunks and deletes stale ones."""
+    embedded = []
+
+    def embed(texts):
+        embedded.extend(texts)
+        return np.random.rand(len(texts), 8)
+
+    original = [{"text": f"section {i}", "source_file": "cells.pdf", "page": i + 1} for i in range(3)]
+    store.sync_document("Biology", "cells.pdf", original, embed)
+    revised = original[:2] + [{"text": "section 2 (revised)", "source_file": "cells.pdf", "page": 3}]
+    embedded.clear()
+
+    changes = store.sync_document("Biology", "cells.pdf", revised, embed)
+
+    assert changes == {"added": 1, "removed": 1, "unchanged": 2}
+    assert embedded == ["section 2 (revised)"]
+    assert sorted(store.get_collection("Biology").documents) == ["section 0", "section 1", "section 2 (revised)"]
+    assert store.delete_document("Biology", "cells.pdf") == 3
+    assert store.get_collection_size("Biology") == 0
+
+def test_pq_quantized_search_and_reload(tmp_path, monkeypatch):
+    """PQ codebooks are trained once enough rows exist, encode later rows and reload with the topic."""
+    monkeypatch.setattr("app.config.settings.PQ_SUBSPACES", 4)
+    monkeypatch.setattr("app.config.settings.PQ_MIN_TRAIN_VECTORS", 200)
+    store = NumpyVectorStore(str(tmp_path), quantization="pq")
+    embeddings = np.random.default_rng(4).standard_normal((320, 16))
+    store.add_documents("Chemistry", make_chunks("atoms.pdf", 300), embeddings[:300])
+    index = store.get_collection("Chemistry")
+    quantizer = index.quantizer
+
+    decoded = quantizer.decode(index._codes)
+    error = np.linalg.norm(decoded - index._vectors, axis=1).mean()
+    store.add_documents("Chemistry", make_chunks("bonds.pdf", 20), embeddings[300:])
+    reopened = NumpyVectorStore(str(tmp_path), quantization="pq").get_collection("Chemistry")
+
+    assert error < 0.5
+    assert index.quantizer is quantizer and index._codes.shape == (320, 4) and index._codes.dtype == np.uint8
+    assert np.array_equal(reopened.quantizer.codebooks, quantizer.codebooks)
+    assert np.array_equal(reopened._codes, index._codes)
+    assert reopened.search(embeddings[310], 1)[0]["document"] == "bonds.pdf chunk 10"
+    assert reopened.memory_stats()["compression_ratio"] > 1
+
+def test_quantize_vectors_script(tmp_path):
+    """The conversion script quantises an existing topic and reports memory and recall."""
+    store = NumpyVectorStore(str(tmp_path), quantization="none")
+    store.add_documents("Biology", make_chunks("cells.pdf", 300), np.random.default_rng(5).standard_normal((300, 16)))
+    backend = Path(__file__).resolve().parents[1]
+
+    result = subprocess.run(
+        [sys.executable, str(backend / "scripts" / "quantize_vectors.py"),
+         "--mode", "pq", "--subspaces", "4", "--queries", "20", "--k", "5"],
+        cwd=backend, env={**os.environ, "VECTOR_INDEX_DIR": str(tmp_path)},
+        capture_output=True, text=True, timeout=120
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "Biology: 300 x 16 -> pq" in result.stdout
+    assert "memory-mapped" in result.stdout
+    recall = float(re.search(r"with re-rank ([0-9.]+)", result.stdout).group(1))
+    assert recall >= 0.8
+    index = NumpyVectorStore(str(tmp_path), quantization="pq").get_collection("Biology")
+    assert index.quantizer is not None and index._codes.shape == (300, 4)
@@ -0,0 +1,46 @@
+import fitz
+import pytest
+from app.services.job_queue import JobQueue
+from app.services.pdf_extraction import PDFExtractionPool, extract_range
+from app.services.pdf_ingestor import PDFIngestor
+
+def make_pdf(path, pages, label):
+    with fitz.open() as doc:
+        for page_num in range(pages):
+            doc.new_page().insert_text((72, 72), f"{label} page {page_num + 1}")
+        doc.save(str(path))
+    return str(path)
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = PDFExtractionPool(max_workers=2, pages_per_task=3)
+    yield pool
+    pool.shutdown()
+
+def test_pages_come_back_in_order(pool, tmp_path):
+    """Page ranges extracted on different processes are yielded in page order."""
+    pdf_path = make_pdf(tmp_path / "book.pdf", 10, "book")
+
+    pages = list(pool.iter_pages(pdf_path))
+
+    assert [page for page, _ in pages] == list(range(1, 11))
+    assert [text.strip() for _, text in pages] == [f"book page {i}" for i in range(1, 11)]
+
+def test_small_pdfs_extract_through_the_cpu_lane_pool(tmp_path, monkeypatch):
+    """Below PDF_PARALLEL_MIN_PAGES the ingestor hands page ranges to extract_fn, here the CPU lane's pool, in page order."""
+    monkeypatch.setattr("app.config.settings.PDF_EXTRACT_PAGES_PER_TASK", 3)
+    monkeypatch.setattr("app.config.settings.JOB_CPU_PRELOAD_EMBEDDINGS", False)
+    queue = JobQueue(max_workers=1, db_path=tmp_path / "jobs.db", cpu_workers=1)
+    ranges = []
+
+    def extract(pdf_path, start, stop):
+        ranges.append((start, stop))
+        return queue.run_cpu(extract_range, pdf_path, start, stop)
+
+    try:
+        pages = list(PDFIngestor().iter_pages(make_pdf(tmp_path / "notes.pdf", 7, "notes"), extract))
+    finally:
+        queue.stop()
+
+    assert ranges == [(0, 3), (3, 6), (6, 7)]
+    assert [(page, text.strip()) for page, text in pages] == [(i, f"notes page {i}") for i in range(1, 8)]
@@ -0,0 +1,91 @@
+import asyncio
+import time
+import pytest
+from app.services.llm_cache import CachedAnswer
+from app.services.provider_router import ProviderHealthRegistry, ProviderRouter
+
+class FakeService:
+    """Provider stand-in; behaviour maps provider -> (delay in seconds, answer)."""
+    behaviour = {}
+    calls = []
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.api_key = "test-key"
+        self.model = f"{provider}-model"
+
+    async def acall_llm(self, prompt):
+        FakeService.calls.append(self.provider)
+        delay, answer = FakeService.behaviour[self.provider]
+        await asyncio.sleep(delay)
+        return answer
+
+    async def astream_llm(self, prompt):
+        FakeService.calls.append(self.provider)
+        delay, answer = FakeService.behaviour[self.provider]
+        for piece in [answer] if answer.startswith("[LLM ERROR]") else answer.split(" "):
+            await asyncio.sleep(delay)
+            yield piece
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr("app.config.settings.LLM_BREAKER_MIN_SAMPLES", 2)
+    monkeypatch.setattr("app.config.settings.LLM_BREAKER_COOLDOWN", 60)
+    FakeService.calls = []
+    FakeService.behaviour = {"groq": (0, "groq answer"), "openrouter": (0, "openrouter answer")}
+    return ProviderRouter(FakeService, order=["groq", "openrouter"], health=ProviderHealthRegistry(), hedge=False)
+
+def call(router, method="acall_llm"):
+    return asyncio.run(router.acall(method, "question"))
+
+def test_fails_over_to_next_provider(router):
+    """An error from the first provider is answered by the next one in order."""
+    FakeService.behaviour["groq"] = (0, "[LLM ERROR] Request failed: 503")
+
+    answer, service = call(router)
+
+    assert (answer, service.provider) == ("openrouter answer", "openrouter")
+    assert router.health.failovers == 1
+
+def test_circuit_opens_then_probes_after_cooldown(router, monkeypatch):
+    """Repeated errors stop traffic to a provider until a single probe succeeds."""
+    FakeService.behaviour["groq"] = (0, "[LLM ERROR] Request failed: 503")
+    for _ in range(4):
+        call(router)
+    assert router.health.get("groq").state == "open"
+
+    FakeService.calls = []
+    assert call(router)[1].provider == "openrouter"
+    assert FakeService.calls == ["openrouter"]
+
+    monkeypatch.setattr("app.config.settings.LLM_BREAKER_COOLDOWN", 0)
+    FakeService.behaviour["groq"] = (0, "groq answer")
+    assert call(router)[0] == "groq answer"
+    assert router.health.get("groq").state == "closed"
+
+def test_hedged_request_bounds_tail_latency(router, monkeypatch):
+    """A degraded primary is raced after the hedge delay and the faster answer wins."""
+    monkeypatch.setattr("app.config.settings.LLM_HEDGE_DELAY", 0.05)
+    router.hedge = True
+    FakeService.behaviour["groq"] = (2.0, "groq answer")
+
+    started = time.perf_counter()
+    answer, service = call(router)
+
+    assert service.provider == "openrouter" and time.perf_counter() - started < 0.5
+    assert (router.health.hedges, router.health.hedge_wins) == (1, 1)
+
+def test_cached_answers_do_not_count_as_provider_latency(router):
+    """Answers served from the cache leave the provider's latency statistics untouched."""
+    FakeService.behaviour["groq"] = (0, CachedAnswer("cached"))
+    call(router)
+    assert router.health.get("groq").samples == 0
+
+def test_stream_fails_over_only_before_first_token(router):
+    """A stream that errors before producing text moves to the next provider."""
+    FakeService.behaviour["groq"] = (0, "[LLM ERROR] Request failed: 429")
+
+    async def collect():
+        return [(delta, service.provider) async for delta, service in router.astream("astream_llm", "question")]
+
+    assert asyncio.run(collect()) == [("openrouter", "openrouter"), ("answer", "openrouter")]
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+import pytest
+from app.services.http_client import LLMHTTPClients
+from app.services.rate_governor import RateGovernor, RateLimitExceeded, estimate_tokens, parse_duration
+
+class QuotaHandler(BaseHTTPRequestHandler):
+    """Completion endpoint with Groq-style rate-limit headers; answers 429 when told to."""
+    protocol_version = "HTTP/1.1"
+
+    status = 200
+    headers_out = {}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 30}}).encode()
+        self.send_response(self.status)
+        for name, value in self.headers_out.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server_url(serve_http):
+    QuotaHandler.status, QuotaHandler.headers_out = 200, {}
+    return serve_http(QuotaHandler) + "/chat/completions"
+
+def payload(max_tokens=100):
+    return {"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": max_tokens}
+
+def test_token_estimates_and_reset_durations():
+    """Estimates count prompt and completion budget; Groq and OpenRouter reset formats parse to seconds."""
+    assert estimate_tokens(payload()) == 201
+    assert estimate_tokens({"inputs": "x" * 40, "parameters": {"max_new_tokens": 10}}) == 21
+    assert parse_duration("2m59.5s") == pytest.approx(179.5)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration(str(int((time.time() + 30) * 1000))) == pytest.approx(30, abs=1)
+
+def test_requests_queue_for_quota_then_shed(monkeypatch):
+    """Requests past the budget wait their turn in order, and those that would wait too long are shed."""
+    monkeypatch.setattr("app.config.settings.LLM_GOVERNOR_MAX_WAIT", 0.35)
+    governor = RateGovernor(rpm_limits={"groq": 600}, tpm_limits={})
+    governor.budget("groq").requests.balance = 1
+
+    async def scenario():
+        async def timed():
+            started = time.perf_counter()
+            await governor.aacquire("groq", payload())
+            return time.perf_counter() - started
+        return await asyncio.gather(*(timed() for _ in range(4)), return_exceptions=True)
+
+    waits = asyncio.run(scenario())
+
+    # 600 RPM refills one request every 0.1s
+    assert waits[0] < 0.05 and waits[1] == pytest.approx(0.1, abs=0.05) and waits[2] == pytest.approx(0.2, abs=0.05)
+    assert waits[3] == pytest.approx(0.3, abs=0.05)
+    with pytest.raises(RateLimitExceeded):
+        governor.budget("groq").requests.balance = -10
+        governor.acquire("groq", payload())
+    stats = governor.get_stats()["providers"]["groq"]
+    assert (stats["admitted"], stats["shed"], stats["peak_queue_depth"], stats["queue_depth"]) == (4, 1, 3, 0)
+
+def test_headers_adapt_budget_and_429_pauses_provider(server_url):
+    """Limit and remaining headers shape the bucket, usage replaces the estimate, and a 429 holds traffic."""
+    governor = RateGovernor(rpm_limits={}, tpm_limits={})
+    clients = LLMHTTPClients(pool_size=2, governor=governor)
+    QuotaHandler.headers_out = {"x-ratelimit-limit-tokens": "6000", "x-ratelimit-remaining-tokens": "5000",
+                                "x-ratelimit-reset-tokens": "10s"}
+    try:
+        clients.post("groq", server_url, json=payload())
+        budget = governor.budget("groq")
+        assert budget.tokens.capacity == 6000
+        assert budget.tokens.balance == pytest.approx(5000, abs=1)
+
+        # The 201-token estimate is settled to the 30 reported before the provider's remaining count applies
+        QuotaHandler.headers_out = {"x-ratelimit-limit-tokens": "6000"}
+        clients.post("groq", server_url, json=payload())
+        assert budget.tokens.balance == pytest.approx(5000 - 30, abs=5)
+
+        QuotaHandler.status, QuotaHandler.headers_out = 429, {"retry-after": "30"}
+        assert clients.post("groq", server_url, json=payload()).status_code == 429
+        with pytest.raises(RateLimitExceeded):
+            clients.post("groq", server_url, json=payload())
+        assert governor.get_stats()["providers"]["groq"]["throttled_responses"] == 1
+    finally:
+        clients.close()
+
+def test_cancelled_waiter_returns_its_reservation():
+    """A request abandoned while queued gives back its slot to the requests behind it."""
+    governor = RateGovernor(rpm_limits={"groq": 60}, tpm_limits={})
+    budget = governor.budget("groq")
+    budget.requests.balance = 0
+
+    async def scenario():
+        waiter = asyncio.ensure_future(governor.aacquire("groq"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    assert budget.requests.balance == pytest.approx(0, abs=0.1)
+    assert budget.get_stats()["queue_depth"] == 0
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from app.services.semantic_cache import SemanticAnswerCache, evaluate_hit_precision
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+@pytest.fixture
+def versions():
+    return {}
+
+@pytest.fixture
+def semantic_cache(versions):
+    semantic_cache = SemanticAnswerCache(threshold=0.9, max_entries=3, topic_version=lambda topic: versions.get(topic, 0))
+    semantic_cache.enabled = True
+    return semantic_cache
+
+def test_paraphrase_in_same_topic_hits(semantic_cache):
+    """A close question in the same topic gets the cached answer and sources; other topics don't."""
+    semantic_cache.add("Biology", unit(1, 0, 0), "What is photosynthesis?", "Plants make sugar.", ["bio.pdf"])
+
+    hit = semantic_cache.lookup("Biology", unit(1, 0.2, 0))
+    assert hit["answer"] == "Plants make sugar." and hit["sources"] == ["bio.pdf"]
+    assert hit["matched_question"] == "What is photosynthesis?" and hit["score"] > 0.9
+    assert semantic_cache.lookup("Biology", unit(1, 1, 0)) is None
+    assert semantic_cache.lookup("Chemistry", unit(1, 0, 0)) is None
+    assert semantic_cache.get_stats()["hit_rate"] == pytest.approx(1 / 3, abs=1e-4)
+
+def test_lru_bound_and_topic_invalidation(semantic_cache, versions):
+    """The least recently used answer is evicted first, and a document change empties the topic."""
+    semantic_cache.add("Biology", unit(1, 0, 0), "q1", "a1")
+    semantic_cache.add("Biology", unit(0, 1, 0), "q2", "a2")
+    semantic_cache.add("History", unit(0, 0, 1), "q3", "a3")
+    semantic_cache.lookup("Biology", unit(1, 0, 0))
+    semantic_cache.add("History", unit(1, 1, 1), "q4", "a4")
+
+    assert semantic_cache.lookup("Biology", unit(0, 1, 0)) is None
+    assert semantic_cache.lookup("Biology", unit(1, 0, 0))["answer"] == "a1"
+    assert semantic_cache.get_stats()["evictions"] == 1
+
+    versions["Biology"] = 1
+    assert semantic_cache.lookup("Biology", unit(1, 0, 0)) is None
+    assert semantic_cache.lookup("History", unit(0, 0, 1))["answer"] == "a3"
+    assert semantic_cache.get_stats()["entries"] == 2
+
+def test_errors_are_not_cached(semantic_cache):
+    """Provider errors never become cached answers."""
+    semantic_cache.add("Biology", unit(1, 0, 0), "q", "[LLM ERROR] Request failed: timeout")
+    assert semantic_cache.lookup("Biology", unit(1, 0, 0)) is None
+
+def test_hit_precision_on_labelled_pairs():
+    """Raising the threshold trades recall for precision on labelled pairs."""
+    vectors = {"a": [1, 0], "a'": [0.99, 0.14], "b": [0.9, 0.44], "c": [0, 1]}
+    pairs = [("a", "a'", True), ("a", "b", False), ("a", "c", False)]
+
+    report = evaluate_hit_precision(pairs, lambda texts: np.array([vectors[t] for t in texts]), [0.85, 0.95])
+
+    assert report[0]["hits"] == 2 and report[0]["precision"] == 0.5 and report[0]["recall"] == 1.0
+    assert report[1]["hits"] == 1 and report[1]["precision"] == 1.0
+
+def test_expired_entries_do_not_hide_valid_ones(semantic_cache, monkeypatch):
+    """An expired best match is skipped for the next one above the threshold, and expired entries are swept."""
+    semantic_cache.add("Biology", unit(1, 0, 0), "q1", "a1")
+    semantic_cache.add("Biology", unit(1, 0.3, 0), "q2", "a2")
+    semantic_cache.add("History", unit(0, 0, 1), "q3", "a3")
+    expired = {entry.question: entry for entry in semantic_cache._lru.values()}
+    expired["q1"].expires_at = expired["q3"].expires_at = 0
+
+    assert semantic_cache.lookup("Biology", unit(1, 0, 0))["answer"] == "a2"
+    assert semantic_cache.get_stats()["topics"] == {"Biology": 1, "History": 1}
+
+    monkeypatch.setattr(semantic_cache, "_next_purge", 0.0)
+    semantic_cache.lookup("Biology", unit(0, 1, 0))
+    assert semantic_cache.get_stats()["topics"] == {"Biology": 1, "History": 0}
@@ -0,0 +1,50 @@
+import asyncio
+from app.services.singleflight import SingleFlight
+
+def test_concurrent_duplicates_share_one_computation():
+    """Thirty simultaneous identical calls run the work once and all receive its result."""
+    flight = SingleFlight("test")
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": "42"}
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.do(("math", "meaning of life"), answer) for _ in range(30)))
+        # Once the first flight has landed, a new call computes again
+        await flight.do(("math", "meaning of life"), answer)
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 2
+    assert all(result is results[0] for result in results)
+    stats = flight.get_stats()
+    assert (stats["executed"], stats["coalesced"], stats["max_waiters"], stats["in_flight"]) == (2, 29, 30, 0)
+
+def test_failure_reaches_every_waiter_and_cancelled_caller_does_not_cancel_others():
+    """Exceptions are shared, and one caller going away leaves the computation running for the rest."""
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        failures = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+        first = asyncio.ensure_future(flight.do("slow", slow))
+        second = asyncio.ensure_future(flight.do("slow", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return failures, await second
+
+    failures, survivor = asyncio.run(scenario())
+
+    assert all(isinstance(error, RuntimeError) for error in failures)
+    assert survivor == "done"
@@ -0,0 +1,73 @@
+import threading
+import time
+import pytest
+from app.services.vector_store import VectorStore
+
+class FakeCollections(VectorStore):
+    """VectorStore whose collections are canned hits, failures or slow queries."""
+
+    def __init__(self, behaviour):
+        self._init_search_pool()
+        self.behaviour = behaviour
+        self.calls = []
+
+    def _query_collection(self, name, query_embedding, top_k):
+        self.calls.append(name)
+        result = self.behaviour[name]
+        if isinstance(result, Exception):
+            raise result
+        if callable(result):
+            return result()
+        return [{"id": f"{name}-{score}", "topic": name, "score": score} for score in result]
+
+@pytest.fixture(autouse=True)
+def search_settings(monkeypatch):
+    monkeypatch.setattr("app.config.settings.VECTOR_SEARCH_MAX_WORKERS", 2)
+    monkeypatch.setattr("app.config.settings.VECTOR_SEARCH_TIMEOUT", 0.2)
+
+def test_results_merged_by_score_across_collections():
+    """The global top-k comes from every collection in descending score order."""
+    store = FakeCollections({"Biology": [0.9, 0.4], "History": [0.8, 0.7], "Physics": [0.95, 0.1]})
+
+    results = store._search_all_parallel(["Biology", "History", "Physics"], [0.0], top_k=4)
+
+    assert [(hit["topic"], hit["score"]) for hit in results] == [
+        ("Physics", 0.95), ("Biology", 0.9), ("History", 0.8), ("History", 0.7)]
+
+def test_failing_collection_is_skipped():
+    """An error in one collection leaves the others' results intact."""
+    store = FakeCollections({"Biology": [0.9], "Broken": RuntimeError("corrupt index"), "History": [0.5]})
+
+    results = store._search_all_parallel(["Biology", "Broken", "History"], [0.0], top_k=5)
+
+    assert [hit["topic"] for hit in results] == ["Biology", "History"]
+
+def test_slow_collection_gets_its_own_budget_and_is_not_queried_again_while_hung():
+    """Queued queries get a full budget once they start; a hung collection holds at most one thread."""
+    release = threading.Event()
+
+    def hang():
+        release.wait(5)
+        return []
+
+    def slowish():
+        time.sleep(0.15)
+        return [{"id": "slow", "topic": "Slowish", "score": 0.6}]
+
+    # Two workers: Slowish queues behind Hung and Fast, then needs most of its own 0.2s budget
+    store = FakeCollections({"Hung": hang, "Fast": [0.9], "Slowish": slowish})
+    started = time.perf_counter()
+    results = store._search_all_parallel(["Hung", "Fast", "Slowish"], [0.0], top_k=5)
+    elapsed = time.perf_counter() - started
+
+    assert [hit["topic"] for hit in results] == ["Fast", "Slowish"]
+    assert elapsed < 1.0
+
+    store.calls.clear()
+    store._search_all_parallel(["Hung", "Fast"], [0.0], top_k=5)
+    assert store.calls == ["Fast"]
+
+    release.set()
+    time.sleep(0.05)
+    store._search_all_parallel(["Hung", "Fast"], [0.0], top_k=5)
+    assert sorted(store.calls) == ["Fast", "Fast", "Hung"]
@@ -12,6 +12,7 @@ import os
 import json
 import sqlite3
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 import time
 from datetime import datetime
@@ -190,6 +191,12 @@ def simple_search(query: str, topic: str = None, limit: int = 5, chat_session_id
     conn.close()
     return sorted(results, key=lambda x: x["score"], reverse=True)
 
+# One keep-alive session for LLM calls, so repeated completions reuse the TCP/TLS connection
+llm_session = requests.Session()
+llm_session.mount("https://", HTTPAdapter(pool_connections=1,
+                                          pool_maxsize=int(os.getenv("LLM_HTTP_POOL_SIZE", "20"))))
+LLM_TIMEOUT = (float(os.getenv("LLM_CONNECT_TIMEOUT", "5")), 30)
+
 def simple_llm_chat(question: str, context: str = "", sources: List[dict] = None) -> str:
     """Simple LLM chat using free APIs or fallback responses."""
     
@@ -221,7 +228,7 @@ def simple_llm_chat(question: str, context: str = "", sources: List[dict] = None
                 {"role": "user", "content": user_prompt}
             ]
             
-            response = requests.post(
+            response = llm_session.post(
                 "https://api.groq.com/openai/v1/chat/completions",
                 headers=headers,
                 json={
@@ -230,7 +237,7 @@ def simple_llm_chat(question: str, context: str = "", sources: List[dict] = None
                     "max_tokens": 400,
                     "temperature": 0.7
                 },
-                timeout=30
+                timeout=LLM_TIMEOUT
             )
             
             if response.status_code == 200: